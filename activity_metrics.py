@@ -0,0 +1,215 @@
+"""
+Activity metrics computed locally from the collected data.
+
+The Metrics Summary and Team Activity sections of a digest (see
+INCLUDE_SECTIONS in config.py) are computed here rather than left to the
+model: per-repository and per-author counts, pull request cycle time, change
+categories and file hotspots. It is one pass over records already in memory,
+so it takes milliseconds and gives the same numbers on every run. The tables
+are given to the model for reference and appended to the digest verbatim.
+
+Categories come from labels (FEATURE_LABELS, BUG_LABELS, PERFORMANCE_LABELS,
+or a label named after an EMOJI_MAPPING category) and, for commits, from
+conventional-commit prefixes such as `feat:` or `fix(api):`.
+"""
+
+import math
+import re
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+LABEL_SEPARATORS = re.compile(r'[\s/-]+')
+CONVENTIONAL_PREFIX = re.compile(r'^(\w+)(?:\(([^)]*)\))?!?:')
+CONVENTIONAL_TYPES = {
+    'feat': 'feature',
+    'fix': 'bugfix',
+    'perf': 'performance',
+    'refactor': 'refactor',
+    'docs': 'documentation',
+    'test': 'test',
+    'ci': 'ci_cd',
+    'security': 'security',
+}
+LABEL_ALIASES = {
+    'docs': 'documentation',
+    'tests': 'test',
+    'testing': 'test',
+    'ci': 'ci_cd',
+    'deps': 'dependencies',
+    'dependency': 'dependencies',
+    'ui': 'ui_ux',
+    'ux': 'ui_ux',
+}
+HOTSPOT_COUNT = 5
+
+
+def _hours(start: str, end: str) -> float:
+    return (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds() / 3600
+
+
+def _percentile(values: List[float], share: float) -> Optional[float]:
+    """Nearest-rank percentile of the values, or None if there are none."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(len(ordered) * share) - 1)]
+
+
+def _duration(hours: Optional[float]) -> str:
+    if hours is None:
+        return '-'
+    return f"{hours:.1f}h" if hours < 48 else f"{hours / 24:.1f}d"
+
+
+class ActivityMetrics:
+    def __init__(self, feature_labels: List[str], bug_labels: List[str], performance_labels: List[str],
+                 emoji_mapping: Dict[str, str]):
+        self.emoji = emoji_mapping
+        self.label_categories = {self._key(label): 'feature' for label in feature_labels}
+        self.label_categories.update({self._key(label): 'bugfix' for label in bug_labels})
+        self.label_categories.update({self._key(label): 'performance' for label in performance_labels})
+        # Repositories reuse a handful of labels, so each is resolved once
+        self._resolved: Dict[str, Optional[str]] = {}
+
+    @staticmethod
+    def _key(label: str) -> str:
+        return LABEL_SEPARATORS.sub('_', label.strip().lower())
+
+    def label_category(self, label: str) -> Optional[str]:
+        if label not in self._resolved:
+            key = self._key(label)
+            key = LABEL_ALIASES.get(key, key)
+            self._resolved[label] = self.label_categories.get(key, key if key in self.emoji else None)
+        return self._resolved[label]
+
+    def commit_category(self, message: str) -> Optional[str]:
+        match = CONVENTIONAL_PREFIX.match(message)
+        if not match:
+            return None
+        if match.group(2) and self._key(match.group(2)) in ('deps', 'dependencies'):
+            return 'dependencies'
+        return CONVENTIONAL_TYPES.get(match.group(1).lower())
+
+    def compute(self, repos: List[Dict[str, Any]], since: datetime) -> Dict[str, Any]:
+        """Count the activity of every repository that was collected without errors."""
+        since_iso = since.isoformat()
+        per_repo: Dict[str, Dict[str, Any]] = {}
+        authors: Dict[str, Counter] = defaultdict(Counter)
+        author_repos: Dict[str, set] = defaultdict(set)
+        categories: Dict[str, Counter] = defaultdict(Counter)
+        files: Counter = Counter()
+        file_authors: Dict[str, set] = defaultdict(set)
+        cycle_hours: List[float] = []
+
+        for repo in repos:
+            if 'error' in repo:
+                continue
+            name = repo['name']
+            commits, prs, issues = repo['commits'], repo['pull_requests'], repo['issues']
+            merged = [pr for pr in prs if (pr.get('merged_at') or '') >= since_iso]
+            repo_cycles = [_hours(pr['created_at'], pr['merged_at']) for pr in merged]
+            cycle_hours.extend(repo_cycles)
+            contributors = set()
+
+            for commit in commits:
+                author = commit.get('login') or commit['author']
+                contributors.add(author)
+                authors[author]['commits'] += 1
+                author_repos[author].add(name)
+                category = self.commit_category(commit['message'])
+                if category:
+                    categories[category]['commits'] += 1
+                for path in commit.get('files_changed') or ():
+                    files[(name, path)] += 1
+                    file_authors[(name, path)].add(author)
+            for kind, items in (('prs', prs), ('issues', issues)):
+                for item in items:
+                    contributors.add(item['author'])
+                    author_repos[item['author']].add(name)
+                    if item['created_at'] >= since_iso:
+                        authors[item['author']][f'{kind}_opened'] += 1
+                    for category in {self.label_category(label) for label in item['labels']} - {None}:
+                        categories[category][kind] += 1
+            for pr in merged:
+                authors[pr['author']]['prs_merged'] += 1
+
+            per_repo[name] = {
+                'commits': len(commits),
+                'contributors': len(contributors),
+                'prs_opened': sum(1 for pr in prs if pr['created_at'] >= since_iso),
+                'prs_merged': len(merged),
+                'prs_open': sum(1 for pr in prs if pr['state'] == 'open'),
+                'issues_opened': sum(1 for issue in issues if issue['created_at'] >= since_iso),
+                'issues_closed': sum(1 for issue in issues if issue['state'] == 'closed'),
+                'median_cycle_hours': _percentile(repo_cycles, 0.5),
+            }
+
+        return {
+            'repos': per_repo,
+            'authors': {author: {**counts, 'repos': len(author_repos[author])} for author, counts in authors.items()},
+            'cycle_time': {
+                'merged': len(cycle_hours),
+                'median_hours': _percentile(cycle_hours, 0.5),
+                'p90_hours': _percentile(cycle_hours, 0.9),
+            },
+            'categories': {category: dict(counts) for category, counts in categories.items()},
+            'hotspots': [{'repo': repo, 'path': path, 'commits': count, 'authors': len(file_authors[(repo, path)])}
+                         for (repo, path), count in files.most_common(HOTSPOT_COUNT) if count > 1],
+        }
+
+    def metrics_summary(self, metrics: Dict[str, Any]) -> str:
+        """Per-repository table, PR cycle time, change categories and file hotspots as markdown."""
+        lines = [
+            "| Repository | Commits | Contributors | PRs opened / merged / open | Issues opened / closed | Median cycle time |",
+            "|---|---|---|---|---|---|",
+        ]
+        for name, m in sorted(metrics['repos'].items(), key=lambda item: item[1]['commits'], reverse=True):
+            lines.append(f"| {name} | {m['commits']} | {m['contributors']} | "
+                         f"{m['prs_opened']} / {m['prs_merged']} / {m['prs_open']} | "
+                         f"{m['issues_opened']} / {m['issues_closed']} | {_duration(m['median_cycle_hours'])} |")
+
+        cycle = metrics['cycle_time']
+        if cycle['merged']:
+            lines.append(f"\n**PR cycle time** (opened to merged, {cycle['merged']} merged): "
+                         f"median {_duration(cycle['median_hours'])}, p90 {_duration(cycle['p90_hours'])}")
+
+        if metrics['categories']:
+            lines += ["", "| Category | Commits | PRs | Issues |", "|---|---|---|---|"]
+            ordered = sorted(metrics['categories'].items(), key=lambda item: -sum(item[1].values()))
+            for category, counts in ordered:
+                label = f"{self.emoji.get(category, '')} {category.replace('_', ' ')}".strip()
+                lines.append(f"| {label} | {counts.get('commits', 0)} | {counts.get('prs', 0)} | "
+                             f"{counts.get('issues', 0)} |")
+
+        if metrics['hotspots']:
+            lines += ["", "**File hotspots:**"]
+            for spot in metrics['hotspots']:
+                people = f", {spot['authors']} authors" if spot['authors'] > 1 else ''
+                lines.append(f"- `{spot['path']}` ({spot['repo']}): {spot['commits']} commits{people}")
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def team_activity(metrics: Dict[str, Any]) -> str:
+        """Per-author table as markdown, most active authors first."""
+        if not metrics['authors']:
+            return "No contributor activity in this period.\n"
+        lines = [
+            "| Contributor | Commits | PRs opened / merged | Issues opened | Repositories |",
+            "|---|---|---|---|---|",
+        ]
+        ordered = sorted(metrics['authors'].items(),
+                         key=lambda item: (-item[1].get('commits', 0), -item[1].get('prs_opened', 0), item[0]))
+        for author, m in ordered:
+            lines.append(f"| {author} | {m.get('commits', 0)} | {m.get('prs_opened', 0)} / {m.get('prs_merged', 0)} | "
+                         f"{m.get('issues_opened', 0)} | {m['repos']} |")
+        return '\n'.join(lines) + '\n'
+
+    def render(self, metrics: Dict[str, Any], sections: Dict[str, bool]) -> str:
+        """The enabled sections (metrics_summary, team_activity) as markdown, or '' if none are enabled."""
+        parts = []
+        if sections.get('metrics_summary'):
+            parts.append(f"## 📊 Metrics Summary\n\n{self.metrics_summary(metrics)}")
+        if sections.get('team_activity'):
+            parts.append(f"## 👥 Team Activity\n\n{self.team_activity(metrics)}")
+        return '\n'.join(parts)
@@ -0,0 +1,138 @@
+"""
+Batch mode: several digest configurations ("tenants") in one process.
+
+Tenants share one set of GitHub and Gemini clients, the request scheduler and
+the caches. A repository that several daily tenants follow is fetched once,
+for the widest window any of them needs, and each tenant narrows that data to
+its own window. Every tenant then generates, saves and delivers its own digest.
+
+The batch file is a JSON list of tenants:
+
+    [
+      {"name": "platform", "repos": ["org/api", "org/web"], "period": "daily",
+       "output_dir": "digests/platform", "teams_webhook_env": "TEAMS_WEBHOOK_PLATFORM"}
+    ]
+
+`period` defaults to daily and `output_dir` to digests/<name>. The Teams
+webhook is read from the environment variable named by `teams_webhook_env`
+(or given directly as `teams_webhook_url`), falling back to TEAMS_WEBHOOK_URL.
+"""
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ('daily', 'weekly', 'monthly')
+
+
+def load_tenants(path: Path) -> List[Dict[str, Any]]:
+    """Read and validate a batch file."""
+    with open(path, 'r', encoding='utf-8') as f:
+        tenants = json.load(f)
+    if not isinstance(tenants, list) or not tenants:
+        raise ValueError(f"{path} must contain a non-empty JSON list of tenants")
+    names = set()
+    for tenant in tenants:
+        name = tenant.get('name')
+        if not name or name in names:
+            raise ValueError(f"Every tenant in {path} needs a unique name (got {name!r})")
+        names.add(name)
+        if not tenant.get('repos'):
+            raise ValueError(f"Tenant {name} has no repos")
+        if tenant.get('period', 'daily') not in PERIODS:
+            raise ValueError(f"Tenant {name} has unknown period {tenant['period']!r}")
+    return tenants
+
+
+class DigestBatch:
+    def __init__(self, generator_class, tenants: List[Dict[str, Any]], use_cache: bool = True,
+                 full_rescan: bool = False, fixtures: Optional[Any] = None):
+        all_repos = list(dict.fromkeys(repo for tenant in tenants for repo in tenant['repos']))
+        # The base generator owns the shared clients and caches; it is never run itself
+        self.base = generator_class(use_cache=use_cache, full_rescan=full_rescan, fixtures=fixtures, repos=all_repos)
+        self.tenants = []
+        for tenant in tenants:
+            webhook = tenant.get('teams_webhook_url')
+            if tenant.get('teams_webhook_env'):
+                webhook = os.getenv(tenant['teams_webhook_env']) or webhook
+            generator = generator_class(
+                full_rescan=full_rescan, period=tenant.get('period', 'daily'), fixtures=fixtures,
+                repos=tenant['repos'], digests_dir=Path(tenant.get('output_dir') or Path('digests') / tenant['name']),
+                teams_webhook_url=webhook, shared=self.base)
+            # Every tenant's digest is committed on its own, then all are pushed at once
+            generator.defer_push = True
+            self.tenants.append((tenant['name'], generator))
+
+    def prefetch(self) -> Dict[str, Dict[str, Any]]:
+        """Fetch every repository of the daily tenants once, from the earliest window start any tenant needs.
+        
+        Tenants that will resume from their checkpoints don't collect, so their repositories are left out.
+        """
+        windows = {}
+        references = 0
+        for name, generator in self.tenants:
+            if generator.period != 'daily':
+                continue
+            if generator.will_resume():
+                logger.info(f"Tenant {name} resumes from its checkpoints; not fetching its repositories")
+                continue
+            for repo in dict.fromkeys(r.strip() for r in generator.repos if r.strip()):
+                references += 1
+                since = generator.repo_window_start(repo)
+                windows[repo] = min(windows.get(repo, since), since)
+        if not windows:
+            return {}
+
+        logger.info(f"Fetching {len(windows)} unique repositories for {references} tenant repository references")
+        started = time.perf_counter()
+
+        def fetch(repo: str) -> Dict[str, Any]:
+            try:
+                return self.base.fetch_repo_data(repo, windows[repo])
+            except Exception as e:
+                logger.error(f"Error collecting data from {repo}: {e}")
+                return {'name': repo, 'error': str(e)}
+
+        workers = min(self.base.max_workers, len(windows))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='collect') as executor:
+            results = dict(zip(windows, executor.map(fetch, windows)))
+        logger.info(f"Fetched shared repositories in {time.perf_counter() - started:.2f}s")
+        return results
+
+    def run(self) -> List[str]:
+        """Run every tenant, isolating failures; returns the names of the tenants that failed.
+        
+        Tenants only commit; their commits are pushed together at the end. A
+        tenant's checkpoints are cleared once that push succeeds, so a failed
+        push is resumed by the next run instead of collecting and generating again.
+        """
+        prefetched = self.prefetch()
+        failed = []
+        for name, generator in self.tenants:
+            logger.info(f"=== Tenant {name} ({generator.period}, {len(generator.repos)} repositories) ===")
+            if generator.period == 'daily':
+                ok = generator.run(prefetched, exit_on_error=False)
+            else:
+                ok = generator.run_rollup(exit_on_error=False)
+            if not ok:
+                failed.append(name)
+        if self.base.fixtures is None and len(failed) < len(self.tenants):
+            # Also pushes commits a resumed tenant made in an earlier process, which `unpushed` doesn't list
+            try:
+                self.base.git.push()
+            except Exception as e:
+                logger.error(f"Error pushing the batch's digests: {e}")
+                failed = [name for name, _ in self.tenants]
+        for name, generator in self.tenants:
+            # Daily and rollup tenants checkpoint their publish stages; each period has its own stage directory
+            if name not in failed:
+                generator.stages.clear()
+        logger.info(f"Batch finished: {len(self.tenants) - len(failed)}/{len(self.tenants)} tenants succeeded; "
+                    f"GitHub budget: {self.base.scheduler.summary()}")
+        return failed
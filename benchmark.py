@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the digest pipeline.
+
+Runs collect_repo_data, activity_sections, generate_gemini_prompt and
+save_digest against a synthetic GitHub repository served locally (no tokens
+or network needed) and reports wall time, throughput and peak traced memory
+for each stage.
+
+    python benchmark.py                      # 10, 100, 1000 and 10000 items
+    python benchmark.py --sizes 500 --latency-ms 50 --json bench.json
+    python benchmark.py --sizes 1000 --files-per-pr 5 500 3000 --body-chars 20000   # monorepo-sized PRs
+
+"kept MiB" is what the stage's result keeps in memory; for collect_repo_data it
+stays flat as pull requests and bodies grow, since collection keeps compact,
+truncated records (see records.py).
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+from github_graphql import COMMIT_PAGE_SIZE, ISSUE_PAGE_SIZE, PR_PAGE_SIZE
+
+REPO_NAME = 'bench/synthetic'
+COMMIT_PATH = re.compile(r'^/repos/[^/]+/[^/]+/commits/([0-9a-f]{40})$')
+DEFAULT_SIZES = [10, 100, 1000, 10000]
+
+
+class SyntheticGitHub(BaseAdapter):
+    """Serves a repository with `items` commits, pull requests and issues, all inside the last 20 hours.
+
+    Each pull request changes `files_per_pr` files and every body is `body_chars` long, to mimic
+    monorepos; like GitHub, only as many files as the query asks for are returned.
+    """
+
+    def __init__(self, items: int, latency: float = 0.0, files_per_pr: int = 5, body_chars: int = 480):
+        super().__init__()
+        self.items = items
+        self.latency = latency
+        self.files_per_pr = files_per_pr
+        self.body = ('Explains the change, its motivation and how it was tested. ' * (body_chars // 59 + 1))[:body_chars]
+        self.files_requested = files_per_pr
+        # Stay clear of the generator's window end, which is taken after this
+        self.now = datetime.now() - timedelta(minutes=1)
+        self.step = timedelta(hours=20) / max(1, items)
+        self.requests = 0
+
+    def _timestamp(self, index: int) -> str:
+        return (self.now - self.step * index).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def _page(self, cursor: str, size: int, build: Callable[[int], Dict[str, Any]]) -> Dict[str, Any]:
+        start = int(cursor or 0)
+        end = min(self.items, start + size)
+        return {
+            'pageInfo': {'hasNextPage': end < self.items, 'endCursor': str(end)},
+            'nodes': [build(index) for index in range(start, end)],
+        }
+
+    def _commit(self, index: int) -> Dict[str, Any]:
+        return {
+            'oid': f'{index + 1:040x}',
+            'message': f"feat: synthetic change {index}\n\nTouches module {index % 50} and its tests.",
+            'author': {'name': f'dev{index % 7}', 'date': self._timestamp(index), 'user': {'login': f'dev{index % 7}'}},
+            'associatedPullRequests': {'nodes': [{'number': index % self.items + 1}]},
+        }
+
+    def _item(self, index: int, pull_request: bool) -> Dict[str, Any]:
+        node = {
+            'number': index + 1,
+            'title': f"Synthetic {'change' if pull_request else 'report'} {index}",
+            'body': self.body,
+            'state': ('MERGED' if index % 3 else 'OPEN') if pull_request else ('CLOSED' if index % 2 else 'OPEN'),
+            'createdAt': self._timestamp(index + 1),
+            'updatedAt': self._timestamp(index),
+            'author': {'login': f'dev{index % 7}'},
+            'labels': {'nodes': [{'name': 'critical' if index % 10 == 0 else 'enhancement'}]},
+        }
+        if pull_request:
+            merged = self._timestamp(index) if index % 3 else None
+            node.update({'mergedAt': merged, 'closedAt': merged})
+            node['files'] = {'nodes': [{'path': f'src/pkg{i // 50}/module_{(index + i) % 50}.py'}
+                                       for i in range(min(self.files_per_pr, self.files_requested))]}
+        else:
+            node['comments'] = {'totalCount': index % 5}
+        return node
+
+    def _graphql(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        query = payload['query']
+        variables = payload['variables']
+        requested = re.search(r'files\(first: (\d+)\)', query)
+        self.files_requested = int(requested.group(1)) if requested else self.files_per_pr
+        repository = {'description': 'Synthetic benchmark repository'}
+        if 'history(' in query:
+            repository['defaultBranchRef'] = {'target': {'history': self._page(
+                variables.get('commitCursor'), COMMIT_PAGE_SIZE, self._commit)}}
+        if 'pullRequests(' in query:
+            repository['pullRequests'] = self._page(variables.get('prCursor'), PR_PAGE_SIZE,
+                                                    lambda index: self._item(index, True))
+        if 'issues(' in query:
+            repository['issues'] = self._page(variables.get('issueCursor'), ISSUE_PAGE_SIZE,
+                                              lambda index: self._item(index, False))
+        return {'data': {'repository': repository}}
+
+    def send(self, request, **kwargs):
+        self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        path = urlsplit(request.url).path
+        status = 200
+        match = COMMIT_PATH.match(path)
+        if path == '/graphql':
+            payload = self._graphql(json.loads(request.body))
+        elif match:
+            index = int(match.group(1), 16)
+            payload = {'sha': match.group(1), 'files': [{'filename': f'src/pkg{i // 50}/module_{(index + i) % 50}.py'}
+                                                         for i in range(self.files_per_pr)]}
+        elif path == f'/repos/{REPO_NAME}':
+            payload = {'full_name': REPO_NAME, 'description': 'Synthetic benchmark repository'}
+        else:
+            status, payload = 404, {'message': 'Not Found'}
+
+        response = requests.Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict({
+            'Content-Type': 'application/json; charset=utf-8',
+            'X-RateLimit-Limit': '5000',
+            'X-RateLimit-Remaining': '5000',
+            'X-RateLimit-Reset': str(int(time.time()) + 3600),
+        })
+        response._content = json.dumps(payload).encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class SyntheticFixtures:
+    """Plays the part of a replay FixtureStore, backed by SyntheticGitHub."""
+
+    mode = 'replay'
+
+    def __init__(self, items: int, latency: float, files_per_pr: int, body_chars: int):
+        self.github = SyntheticGitHub(items, latency, files_per_pr, body_chars)
+
+    def repo_list(self, repos: List[str]) -> List[str]:
+        return [REPO_NAME]
+
+    def window(self, period: str, start_date: datetime, end_date: datetime) -> Tuple[datetime, datetime]:
+        return start_date, end_date
+
+    def adapter(self, pool_size: int) -> BaseAdapter:
+        return self.github
+
+    def wrap_model(self, model: Any) -> Any:
+        # The benchmarked stages never call the model
+        return model
+
+
+def measure(fn: Callable[[], Any]) -> Tuple[Any, float, int, int]:
+    """Run fn once for wall time, then again under tracemalloc for peak memory and the memory its result keeps."""
+    gc.collect()
+    started = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    tracemalloc.start()
+    kept = fn()
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return result, elapsed, peak, retained
+
+
+def run_size(generator_class, items: int, latency: float, paced: bool, files_per_pr: int,
+             body_chars: int) -> List[Dict[str, Any]]:
+    fixtures = SyntheticFixtures(items, latency, files_per_pr, body_chars)
+    generator = generator_class(use_cache=False, fixtures=fixtures)
+    if not paced:
+        # Measure our own code, not the request pacing
+        generator.scheduler.max_rate = generator.scheduler.rate = float('inf')
+
+    data, collect_time, collect_peak, collect_kept = measure(lambda: generator.collect_repo_data(REPO_NAME))
+    if 'error' in data:
+        raise RuntimeError(f"Collection failed: {data['error']}")
+    collected = len(data['commits']) + len(data['pull_requests']) + len(data['issues'])
+    requests_sent = fixtures.github.requests // 2
+
+    sections, metrics_time, metrics_peak, metrics_kept = measure(lambda: generator.activity_sections([data]))
+    prompt, prompt_time, prompt_peak, prompt_kept = measure(
+        lambda: generator.generate_gemini_prompt([data], sections))
+    content = generator.generate_fallback_digest([data])
+    _, save_time, save_peak, save_kept = measure(lambda: generator.save_digest(content))
+
+    row = {'items': items, 'files_per_pr': files_per_pr, 'processed': collected}
+    return [
+        {'stage': 'collect_repo_data', **row, 'seconds': collect_time, 'peak_bytes': collect_peak,
+         'retained_bytes': collect_kept, 'requests': requests_sent},
+        {'stage': 'activity_sections', **row, 'seconds': metrics_time, 'peak_bytes': metrics_peak,
+         'retained_bytes': metrics_kept},
+        {'stage': 'generate_gemini_prompt', **row, 'seconds': prompt_time, 'peak_bytes': prompt_peak,
+         'retained_bytes': prompt_kept, 'prompt_chars': len(prompt)},
+        {'stage': 'save_digest', **row, 'seconds': save_time, 'peak_bytes': save_peak,
+         'retained_bytes': save_kept, 'digest_chars': len(content)},
+    ]
+
+
+def print_report(results: List[Dict[str, Any]]):
+    print(f"\n{'stage':<24}{'items':>8}{'files/PR':>10}{'processed':>11}{'seconds':>10}{'items/s':>12}"
+          f"{'peak MiB':>10}{'kept MiB':>10}")
+    for row in results:
+        throughput = row['processed'] / row['seconds'] if row['seconds'] else float('inf')
+        print(f"{row['stage']:<24}{row['items']:>8}{row['files_per_pr']:>10}{row['processed']:>11}"
+              f"{row['seconds']:>10.4f}{throughput:>12.0f}{row['peak_bytes'] / 2 ** 20:>10.2f}"
+              f"{row['retained_bytes'] / 2 ** 20:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark digest collection, prompt building and saving offline.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES,
+                        help="items per synthetic repository (commits, PRs and issues each)")
+    parser.add_argument('--files-per-pr', type=int, nargs='+', default=[5],
+                        help="files changed per synthetic pull request; several values compare them")
+    parser.add_argument('--body-chars', type=int, default=480, help="length of every PR and issue body")
+    parser.add_argument('--latency-ms', type=float, default=0.0, help="latency injected into each GitHub request")
+    parser.add_argument('--paced', action='store_true', help="keep the GitHub request pacing from config.py")
+    parser.add_argument('--json', metavar='PATH', help="also write the results as JSON")
+    parser.add_argument('--verbose', action='store_true', help="show the generator's log output")
+    args = parser.parse_args()
+
+    os.environ.setdefault('PAT_TOKEN', 'benchmark')
+    os.environ.setdefault('GEMINI_API_KEY', 'benchmark')
+    json_path = Path(args.json).resolve() if args.json else None
+    sys.path.insert(0, str(Path(__file__).resolve().parent))
+    from generate_digest import AIDigestGenerator
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    results = []
+    # Digests, watermarks and caches go to a scratch directory
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            for items in args.sizes:
+                for files_per_pr in args.files_per_pr:
+                    results.extend(run_size(AIDigestGenerator, items, args.latency_ms / 1000, args.paced,
+                                            files_per_pr, args.body_chars))
+        finally:
+            os.chdir(cwd)
+
+    print_report(results)
+    if json_path:
+        json_path.write_text(json.dumps(results, indent=2), encoding='utf-8')
+        print(f"\nResults written to {json_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Check that importing generate_digest stays cheap.
+
+PyGithub, requests, google.generativeai and pymsteams together take about a
+second to import, so generate_digest.py only imports them in the stages that
+use them. This runs `python -X importtime -c "import generate_digest"` in a
+fresh interpreter and fails if the import takes longer than the budget or
+pulls in any of those packages. CI runs it on every push, and
+tests/test_import_time.py runs the same checks under pytest.
+
+    python check_import_time.py
+    python check_import_time.py --budget-ms 300 --module batch
+"""
+
+import argparse
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+DEFAULT_BUDGET_MS = 200.0
+HEAVY_MODULES = ('github', 'google.generativeai', 'pymsteams', 'requests')
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def import_times(module: str) -> Tuple[float, Dict[str, float]]:
+    """Cumulative import time of `module` and of each module it imported, in milliseconds."""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=Path(__file__).resolve().parent, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f"import {module} failed:\n{result.stderr}")
+    # A module's line follows the lines of everything it imported, which are indented deeper;
+    # collect top-level groups so start-up imports (site, ...) are not counted against it
+    children: Dict[str, float] = {}
+    for line in result.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        name, cumulative = match.group(4), int(match.group(2)) / 1000
+        if len(match.group(3)) > 1:
+            children[name] = cumulative
+        elif name == module:
+            return cumulative, children
+        else:
+            children = {}
+    raise SystemExit(f"{module} did not appear in the -X importtime output")
+
+
+def heavy_imports(imported: Dict[str, float]) -> List[str]:
+    """The HEAVY_MODULES among the modules an import pulled in."""
+    return [name for name in HEAVY_MODULES if name in imported]
+
+
+def best_import_time(module: str, runs: int = 3) -> Tuple[float, Dict[str, float]]:
+    """The fastest of a few imports; the first one also pays for writing .pyc files."""
+    return min((import_times(module) for _ in range(runs)), key=lambda run: run[0])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fail if importing a module is slow or loads the heavy SDKs.")
+    parser.add_argument('--module', default='generate_digest', help="module to import (default generate_digest)")
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS,
+                        help=f"maximum cumulative import time (default {DEFAULT_BUDGET_MS:.0f}ms)")
+    args = parser.parse_args()
+
+    total, imported = best_import_time(args.module)
+    print(f"import {args.module}: {total:.1f}ms (budget {args.budget_ms:.0f}ms)")
+    for name, ms in sorted(imported.items(), key=lambda item: item[1], reverse=True)[:5]:
+        print(f"    {ms:8.1f}ms  {name}")
+
+    problems = []
+    if total > args.budget_ms:
+        problems.append(f"import {args.module} took {total:.1f}ms, over the {args.budget_ms:.0f}ms budget")
+    heavy = heavy_imports(imported)
+    if heavy:
+        problems.append(f"import {args.module} loads {', '.join(heavy)}; import them where they are used instead")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
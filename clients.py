@@ -0,0 +1,126 @@
+"""
+GitHub and Gemini clients for a run, created on first use.
+
+Importing PyGithub, requests and google.generativeai takes most of a second,
+so none of them is imported until a stage actually talks to GitHub or Gemini:
+`--help`, `search` or `publish` never pay for them. One instance is shared by
+every generator in a process (see batch mode).
+"""
+
+import logging
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
+
+from config import (
+    GITHUB_REQUEST_BURST, GITHUB_REQUESTS_PER_SECOND, RATE_LIMIT_MAX_WAIT_SECONDS,
+    REQUEST_TIMEOUT_SECONDS, RETRY_ATTEMPTS, RETRY_DELAY_SECONDS,
+)
+from model_chain import GeminiModel
+from sqlite_cache import SQLiteCache
+
+if TYPE_CHECKING:
+    from github import Github
+    from github_graphql import GraphQLCollector
+    from github_http import RequestScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceClients:
+    def __init__(self, github_token: Optional[str], gemini_api_key: Optional[str], max_workers: int,
+                 http_cache: Optional[SQLiteCache], fixtures: Optional[Any] = None):
+        self.github_token = github_token
+        self.gemini_api_key = gemini_api_key
+        self.max_workers = max_workers
+        self.http_cache = http_cache
+        self.fixtures = fixtures
+        self._lock = threading.RLock()
+        self._thread_local = threading.local()
+        self._scheduler = None
+        self._session = None
+        self._graphql = None
+        self._models: Dict[Tuple[str, float], Any] = {}
+        self._webhook_session = None
+
+    @property
+    def scheduler(self) -> 'RequestScheduler':
+        with self._lock:
+            if self._scheduler is None:
+                from github_http import RequestScheduler
+                self._scheduler = RequestScheduler(rate=GITHUB_REQUESTS_PER_SECOND, burst=GITHUB_REQUEST_BURST,
+                                                   max_retries=RETRY_ATTEMPTS, base_delay=RETRY_DELAY_SECONDS,
+                                                   max_wait=RATE_LIMIT_MAX_WAIT_SECONDS)
+            return self._scheduler
+
+    @property
+    def scheduler_used(self) -> bool:
+        return self._scheduler is not None
+
+    @property
+    def session(self):
+        """The shared GitHub session, installed as PyGithub's transport on first use."""
+        with self._lock:
+            if self._session is None:
+                if not self.github_token:
+                    raise ValueError("PAT_TOKEN environment variable is required")
+                from github_http import install_transport
+                adapter = self.fixtures.adapter(self.max_workers) if self.fixtures is not None else None
+                self._session = install_transport(self.max_workers, self.http_cache, self.scheduler, adapter)
+            return self._session
+
+    def github(self) -> 'Github':
+        """Return the GitHub client for the calling thread.
+
+        PyGithub keeps per-request state on its connection object, so a single
+        client must not be shared between collection workers.
+        """
+        client = getattr(self._thread_local, 'github', None)
+        if client is None:
+            # The transport must be installed before the client creates its requester
+            self.session
+            from github import Auth, Github
+            # Pacing is done globally by the scheduler, not per client
+            client = Github(auth=Auth.Token(self.github_token), timeout=REQUEST_TIMEOUT_SECONDS, per_page=100,
+                            seconds_between_requests=None, retry=0)
+            self._thread_local.github = client
+        return client
+
+    @property
+    def graphql(self) -> 'GraphQLCollector':
+        with self._lock:
+            if self._graphql is None:
+                from github_graphql import GraphQLCollector
+                self._graphql = GraphQLCollector(self.github_token, REQUEST_TIMEOUT_SECONDS, session=self.session)
+            return self._graphql
+
+    @property
+    def webhook_session(self):
+        """Pooled session for outgoing webhooks (Teams), retrying throttled and failed posts."""
+        with self._lock:
+            if self._webhook_session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+                from urllib3.util.retry import Retry
+                retry = Retry(total=RETRY_ATTEMPTS, backoff_factor=RETRY_DELAY_SECONDS,
+                              status_forcelist=(429, 500, 502, 503, 504), allowed_methods=None,
+                              respect_retry_after_header=True, raise_on_status=False)
+                self._webhook_session = requests.Session()
+                self._webhook_session.mount('https://', HTTPAdapter(max_retries=retry))
+                self._webhook_session.mount('http://', HTTPAdapter(max_retries=retry))
+            return self._webhook_session
+
+    def gemini(self, model_name: str, timeout: float) -> Any:
+        """The Gemini model for a chain tier (see model_chain.py), created once per model and deadline."""
+        with self._lock:
+            key = (model_name, timeout)
+            if key not in self._models:
+                if self.fixtures is not None and self.fixtures.mode == 'replay':
+                    model = None
+                else:
+                    if not self.gemini_api_key:
+                        raise ValueError("GEMINI_API_KEY environment variable is required")
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.gemini_api_key)
+                    model = GeminiModel(genai.GenerativeModel(model_name), timeout)
+                self._models[key] = self.fixtures.wrap_model(model) if self.fixtures is not None else model
+            return self._models[key]
@@ -0,0 +1,156 @@
+"""
+Clustering of a repository's commits before they are put in the prompt.
+
+On a busy day one piece of work shows up as dozens of commits ("wip",
+"fix typo", "address review") plus the PR that contains them. Commits are
+grouped when they:
+
+- belong to the same pull request,
+- are by the same author and have near-identical normalized subjects of at
+  least three words (word and word-pair shingles compared with MinHash,
+  confirmed by exact Jaccard similarity), or
+- are by the same author and touch largely the same files.
+
+Commits linked to two different PRs are never grouped. Candidate pairs come
+from MinHash locality-sensitive hashing, so the cost stays close to linear
+in the number of commits rather than quadratic. Hashing uses CRC32 with
+fixed seeds, so clusters are the same on every run.
+"""
+
+import re
+import zlib
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Set, Tuple
+
+NUM_PERMUTATIONS = 32
+BANDS = 16  # rows per band = NUM_PERMUTATIONS // BANDS; two rows favour recall, pairs are verified exactly
+MERSENNE_PRIME = (1 << 61) - 1
+# Fixed (a, b) pairs for the hash permutations h(x) = (a * x + b) mod p
+PERMUTATIONS = [((i * 0x9E3779B1 + 0x7F4A7C15) % MERSENNE_PRIME | 1, (i * 0x85EBCA6B + 0xC2B2AE35) % MERSENNE_PRIME)
+                for i in range(1, NUM_PERMUTATIONS + 1)]
+EMPTY_SIGNATURE = (MERSENNE_PRIME,) * NUM_PERMUTATIONS
+MIN_SUBJECT_WORDS = 3  # Shorter normalized subjects are not compared
+
+
+def normalize_subject(message: str) -> str:
+    """Lower-cased commit subject without SHAs, numbers, punctuation or conventional-commit prefixes."""
+    subject = message.split('\n', 1)[0].lower()
+    subject = re.sub(r'^(?:merge (?:pull request|branch)\b(?:.*? from \S+)?|[a-z]+(?:\([^)]*\))?!?:)\s*', '', subject)
+    subject = re.sub(r'\b[0-9a-f]{7,40}\b|\d+', '', subject)
+    subject = re.sub(r'[^a-z ]+', ' ', subject)
+    return ' '.join(subject.split())
+
+
+def shingles(subject: str) -> FrozenSet[str]:
+    words = subject.split()
+    return frozenset(words + [f"{a} {b}" for a, b in zip(words, words[1:])])
+
+
+def minhash(features: Iterable[str]) -> Tuple[int, ...]:
+    hashed = [zlib.crc32(feature.encode('utf-8')) for feature in features]
+    if not hashed:
+        return EMPTY_SIGNATURE
+    return tuple(min((a * x + b) % MERSENNE_PRIME for x in hashed) for a, b in PERMUTATIONS)
+
+
+def jaccard(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    if not left and not right:
+        return 1.0
+    return len(left & right) / len(left | right)
+
+
+class _DisjointSet:
+    """Union-find over commit indices that refuses to join clusters of two different pull requests."""
+
+    def __init__(self, pull_requests: List[Any]):
+        self.parent = list(range(len(pull_requests)))
+        self.pull_request = dict(enumerate(pull_requests))
+
+    def find(self, item: int) -> int:
+        while self.parent[item] != item:
+            self.parent[item] = self.parent[self.parent[item]]
+            item = self.parent[item]
+        return item
+
+    def union(self, left: int, right: int) -> bool:
+        left, right = self.find(left), self.find(right)
+        if left == right:
+            return True
+        numbers = {self.pull_request[left], self.pull_request[right]} - {None}
+        if len(numbers) > 1:
+            return False
+        # The lower index (newer commit) stays the root, so clusters keep collection order
+        root, child = min(left, right), max(left, right)
+        self.parent[child] = root
+        self.pull_request[root] = next(iter(numbers), None)
+        return True
+
+
+class CommitClusterer:
+    def __init__(self, message_similarity: float, file_overlap: float):
+        self.message_similarity = message_similarity
+        self.file_overlap = file_overlap
+
+    def settings(self) -> Dict[str, float]:
+        return {'message_similarity': self.message_similarity, 'file_overlap': self.file_overlap}
+
+    @staticmethod
+    def _candidates(features: List[FrozenSet[str]]) -> Iterator[Tuple[int, int]]:
+        """Yield index pairs with identical features, then pairs whose MinHash signatures share a band."""
+        distinct: Dict[FrozenSet[str], List[int]] = {}
+        for index, feature_set in enumerate(features):
+            if feature_set:
+                distinct.setdefault(feature_set, []).append(index)
+        for members in distinct.values():
+            for index in members[1:]:
+                yield members[0], index
+
+        # Only one commit per distinct feature set takes part in the banding
+        representatives = [members[0] for members in distinct.values()]
+        signatures = [minhash(features[index]) for index in representatives]
+        rows = NUM_PERMUTATIONS // BANDS
+        seen: Set[Tuple[int, int]] = set()
+        for band in range(BANDS):
+            buckets: Dict[Tuple[int, ...], List[int]] = {}
+            for index, signature in zip(representatives, signatures):
+                buckets.setdefault(signature[band * rows:(band + 1) * rows], []).append(index)
+            for members in buckets.values():
+                for position, left in enumerate(members):
+                    for right in members[position + 1:]:
+                        if (left, right) not in seen:
+                            seen.add((left, right))
+                            yield left, right
+
+    def cluster(self, commits: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Group commits; clusters and the commits inside them keep the input (newest first) order."""
+        if len(commits) < 2:
+            return [[commit] for commit in commits]
+        pull_requests = [commit.get('pr_number') for commit in commits]
+        groups = _DisjointSet(pull_requests)
+
+        first_in_pr: Dict[Any, int] = {}
+        for index, number in enumerate(pull_requests):
+            if number is not None:
+                groups.union(first_in_pr.setdefault(number, index), index)
+
+        # Features are qualified by author, so only one author's commits are grouped by message or files.
+        # Short subjects ("wip", "fix typo") say nothing about the work, so they only join through PRs or files.
+        subjects = []
+        for commit in commits:
+            words = normalize_subject(commit['message'])
+            informative = len(words.split()) >= MIN_SUBJECT_WORDS
+            subjects.append(frozenset(f"{commit['author']}\0{shingle}" for shingle in shingles(words))
+                            if informative else frozenset())
+        for left, right in self._candidates(subjects):
+            if jaccard(subjects[left], subjects[right]) >= self.message_similarity:
+                groups.union(left, right)
+
+        files = [frozenset(f"{commit['author']}\0{path}" for path in commit.get('files_changed') or ())
+                 for commit in commits]
+        for left, right in self._candidates(files):
+            if jaccard(files[left], files[right]) >= self.file_overlap:
+                groups.union(left, right)
+
+        clusters: Dict[int, List[Dict[str, Any]]] = {}
+        for index, commit in enumerate(commits):
+            clusters.setdefault(groups.find(index), []).append(commit)
+        return list(clusters.values())
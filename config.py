@@ -14,9 +14,26 @@ GITHUB_REPOS = os.getenv('GITHUB_REPOS', '').split(',')
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
 GEMINI_MODEL = 'gemini-1.5-flash'  # Alternative: 'gemini-1.5-pro'
 
+# Model Chain (see model_chain.py): tiers tried in order before falling back to the count-only digest
+MODEL_CHAIN = [
+    {'type': 'gemini', 'model': GEMINI_MODEL},
+    # {'type': 'gemini', 'model': 'gemini-1.5-pro', 'timeout': 180},
+    # {'type': 'local'},  # Deterministic stand-in, no network; 'latency_ms' and 'fail' simulate a slow or broken tier
+]
+MODEL_CALL_TIMEOUT_SECONDS = 120  # Default per-call deadline; a tier can set its own 'timeout'
+MODEL_HEDGE_PERCENTILE = 0.9      # Send a hedged request when a call is slower than this share of recent calls
+MODEL_HEDGE_MIN_SAMPLES = 5       # Recent calls needed before the percentile is trusted
+MODEL_HEDGE_DEFAULT_SECONDS = None  # Hedge delay until then; None never pays twice for a call of unknown speed
+MODEL_LATENCY_HISTORY = 50        # Recent latencies kept per tier
+
 # Digest Configuration
 DIGEST_PERIOD_DAYS = 2  # How many days back to analyze
 DIGEST_TIMEZONE = 'UTC'  # Timezone for date calculations
+WATERMARK_MAX_LOOKBACK_DAYS = 3  # Cap on how far back a stale watermark can reach
+ROLLUP_PERIOD_DAYS = {'weekly': 7, 'monthly': 30}  # Rollups are built from stored snapshots, not the API
+ACTIVITY_SNAPSHOTS = False  # Opt in to committing per-run activity (titles, authors, dates) for rollup metrics
+ROLLUP_HIGHLIGHT_SHARE = 0.3  # Share of the prompt budget for daily digest highlights in a rollup
+CHECKPOINT_MAX_AGE_HOURS = 12  # A failed run's stage checkpoints are resumed only within this time
 
 # Output Configuration
 DIGEST_DIR = 'digests'  # Directory to save digest files
@@ -35,8 +52,19 @@ LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
 MAX_COMMITS_PER_REPO = 100  # Maximum commits to collect per repository
 MAX_PRS_PER_REPO = 50       # Maximum PRs to collect per repository
 MAX_ISSUES_PER_REPO = 50    # Maximum issues to collect per repository
+COLLECTION_BACKEND = 'graphql'  # 'graphql' (batched queries) or 'rest' (one call per commit/PR)
+MAX_COMMIT_FILE_LOOKUPS = 20    # REST lookups for commits not covered by a PR (graphql backend); later ones get no files
 
 # Gemini Prompt Customization
+PROMPT_TOKEN_BUDGET = 30000  # Repositories over their share are compacted to fit
+COMMIT_CLUSTERING = True     # Render related commits (same PR, similar messages, same files) as one entry
+COMMIT_SIMILARITY_THRESHOLD = 0.5    # Jaccard similarity of normalized subjects to group two commits
+COMMIT_FILE_OVERLAP_THRESHOLD = 0.5  # Jaccard overlap of one author's changed files to group two commits
+SUMMARY_MODE = 'single'      # 'single' (one prompt) or 'map_reduce' (per-repo calls plus a merge call)
+LLM_MAX_CONCURRENCY = 4      # Concurrent Gemini calls in map_reduce mode
+SUMMARY_CACHE_MAX_AGE_DAYS = 14  # Cached per-repository summaries expire after this
+SUMMARY_CACHE_MAX_MB = 20
+STREAM_GENERATION = False    # Stream the final Gemini call straight into the digest file
 CUSTOM_PROMPT_PREFIX = """
 You are an AI assistant creating a comprehensive digest of GitHub activity for BlueprintLabs, 
 a startup lab managing multiple AI-related projects including TagPilot, BrainCrate, and AI CoFounder.
@@ -58,18 +86,39 @@ Additional Instructions:
 - Flag any issues that might require immediate attention
 """
 
+# Output Sinks (see sinks.py): 'teams', 'webhook', 'email', 'html' and 'file', delivered concurrently
+DIGEST_SINKS = [
+    {'type': 'teams'},
+    # {'type': 'html', 'path': 'site/digests'},
+    # {'type': 'webhook', 'url_env': 'DIGEST_WEBHOOK_URL'},
+    # {'type': 'email', 'to': ['team@example.com'], 'host': 'localhost', 'port': 25},
+]
+SINK_TIMEOUT_SECONDS = 120  # Default per-sink timeout; a sink can set its own 'timeout'
+
+# Microsoft Teams Delivery
+TEAMS_MAX_CARD_BYTES = 20000  # Teams rejects cards over ~28 KB; longer digests are split at section boundaries
+TEAMS_OUTBOX_MAX_AGE_DAYS = 3  # Cards that could not be delivered are retried on later runs until this old
+
 # Error Handling
 RETRY_ATTEMPTS = 3
 RETRY_DELAY_SECONDS = 5
+RATE_LIMIT_MAX_WAIT_SECONDS = 300  # Give up on a request rather than wait longer than this
+
+# GitHub Request Pacing
+GITHUB_REQUESTS_PER_SECOND = 10  # Shared across all collection workers
+GITHUB_REQUEST_BURST = 20
 
 # Performance Settings
 REQUEST_TIMEOUT_SECONDS = 30
 BATCH_SIZE = 10  # Process repositories in batches
+HTTP_CACHE_MAX_AGE_DAYS = 7   # Drop cached GitHub responses older than this
+HTTP_CACHE_MAX_MB = 100       # Evict least recently used responses beyond this size
 
 # Optional Features
 ENABLE_FILE_CHANGE_ANALYSIS = True
 ENABLE_COMMIT_MESSAGE_ANALYSIS = True
-ENABLE_PERFORMANCE_METRICS = True
+ENABLE_PERFORMANCE_METRICS = True  # Write a JSON run report (<digest>.run.json) next to each digest
+OPENMETRICS_PATH = None  # Also write OpenMetrics text here, e.g. for a node_exporter textfile collector
 ENABLE_CROSS_REPO_INSIGHTS = True
 
 # Custom Repository Descriptions (optional)
@@ -0,0 +1,152 @@
+"""
+Search index over the digest archive in digests/*.md.
+
+Each digest is split into sections at its markdown headings and stored in a
+SQLite FTS5 table, alongside structured tables of the repositories and the
+PR/issue numbers it mentions. `update()` only re-indexes files that are new
+or changed since the last run, so keeping the index current is cheap.
+"""
+
+import logging
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FILENAME_DATE = re.compile(r'^(\d{4}-\d{2}-\d{2})(?:-.*?-(\d{2}-\d{2}) UTC)?')
+HEADING = re.compile(r'^(#{1,6})\s+(.*)$|^\*\*(\d+\.\s*.+?)\*\*\s*$')
+# owner/repo names leading a heading or bold bullet, e.g. "### 2.1 kiingxo/chat-ai (ChatPilot)" or "* **owner/repo:**"
+REPO_NAME = re.compile(r'(?:^#{1,6}\s+|^\s*[*-]\s+\*\*)(?:\d+(?:\.\d+)*\.?\s+)?[^\w]*'
+                       r'([A-Za-z0-9][\w.-]*/[\w.-]*\w)(?=\s*(?:\(|:|\*\*|$))')
+REFERENCE = re.compile(r'(?<![\w&])#(\d+)\b')
+
+
+def split_sections(text: str) -> List[Tuple[str, str]]:
+    """Split a digest into (heading, body) pairs; text before the first heading gets an empty heading."""
+    sections = []
+    heading = ''
+    body: List[str] = []
+    for line in text.split('\n'):
+        match = HEADING.match(line.strip())
+        if match:
+            if any(part.strip() for part in body):
+                sections.append((heading, '\n'.join(body).strip()))
+            heading = (match.group(2) or match.group(3)).strip()
+            body = []
+        else:
+            body.append(line)
+    if any(part.strip() for part in body):
+        sections.append((heading, '\n'.join(body).strip()))
+    return sections
+
+
+def fts_query(text: str) -> str:
+    """Quote each term so user input is never parsed as FTS5 syntax."""
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in text.split())
+
+
+class DigestIndex:
+    def __init__(self, db_path: Path, digests_dir: Path):
+        self.digests_dir = Path(digests_dir)
+        db_path = Path(db_path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(db_path))
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL,
+                digest_date TEXT,
+                digest_time TEXT,
+                title TEXT
+            );
+            CREATE VIRTUAL TABLE IF NOT EXISTS sections USING fts5(path UNINDEXED, heading, body);
+            CREATE TABLE IF NOT EXISTS repos (path TEXT NOT NULL, repo TEXT NOT NULL, PRIMARY KEY (path, repo));
+            CREATE TABLE IF NOT EXISTS refs (path TEXT NOT NULL, number INTEGER NOT NULL, PRIMARY KEY (path, number));
+            CREATE INDEX IF NOT EXISTS repos_repo ON repos (repo);
+            CREATE INDEX IF NOT EXISTS refs_number ON refs (number);
+            CREATE INDEX IF NOT EXISTS files_date ON files (digest_date);
+        """)
+
+    def update(self) -> int:
+        """Index new and changed digests and forget deleted ones. Returns the number of files indexed."""
+        started = time.perf_counter()
+        known = {path: (mtime, size) for path, mtime, size in self.db.execute("SELECT path, mtime, size FROM files")}
+        seen = set()
+        indexed = 0
+        for filepath in sorted(self.digests_dir.glob('*.md')):
+            path = filepath.name
+            seen.add(path)
+            stat = filepath.stat()
+            if known.get(path) == (stat.st_mtime, stat.st_size):
+                continue
+            self._index_file(filepath, stat.st_mtime, stat.st_size)
+            indexed += 1
+        removed = set(known) - seen
+        for path in removed:
+            self._forget(path)
+        self.db.commit()
+        logger.info(f"Digest index: {indexed} indexed, {len(removed)} removed, {len(seen)} total "
+                    f"({(time.perf_counter() - started) * 1000:.0f}ms)")
+        return indexed
+
+    def _forget(self, path: str):
+        for table in ('files', 'sections', 'repos', 'refs'):
+            self.db.execute(f"DELETE FROM {table} WHERE path = ?", (path,))
+
+    def _index_file(self, filepath: Path, mtime: float, size: int):
+        text = filepath.read_text(encoding='utf-8')
+        path = filepath.name
+        self._forget(path)
+
+        match = FILENAME_DATE.match(path)
+        digest_date = match.group(1) if match else None
+        digest_time = match.group(2) if match else None
+        title = text.split('\n', 1)[0].lstrip('# ').strip()
+        self.db.execute("INSERT INTO files (path, mtime, size, digest_date, digest_time, title) VALUES (?, ?, ?, ?, ?, ?)",
+                        (path, mtime, size, digest_date, digest_time, title))
+        self.db.executemany("INSERT INTO sections (path, heading, body) VALUES (?, ?, ?)",
+                            [(path, heading, body) for heading, body in split_sections(text)])
+
+        repos = {m.group(1).rstrip(':.') for line in text.split('\n') for m in [REPO_NAME.match(line)] if m}
+        self.db.executemany("INSERT OR IGNORE INTO repos (path, repo) VALUES (?, ?)", [(path, repo) for repo in repos])
+        numbers = {int(number) for number in REFERENCE.findall(text)}
+        self.db.executemany("INSERT OR IGNORE INTO refs (path, number) VALUES (?, ?)", [(path, n) for n in numbers])
+
+    def search(self, text: str = '', repo: Optional[str] = None, number: Optional[int] = None,
+               since: Optional[str] = None, until: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """Find digest sections matching free text and/or structured filters, newest first."""
+        conditions = []
+        params: List[Any] = []
+        if text:
+            conditions.append("sections MATCH ?")
+            params.append(fts_query(text))
+        if repo:
+            conditions.append("files.path IN (SELECT path FROM repos WHERE repo = ? COLLATE NOCASE)")
+            params.append(repo)
+        if number is not None:
+            conditions.append("files.path IN (SELECT path FROM refs WHERE number = ?)")
+            params.append(number)
+        if since:
+            conditions.append("files.digest_date >= ?")
+            params.append(since)
+        if until:
+            conditions.append("files.digest_date <= ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        snippet = "snippet(sections, 2, '**', '**', '...', 12)" if text else "substr(sections.body, 1, 120)"
+        rows = self.db.execute(f"""
+            SELECT files.digest_date, files.digest_time, files.path, sections.heading, {snippet}
+            FROM sections JOIN files ON files.path = sections.path
+            {where}
+            ORDER BY files.digest_date DESC, files.digest_time DESC
+            LIMIT ?
+        """, (*params, limit)).fetchall()
+        return [{'date': date, 'time': time_, 'path': path, 'heading': heading, 'snippet': snippet_text}
+                for date, time_, path, heading, snippet_text in rows]
+
+    def close(self):
+        self.db.close()
@@ -8,122 +8,305 @@ import os
 import sys
 import json
 import base64
+import hashlib
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional
-import requests
-from github import Github, Auth
-import google.generativeai as genai
+from typing import TYPE_CHECKING, List, Dict, Any, Iterable, Iterator, Optional, Callable, Tuple
 from pathlib import Path
 import subprocess
 import logging
-import pymsteams
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
+
+from config import (
+    BATCH_SIZE, MAX_PRS_PER_REPO, MAX_ISSUES_PER_REPO,
+    COLLECTION_BACKEND, MAX_COMMIT_FILE_LOOKUPS, HTTP_CACHE_MAX_AGE_DAYS, HTTP_CACHE_MAX_MB,
+    WATERMARK_MAX_LOOKBACK_DAYS, PROMPT_TOKEN_BUDGET, PRIORITY_LABELS,
+    SUMMARY_MODE, LLM_MAX_CONCURRENCY, SUMMARY_CACHE_MAX_AGE_DAYS, SUMMARY_CACHE_MAX_MB,
+    STREAM_GENERATION, ROLLUP_PERIOD_DAYS, ROLLUP_HIGHLIGHT_SHARE, ACTIVITY_SNAPSHOTS, ENABLE_PERFORMANCE_METRICS,
+    OPENMETRICS_PATH, CHECKPOINT_MAX_AGE_HOURS, REQUEST_TIMEOUT_SECONDS, TEAMS_MAX_CARD_BYTES,
+    TEAMS_OUTBOX_MAX_AGE_DAYS, DIGEST_SINKS, SINK_TIMEOUT_SECONDS, RETRY_ATTEMPTS,
+    COMMIT_CLUSTERING, COMMIT_SIMILARITY_THRESHOLD, COMMIT_FILE_OVERLAP_THRESHOLD,
+    FEATURE_LABELS, BUG_LABELS, PERFORMANCE_LABELS, INCLUDE_SECTIONS, EMOJI_MAPPING,
+    MODEL_CHAIN, MODEL_CALL_TIMEOUT_SECONDS, MODEL_HEDGE_PERCENTILE, MODEL_HEDGE_MIN_SAMPLES,
+    MODEL_HEDGE_DEFAULT_SECONDS, MODEL_LATENCY_HISTORY,
+)
+from activity_metrics import ActivityMetrics
+from clients import ServiceClients
+from commit_clusters import CommitClusterer
+from digest_index import DigestIndex
+from git_publisher import GitPublisher
+from model_chain import LatencyHistory, ModelChain, ModelResult, build_tiers, load_chain_specs
+from prompt_builder import PromptBuilder, estimate_tokens
+from records import CommitRecord, IssueRecord, PullRequestRecord, cap_files, jsonable, truncate_body
+from rollup import ROLLUP_INSTRUCTIONS, daily_highlights, metrics_table, repo_metrics
+from run_metrics import RunMetrics
+from sinks import DigestMessage, build_sinks, deliver_all, load_specs
+from snapshot_store import SnapshotStore
+from sqlite_cache import SQLiteCache
+from stage_store import StageStore
+from watermarks import WatermarkStore
+
+# PyGithub, requests, google.generativeai and pymsteams are imported only by the
+# stages that use them (see clients.py), so --help and search start quickly
+if TYPE_CHECKING:
+    from github import Github
+    from replay import FixtureStore
+
+# Closing instructions shared by the single-prompt and map-reduce digests
+DIGEST_TASK_INSTRUCTIONS = """
+
+TASK: Create a "Pulse AI" daily digest with the title "Pulse AI: [Date] - Daily Summary" that includes:
+
+1. **Executive Summary** - High-level overview of the most significant changes in the period
+2. **Repository Breakdown** - Detailed summary for each repository with recent activity
+3. **Key Insights** - Important patterns, achievements, or concerns identified from today's activity
+4. **Next Steps** - Recommended actions based on the recent activity
+5. **Technical Highlights** - Notable technical changes or improvements from the period
+
+FORMAT REQUIREMENTS:
+- Start with the title "Pulse AI: [Current Date] - Daily Summary"
+- Use proper markdown formatting
+- Include emojis for visual appeal and quick scanning
+- Group related changes logically
+- Highlight critical items with bold text
+- Keep it professional but engaging
+- Focus on business impact and technical progress
+- Extract actionable insights from commit messages and PR descriptions
+- Identify potential TODOs or follow-up items
+
+STYLE: Write in a clear, professional tone suitable for startup leadership review. Focus on what matters most for business and technical progress. Make it feel like a daily pulse check on the team's progress.
+"""
+
+# Bump whenever REPO_SUMMARY_INSTRUCTIONS or generate_repo_prompt change, to invalidate cached summaries
+REPO_SUMMARY_TEMPLATE_VERSION = 2
+
+REPO_SUMMARY_INSTRUCTIONS = """
+
+TASK: Summarize this repository's activity for the daily Pulse AI digest in at most 200 words of markdown:
+- **Highlights**: the most significant changes and their business or technical impact
+- **Pull Requests & Issues**: notable items, critical ones in bold
+- **Concerns & Follow-ups**: risks, blockers, TODOs
+- **Technical Notes**: notable technical changes
+
+Do not add a title; the digest adds the repository heading.
+"""
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+
+def append_sections(digest_content: str, sections: str) -> str:
+    """The digest followed by the locally computed sections, if any."""
+    if not sections:
+        return digest_content
+    separator = '\n' if digest_content.endswith('\n') else '\n\n'
+    return digest_content + separator + sections
+
+
+class DigestWriter:
+    """Writes a streamed digest to disk chunk by chunk, behind the run's own title header.
+    
+    Like save_digest, it drops the model's first line when that line is a title.
+    """
+    
+    def __init__(self, filepath: Path, header: str):
+        self.file = open(filepath, 'w', encoding='utf-8')
+        self.file.write(header)
+        self.file.flush()
+        self.chunks: List[str] = []
+        self.pending = ''
+        self.first_line_done = False
+    
+    def write(self, chunk: str):
+        self.chunks.append(chunk)
+        if self.first_line_done:
+            text = chunk
+        else:
+            self.pending += chunk
+            if '\n' not in self.pending:
+                return
+            text = self._strip_title(self.pending)
+            self.first_line_done = True
+        self.file.write(text)
+        self.file.flush()
+    
+    @staticmethod
+    def _strip_title(text: str) -> str:
+        first_line, _, rest = text.partition('\n')
+        return rest if first_line.startswith('# ') else text
+    
+    def close(self) -> str:
+        """Flush any buffered text, close the file and return everything streamed."""
+        if not self.first_line_done and self.pending:
+            self.file.write(self._strip_title(self.pending))
+        self.file.close()
+        return ''.join(self.chunks)
+
+
 class AIDigestGenerator:
-    def __init__(self):
+    def __init__(self, use_cache: bool = True, full_rescan: bool = False, period: str = 'daily',
+                 fixtures: Optional['FixtureStore'] = None, repos: Optional[List[str]] = None,
+                 digests_dir: Optional[Path] = None, teams_webhook_url: Optional[str] = None,
+                 shared: Optional['AIDigestGenerator'] = None):
+        """Set up one digest configuration.
+        
+        `repos`, `digests_dir` and `teams_webhook_url` default to REPO_LIST, digests/
+        and TEAMS_WEBHOOK_URL. With `shared`, the GitHub and Gemini clients, the
+        request scheduler and the caches of that generator are reused (batch mode).
+        """
         self.github_token = os.getenv('PAT_TOKEN')
         self.gemini_api_key = os.getenv('GEMINI_API_KEY')
-        self.repos = os.getenv('REPO_LIST', '').split(',')
+        self.repos = repos if repos is not None else os.getenv('REPO_LIST', '').split(',')
+        self.teams_webhook_url = teams_webhook_url or os.getenv('TEAMS_WEBHOOK_URL')
+        
+        # Per-stage timings, API usage and token counts for the run report
+        self.metrics = RunMetrics(
+            enabled=os.getenv('DIGEST_METRICS', str(ENABLE_PERFORMANCE_METRICS)).lower() in ('1', 'true', 'yes'))
+        self.openmetrics_path = os.getenv('DIGEST_OPENMETRICS_PATH', OPENMETRICS_PATH)
+        self.sink_specs = load_specs(DIGEST_SINKS)
+        self.git = shared.git if shared is not None else GitPublisher(max_attempts=RETRY_ATTEMPTS)
+        self.defer_push = False
+        self.sink_results: Dict[str, Dict[str, Any]] = {}
         
-        if not self.github_token:
-            raise ValueError("PAT_TOKEN environment variable is required")
-        if not self.gemini_api_key:
-            raise ValueError("GEMINI_API_KEY environment variable is required")
+        # Recorded or replayed runs are offline runs: they never touch the caches,
+        # commit watermarks or snapshots, notify Teams or push
+        self.fixtures = fixtures
+        if fixtures is not None:
+            use_cache = False
+            self.repos = fixtures.repo_list(self.repos)
+            if fixtures.mode == 'replay':
+                self.github_token = self.github_token or 'replay'
+                self.gemini_api_key = self.gemini_api_key or 'replay'
+        
+        # PAT_TOKEN and GEMINI_API_KEY are checked when a stage first needs them
         if not self.repos:
             raise ValueError("REPO_LIST environment variable is required")
         
-        # Initialize GitHub client
-        self.github = Github(auth=Auth.Token(self.github_token))
+        # Create digests directory
+        self.digests_dir = Path(digests_dir or 'digests')
+        self.digests_dir.mkdir(parents=True, exist_ok=True)
         
-        # Initialize Gemini
-        genai.configure(api_key=self.gemini_api_key)
-        self.model = genai.GenerativeModel('gemini-1.5-flash')
+        self.repo_timings: Dict[str, float] = {}
+        if shared is not None:
+            self._share_clients(shared)
+        else:
+            self._create_clients(use_cache, fixtures)
+        self.collection_backend = os.getenv('DIGEST_COLLECTOR', COLLECTION_BACKEND)
+        self.summary_mode = os.getenv('DIGEST_SUMMARY_MODE', SUMMARY_MODE)
+        self.stream_generation = os.getenv('DIGEST_STREAM', str(STREAM_GENERATION)).lower() in ('1', 'true', 'yes')
+        clustering = os.getenv('DIGEST_CLUSTER_COMMITS', str(COMMIT_CLUSTERING)).lower() in ('1', 'true', 'yes')
+        self.clusterer = CommitClusterer(COMMIT_SIMILARITY_THRESHOLD, COMMIT_FILE_OVERLAP_THRESHOLD) if clustering else None
+        self.activity_metrics = ActivityMetrics(FEATURE_LABELS, BUG_LABELS, PERFORMANCE_LABELS, EMOJI_MAPPING)
+        self.prompt_builder = PromptBuilder(int(os.getenv('PROMPT_TOKEN_BUDGET', PROMPT_TOKEN_BUDGET)), PRIORITY_LABELS,
+                                            self.clusterer)
         
-        # Create digests directory
-        self.digests_dir = Path('digests')
-        self.digests_dir.mkdir(exist_ok=True)
+        # Calculate date range (last 24 hours, or the rollup period)
+        self.period = period
+        self.end_date = shared.end_date if shared is not None else datetime.now()
+        self.start_date = self.end_date - timedelta(days=ROLLUP_PERIOD_DAYS.get(period, 1))
+        if fixtures is not None:
+            # A replay uses the recording's window, so the window filters select the recorded items
+            self.start_date, self.end_date = fixtures.window(period, self.start_date, self.end_date)
         
-        # Calculate date range (last 24 hours)
-        self.end_date = datetime.now()
-        self.start_date = self.end_date - timedelta(days=1)
+        # Per-repository watermarks narrow each repo's window to activity since the last saved digest
+        self.watermarks = WatermarkStore(self.digests_dir / '.state' / 'watermarks.json')
+        # Offline runs collect the whole window: local watermarks would make a replay's windows differ
+        self.full_rescan = full_rescan or fixtures is not None
+        self.snapshots = SnapshotStore(self.digests_dir / 'snapshots')
+        # Off by default: snapshots are committed and pushed, and the repositories may be private
+        self.snapshots_enabled = os.getenv('DIGEST_SNAPSHOTS', str(ACTIVITY_SNAPSHOTS)).lower() in ('1', 'true', 'yes')
+        # Checkpoints let a failed run resume from its first incomplete stage. Each period has its own
+        # directory, so clearing a daily run's checkpoints never drops a pending rollup's, or the reverse
+        repo_key = ','.join(sorted(repo.strip() for repo in self.repos if repo.strip()))
+        self.stages = StageStore(self.digests_dir / '.state' / 'stages' / period, key=f"{period}:{repo_key}",
+                                 max_age_hours=CHECKPOINT_MAX_AGE_HOURS)
+        if full_rescan:
+            logger.info("Full re-scan requested - ignoring collection watermarks")
         
         logger.info(f"Generating digest for period: {self.start_date.date()} to {self.end_date.date()}")
     
-    def collect_repo_data(self, repo_name: str) -> Dict[str, Any]:
-        """Collect all activity data from a single repository."""
+    def _create_clients(self, use_cache: bool, fixtures: Optional['FixtureStore']):
+        """Open the on-disk caches and set up the (lazily created) GitHub and Gemini clients."""
+        # GitHub traffic goes through one pooled session, a shared rate limit
+        # scheduler and the persistent response cache
+        self.max_workers = max(1, int(os.getenv('DIGEST_WORKERS', BATCH_SIZE)))
+        self.http_cache = None
+        self.summary_cache = None
+        if use_cache:
+            self.http_cache = SQLiteCache(self.digests_dir / '.cache' / 'http.sqlite3',
+                                          max_age_seconds=HTTP_CACHE_MAX_AGE_DAYS * 86400,
+                                          max_bytes=HTTP_CACHE_MAX_MB * 1024 * 1024)
+            self.summary_cache = SQLiteCache(self.digests_dir / '.cache' / 'summaries.sqlite3',
+                                             max_age_seconds=SUMMARY_CACHE_MAX_AGE_DAYS * 86400,
+                                             max_bytes=SUMMARY_CACHE_MAX_MB * 1024 * 1024)
+        else:
+            logger.info("On-disk caches bypassed")
+        self.clients = ServiceClients(self.github_token, self.gemini_api_key, self.max_workers,
+                                      self.http_cache, fixtures)
+        # Offline runs keep latencies in memory, so replayed timings never skew live hedging
+        latency_path = self.digests_dir / '.state' / 'model_latency.json' if fixtures is None else None
+        tiers = build_tiers(load_chain_specs(MODEL_CHAIN), self.clients.gemini, MODEL_CALL_TIMEOUT_SECONDS)
+        self.model_chain = ModelChain(tiers, LatencyHistory(latency_path, MODEL_LATENCY_HISTORY), MODEL_HEDGE_PERCENTILE,
+                                      MODEL_HEDGE_MIN_SAMPLES, MODEL_HEDGE_DEFAULT_SECONDS)
+    
+    def _share_clients(self, shared: 'AIDigestGenerator'):
+        """Reuse another generator's clients and caches."""
+        for name in ('max_workers', 'http_cache', 'summary_cache', 'clients', 'model_chain'):
+            setattr(self, name, getattr(shared, name))
+    
+    @property
+    def scheduler(self):
+        return self.clients.scheduler
+    
+    @property
+    def graphql(self):
+        return self.clients.graphql
+    
+    def _github_client(self) -> 'Github':
+        """Return the GitHub client for the calling thread (see ServiceClients.github)."""
+        return self.clients.github()
+    
+    def repo_window_start(self, repo_name: str) -> datetime:
+        """Start of the collection window: the repo's watermark, or the start of the digest window."""
+        if self.full_rescan:
+            return self.start_date
+        watermark = self.watermarks.since(repo_name)
+        if watermark is None:
+            return self.start_date
+        # Never reach further back than the lookback cap after a long gap between runs
+        return max(watermark, self.end_date - timedelta(days=WATERMARK_MAX_LOOKBACK_DAYS))
+    
+    def collect_repo_data(self, repo_name: str, prefetched: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Collect all activity data from a single repository.
+        
+        `prefetched` is data already fetched for a window that starts no later than
+        this repository's own (batch mode); it is narrowed instead of calling GitHub.
+        """
         try:
-            repo = self.github.get_repo(repo_name)
-            logger.info(f"Collecting data from {repo_name}")
-            
-            data = {
-                'name': repo_name,
-                'description': repo.description or '',
-                'commits': [],
-                'pull_requests': [],
-                'issues': [],
-                'file_changes': []
-            }
-            
-            # Check for recent commits first
-            commits = repo.get_commits(since=self.start_date, until=self.end_date)
-            commit_count = 0
-            for commit in commits:
-                commit_count += 1
-                data['commits'].append({
-                    'sha': commit.sha[:8],
-                    'message': commit.commit.message,
-                    'author': commit.commit.author.name,
-                    'date': commit.commit.author.date.isoformat(),
-                    'files_changed': [f.filename for f in commit.files] if commit.files else []
-                })
-            
-            # Check for recent PRs
-            prs = repo.get_pulls(state='all', sort='updated', direction='desc')
-            pr_count = 0
-            for pr in prs:
-                # Convert timezone-aware datetime to naive for comparison
-                pr_updated_naive = pr.updated_at.replace(tzinfo=None)
-                if self.start_date <= pr_updated_naive <= self.end_date:
-                    pr_count += 1
-                    data['pull_requests'].append({
-                        'number': pr.number,
-                        'title': pr.title,
-                        'body': pr.body or '',
-                        'state': pr.state,
-                        'author': pr.user.login,
-                        'created_at': pr.created_at.isoformat(),
-                        'updated_at': pr.updated_at.isoformat(),
-                        'labels': [label.name for label in pr.labels],
-                        'files_changed': [f.filename for f in pr.get_files()]
-                    })
+            since = self.repo_window_start(repo_name)
+            if prefetched is not None:
+                if 'error' in prefetched:
+                    raise RuntimeError(prefetched['error'])
+                data = self.narrow_window(prefetched, since)
+            else:
+                data = self.fetch_repo_data(repo_name, since)
             
-            # Check for recent issues
-            issues = repo.get_issues(state='all', sort='updated', direction='desc')
-            issue_count = 0
-            for issue in issues:
-                # Convert timezone-aware datetime to naive for comparison
-                issue_updated_naive = issue.updated_at.replace(tzinfo=None)
-                if self.start_date <= issue_updated_naive <= self.end_date:
-                    issue_count += 1
-                    data['issues'].append({
-                        'number': issue.number,
-                        'title': issue.title,
-                        'body': issue.body or '',
-                        'state': issue.state,
-                        'author': issue.user.login,
-                        'created_at': issue.created_at.isoformat(),
-                        'updated_at': issue.updated_at.isoformat(),
-                        'labels': [label.name for label in issue.labels],
-                        'comments_count': issue.comments
-                    })
+            # The window start is inclusive, so drop the commit the previous run already covered
+            last_sha = self.watermarks.last_sha(repo_name)
+            if last_sha and not self.full_rescan:
+                data['commits'] = [c for c in data['commits'] if c['full_sha'] != last_sha]
+            newest_sha = data['commits'][0]['full_sha'] if data['commits'] else None
+            self.watermarks.advance(repo_name, self.end_date, newest_sha)
             
+            commit_count = len(data['commits'])
+            pr_count = len(data['pull_requests'])
+            issue_count = len(data['issues'])
             total_activity = commit_count + pr_count + issue_count
+            self.metrics.record_repo(repo_name, commits=commit_count, pull_requests=pr_count, issues=issue_count)
             
             if total_activity == 0:
-                logger.info(f"No activity in the past 24 hours for {repo_name} - skipping from digest")
+                logger.info(f"No new activity for {repo_name} since {since.strftime('%Y-%m-%d %H:%M')} - skipping from digest")
                 return None
             else:
                 logger.info(f"Collected {commit_count} commits, {pr_count} PRs, {issue_count} issues from {repo_name}")
@@ -131,108 +314,456 @@ class AIDigestGenerator:
             
         except Exception as e:
             logger.error(f"Error collecting data from {repo_name}: {e}")
+            self.metrics.record_repo(repo_name, error=str(e))
             return {'name': repo_name, 'error': str(e)}
     
-    def generate_gemini_prompt(self, all_repo_data: List[Dict[str, Any]]) -> str:
+    def fetch_repo_data(self, repo_name: str, since: datetime) -> Dict[str, Any]:
+        """Fetch a repository's activity since `since` with the configured backend, falling back to REST.
+        
+        The requests it took are counted by the scheduler as they are sent, so
+        the recorded `requests` include pagination, file lookups, retries and a
+        failed GraphQL attempt; 304s from the response cache are `not_modified`.
+        """
+        logger.info(f"Collecting data from {repo_name} since {since.strftime('%Y-%m-%d %H:%M')}")
+        with self.scheduler.track() as sent:
+            data = None
+            if self.collection_backend == 'graphql':
+                try:
+                    data = self._collect_repo_data_graphql(repo_name, since)
+                except Exception as e:
+                    logger.warning(f"GraphQL collection failed for {repo_name} ({e}); falling back to REST")
+            if data is None:
+                data = self._collect_repo_data_rest(repo_name, since)
+        logger.info(f"{repo_name}: {sent['requests']} GitHub requests ({sent['not_modified']} not modified, "
+                    f"{sent['retries']} retries)")
+        self.metrics.record_repo(repo_name, **sent)
+        return data
+    
+    @staticmethod
+    def narrow_window(data: Dict[str, Any], since: datetime) -> Dict[str, Any]:
+        """Copy of collected data without the items last changed before `since`."""
+        def recent(timestamp: str) -> bool:
+            return datetime.fromisoformat(timestamp).replace(tzinfo=None) >= since
+        
+        return dict(data,
+                    commits=[c for c in data['commits'] if recent(c['date'])],
+                    pull_requests=[pr for pr in data['pull_requests'] if recent(pr['updated_at'])],
+                    issues=[issue for issue in data['issues'] if recent(issue['updated_at'])])
+    
+    def _collect_repo_data_graphql(self, repo_name: str, since: datetime) -> Dict[str, Any]:
+        """Collect a repository through batched GraphQL queries.
+        
+        GraphQL has no per-commit file lists, so a commit that belongs to a pull
+        request in the window reuses that pull request's files; the remaining
+        commits are looked up over REST, up to MAX_COMMIT_FILE_LOOKUPS per repository.
+        Commits past the cap keep an empty file list (REST would list their files),
+        which is logged and counted as `commit_files_missing`.
+        """
+        data, graphql_calls = self.graphql.collect_repo(
+            repo_name, since, self.end_date, MAX_PRS_PER_REPO, MAX_ISSUES_PER_REPO)
+        
+        pr_files = {pr['number']: pr['files_changed'] for pr in data['pull_requests']}
+        repo = None
+        lookups = 0
+        missing = 0
+        for commit in data['commits']:
+            if commit['pr_number'] in pr_files:
+                commit['files_changed'] = pr_files[commit['pr_number']]
+            elif lookups < MAX_COMMIT_FILE_LOOKUPS:
+                if repo is None:
+                    repo = self._github_client().get_repo(repo_name, lazy=True)
+                commit['files_changed'] = cap_files(f.filename for f in repo.get_commit(commit['full_sha']).files)
+                lookups += 1
+            else:
+                missing += 1
+        
+        logger.info(f"{repo_name}: fetched via {graphql_calls} GraphQL requests and {lookups} commit file lookups")
+        if missing:
+            logger.warning(f"{repo_name}: {missing} commits outside a pull request have no file list "
+                           f"(MAX_COMMIT_FILE_LOOKUPS = {MAX_COMMIT_FILE_LOOKUPS}); use DIGEST_COLLECTOR=rest for all")
+        self.metrics.record_repo(repo_name, backend='graphql', graphql_requests=graphql_calls, commit_file_lookups=lookups,
+                                 commit_files_missing=missing)
+        return data
+    
+    def _collect_repo_data_rest(self, repo_name: str, since: datetime) -> Dict[str, Any]:
+        """Collect a repository through the REST API, one list and file request at a time.
+        
+        Commits are linked to the pull requests in the window that contain them
+        (or were merged as them), so PR-based commit grouping works as with GraphQL.
+        """
+        repo = self._github_client().get_repo(repo_name)
+        commit_prs: Dict[str, int] = {}
+        data = {
+            'name': repo_name,
+            'description': repo.description or '',
+            'commits': list(self._rest_commits(repo, since)),
+            'pull_requests': list(self._rest_pull_requests(repo, since, commit_prs)),
+            'issues': list(self._rest_issues(repo, since)),
+            'file_changes': []
+        }
+        for commit in data['commits']:
+            commit['pr_number'] = commit_prs.get(commit['full_sha'])
+        self.metrics.record_repo(repo_name, backend='rest')
+        return data
+    
+    def _rest_commits(self, repo, since: datetime) -> Iterator[CommitRecord]:
+        """Yield the window's commits as records, with their file lists capped while reading."""
+        for commit in repo.get_commits(since=since, until=self.end_date):
+            # commit.files lazily fetches the full commit
+            yield CommitRecord(
+                sha=commit.sha[:8],
+                full_sha=commit.sha,
+                message=commit.commit.message,
+                author=commit.commit.author.name,
+                login=commit.author.login if commit.author else None,
+                date=commit.commit.author.date.isoformat(),
+                files_changed=cap_files(f.filename for f in commit.files) if commit.files else [],
+            )
+    
+    def _rest_pull_requests(self, repo, since: datetime, commit_prs: Dict[str, int]) -> Iterator[PullRequestRecord]:
+        """Yield recently updated PRs (sorted by update time, so stop at the first stale one).
+        
+        Fills `commit_prs` with the SHAs of each PR's commits (first page) and its merge commit.
+        """
+        prs = repo.get_pulls(state='all', sort='updated', direction='desc')
+        per_page = self._github_client().per_page
+        for pr in self._scan_recent(prs, since, MAX_PRS_PER_REPO):
+            # Only the first page of a large PR's files is ever requested
+            files_changed = cap_files(f.filename for f in pr.get_files())
+            commit_prs.update((commit.sha, pr.number) for commit in islice(pr.get_commits(), per_page))
+            if pr.merge_commit_sha:
+                commit_prs[pr.merge_commit_sha] = pr.number
+            yield PullRequestRecord(
+                number=pr.number,
+                title=pr.title,
+                body=truncate_body(pr.body),
+                state=pr.state,
+                author=pr.user.login,
+                created_at=pr.created_at.isoformat(),
+                updated_at=pr.updated_at.isoformat(),
+                merged_at=pr.merged_at.isoformat() if pr.merged_at else None,
+                closed_at=pr.closed_at.isoformat() if pr.closed_at else None,
+                labels=[label.name for label in pr.labels],
+                files_changed=files_changed,
+            )
+    
+    def _rest_issues(self, repo, since: datetime) -> Iterator[IssueRecord]:
+        """Yield recently updated issues (the API filters by `since` server-side).
+        
+        The issues API lists pull requests too; they are skipped (and do not count
+        toward MAX_ISSUES_PER_REPO), as GraphQL's `issues` connection excludes them.
+        Their html_url tells them apart without fetching each issue.
+        """
+        issues = repo.get_issues(state='all', sort='updated', direction='desc', since=since)
+        is_pull_request = (lambda issue: '/pull/' in issue.html_url)
+        for issue in self._scan_recent(issues, since, MAX_ISSUES_PER_REPO, skip=is_pull_request):
+            yield IssueRecord(
+                number=issue.number,
+                title=issue.title,
+                body=truncate_body(issue.body),
+                state=issue.state,
+                author=issue.user.login,
+                created_at=issue.created_at.isoformat(),
+                updated_at=issue.updated_at.isoformat(),
+                labels=[label.name for label in issue.labels],
+                comments_count=issue.comments,
+            )
+    
+    def _scan_recent(self, items, since: datetime, limit: int, skip: Optional[Callable[[Any], bool]] = None):
+        """Yield items updated inside the digest window from a list sorted by updated_at, newest first.
+        
+        Iteration stops at the first item older than `since` or once limit items were yielded,
+        so PyGithub never requests the remaining pages of history. Items for which
+        `skip` returns True are passed over without counting toward the limit.
+        """
+        yielded = 0
+        for item in items:
+            # Convert timezone-aware datetime to naive for comparison
+            updated_naive = item.updated_at.replace(tzinfo=None)
+            if updated_naive > self.end_date:
+                continue
+            if updated_naive < since:
+                break
+            if skip is not None and skip(item):
+                continue
+            yield item
+            yielded += 1
+            if yielded >= limit:
+                break
+    
+    def _timed_collect(self, repo_name: str, prefetched: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """Run collect_repo_data and record how long the repository took."""
+        started = time.perf_counter()
+        try:
+            return self.collect_repo_data(repo_name, prefetched)
+        finally:
+            self.repo_timings[repo_name] = time.perf_counter() - started
+            self.metrics.record_repo(repo_name, seconds=round(self.repo_timings[repo_name], 3))
+    
+    def collect_all_repos(self, prefetched: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Collect data from all repositories concurrently, keeping REPO_LIST order.
+        
+        Repositories found in `prefetched` (batch mode) reuse that data instead of calling GitHub.
+        """
+        prefetched = prefetched or {}
+        repos = list(dict.fromkeys(repo.strip() for repo in self.repos if repo.strip()))
+        if not repos:
+            return []
+        
+        workers = min(self.max_workers, len(repos))
+        logger.info(f"Collecting {len(repos)} repositories with {workers} worker(s)")
+        
+        results: Dict[str, Optional[Dict[str, Any]]] = {}
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='collect') as executor:
+            futures = {executor.submit(self._timed_collect, repo, prefetched.get(repo)): repo for repo in repos}
+            for future in as_completed(futures):
+                repo = futures[future]
+                try:
+                    results[repo] = future.result()
+                except Exception as e:
+                    # collect_repo_data already isolates errors; this guards anything it missed
+                    logger.error(f"Error collecting data from {repo}: {e}")
+                    results[repo] = {'name': repo, 'error': str(e)}
+        total = time.perf_counter() - started
+        
+        for repo, elapsed in sorted(self.repo_timings.items(), key=lambda item: item[1], reverse=True):
+            logger.info(f"Collection time for {repo}: {elapsed:.2f}s")
+        sequential = sum(self.repo_timings.values())
+        speedup = sequential / total if total > 0 else 1.0
+        logger.info(f"Collected {len(repos)} repositories in {total:.2f}s "
+                    f"(sum of per-repo times {sequential:.2f}s, {speedup:.1f}x speedup)")
+        
+        # Only keep repositories with activity
+        return [results[repo] for repo in repos if results.get(repo) is not None]
+    
+    def write_run_report(self, filepath: Optional[str], status: str, error: Optional[str] = None,
+                         stage: Optional[str] = None):
+        """Write the run's metrics as JSON next to the digest (and as OpenMetrics, if configured).
+        
+        A single step run as a subcommand writes <digest>.<stage>.run.json instead.
+        """
+        if not self.metrics.enabled:
+            return
+        if self.clients.scheduler_used:
+            self.metrics.set('github', self.scheduler.usage())
+        self.metrics.set('caches', {
+            label: {'hits': cache.hits, 'misses': cache.misses, 'hit_rate': round(cache.hit_rate(), 3)}
+            for label, cache in (('http', self.http_cache), ('summary', self.summary_cache)) if cache is not None
+        })
+        digest_path = Path(filepath) if filepath else self.digest_location()[0]
+        suffix = f'.{stage}.run.json' if stage else '.run.json'
+        self.metrics.write(digest_path.with_suffix(suffix), self.openmetrics_path, status, error)
+    
+    def log_run_summary(self):
+        """Log the rate limit budget used and cache hit rates, and apply the cache limits."""
+        if self.clients.scheduler_used:
+            logger.info(f"GitHub budget: {self.scheduler.summary()}")
+        for name, result in self.sink_results.items():
+            outcome = 'ok' if result['ok'] else f"failed ({result['error']})"
+            logger.info(f"Sink {name}: {outcome} in {result['seconds']:.2f}s")
+        for label, cache in (('HTTP cache', self.http_cache), ('Summary cache', self.summary_cache)):
+            if cache is None:
+                continue
+            logger.info(f"{label}: {cache.hits} hits, {cache.misses} misses ({cache.hit_rate():.0%} hit rate)")
+            cache.evict()
+    
+    def activity_sections(self, all_repo_data: List[Dict[str, Any]]) -> str:
+        """The locally computed sections enabled in INCLUDE_SECTIONS (Metrics Summary, Team Activity)."""
+        with self.metrics.stage('metrics'):
+            metrics = self.activity_metrics.compute(all_repo_data, self.start_date)
+            sections = self.activity_metrics.render(metrics, INCLUDE_SECTIONS)
+        self.metrics.set('activity', metrics)
+        return sections
+    
+    def window_length(self) -> str:
+        """The digest window as a length ("24 hours", "7 days"), for prompts and the fallback digest."""
+        hours = max(1, round((self.end_date - self.start_date).total_seconds() / 3600))
+        if hours % 24 or hours == 24:
+            return f"{hours} hour{'s' if hours != 1 else ''}"
+        return f"{hours // 24} days"
+    
+    def period_label(self) -> str:
+        """The digest window with its bounds, e.g. "Last 24 hours (2025-07-14 08:00 to 2025-07-15 08:00)"."""
+        start, end = (moment.strftime('%Y-%m-%d %H:%M') for moment in (self.start_date, self.end_date))
+        return f"Last {self.window_length()} ({start} to {end})"
+    
+    @staticmethod
+    def metrics_reference(sections: str) -> str:
+        """Prompt block handing the computed sections to the model, so it doesn't derive its own numbers."""
+        if not sections:
+            return ''
+        return f"""
+ACTIVITY METRICS (computed from the data below and appended to the digest as-is; rely on these numbers, do not repeat the tables):
+{sections}
+"""
+    
+    def generate_gemini_prompt(self, all_repo_data: List[Dict[str, Any]], sections: str = '') -> str:
         """Generate a comprehensive prompt for Gemini to create the digest."""
         
         # Filter out repos with errors
         valid_repos = [repo for repo in all_repo_data if 'error' not in repo]
         
         if not valid_repos:
-            return "No activity found in any repositories for the past 24 hours."
+            return f"No activity found in any repositories for the past {self.window_length()}."
         
-        prompt = f"""You are an AI assistant creating a daily pulse digest of GitHub activity for BlueprintLabs, a startup lab managing multiple AI-related projects.
-
-PERIOD: Last 24 hours ({self.start_date.strftime('%Y-%m-%d %H:%M')} to {self.end_date.strftime('%Y-%m-%d %H:%M')})
+        header = f"""You are an AI assistant creating a daily pulse digest of GitHub activity for BlueprintLabs, a startup lab managing multiple AI-related projects.
 
+PERIOD: {self.period_label()}
+{self.metrics_reference(sections)}
 REPOSITORY ACTIVITY DATA:
 """
         
-        for repo_data in valid_repos:
-            prompt += f"\n## {repo_data['name']}\n"
-            prompt += f"Description: {repo_data['description']}\n"
-            
-            # Commits
-            if repo_data['commits']:
-                prompt += f"\n### Commits ({len(repo_data['commits'])})\n"
-                for commit in repo_data['commits']:
-                    prompt += f"- **{commit['sha']}** by {commit['author']}: {commit['message']}\n"
-                    if commit['files_changed']:
-                        prompt += f"  Files: {', '.join(commit['files_changed'][:5])}{'...' if len(commit['files_changed']) > 5 else ''}\n"
-            
-            # Pull Requests
-            if repo_data['pull_requests']:
-                prompt += f"\n### Pull Requests ({len(repo_data['pull_requests'])})\n"
-                for pr in repo_data['pull_requests']:
-                    prompt += f"- **#{pr['number']}** {pr['title']} ({pr['state']}) by {pr['author']}\n"
-                    if pr['body']:
-                        prompt += f"  Description: {pr['body'][:200]}{'...' if len(pr['body']) > 200 else ''}\n"
-                    if pr['labels']:
-                        prompt += f"  Labels: {', '.join(pr['labels'])}\n"
-            
-            # Issues
-            if repo_data['issues']:
-                prompt += f"\n### Issues ({len(repo_data['issues'])})\n"
-                for issue in repo_data['issues']:
-                    prompt += f"- **#{issue['number']}** {issue['title']} ({issue['state']}) by {issue['author']}\n"
-                    if issue['body']:
-                        prompt += f"  Description: {issue['body'][:200]}{'...' if len(issue['body']) > 200 else ''}\n"
-                    if issue['labels']:
-                        prompt += f"  Labels: {', '.join(issue['labels'])}\n"
-        
-        prompt += """
-
-TASK: Create a "Pulse AI" daily digest with the title "Pulse AI: [Date] - Daily Summary" that includes:
-
-1. **Executive Summary** - High-level overview of the most significant changes in the past 24 hours
-2. **Repository Breakdown** - Detailed summary for each repository with recent activity
-3. **Key Insights** - Important patterns, achievements, or concerns identified from today's activity
-4. **Next Steps** - Recommended actions based on the recent activity
-5. **Technical Highlights** - Notable technical changes or improvements from the past 24 hours
+        prompt = self.prompt_builder.build(header, valid_repos, DIGEST_TASK_INSTRUCTIONS)
+        self.metrics.set('prompt', self.prompt_builder.report)
+        return prompt
+    
+    def _generate(self, prompt: str, label: str, on_chunk: Optional[Callable[[str], None]] = None,
+                  kind: str = 'digest') -> ModelResult:
+        """Call the model chain, logging the serving tier, latency and token usage.
+        
+        With on_chunk the response is streamed: each text chunk is passed on as it
+        arrives, and time-to-first-token is logged separately from the total time.
+        Raises ModelChainExhausted when every tier failed.
+        """
+        result = self.model_chain.generate(prompt, label, on_chunk, kind)
+        timing = f"{result.seconds:.2f}s"
+        if result.first_token_seconds is not None:
+            timing = f"first token {result.first_token_seconds:.2f}s, total {timing}"
+        if result.hedged:
+            timing += ", hedged"
+        usage = result.usage
+        if usage is not None:
+            logger.info(f"Model call for {label} ({result.tier}): {timing}, {usage.prompt_token_count} prompt tokens, "
+                        f"{usage.candidates_token_count} response tokens")
+        else:
+            logger.info(f"Model call for {label} ({result.tier}): {timing}")
+        self.metrics.record_model_call(label, result.seconds, getattr(usage, 'prompt_token_count', None),
+                                       getattr(usage, 'candidates_token_count', None), result.first_token_seconds,
+                                       result.tier, result.hedged, result.failed_tiers)
+        return result
+    
+    def _call_model(self, prompt: str, label: str, on_chunk: Optional[Callable[[str], None]] = None) -> str:
+        """Generate the text of a digest or rollup, recording the tier that served the run."""
+        result = self._generate(prompt, label, on_chunk)
+        self.metrics.set('served_by', {'tier': result.tier, 'seconds': round(result.seconds, 3),
+                                       'hedged': result.hedged, 'failed_tiers': result.failed_tiers})
+        return result.text
+    
+    def generate_digest(self, all_repo_data: List[Dict[str, Any]],
+                        on_chunk: Optional[Callable[[str], None]] = None, sections: str = '') -> str:
+        """Generate the digest using Gemini API, streaming the final call to on_chunk if given.
+        
+        `sections` (see activity_sections) is given to the model for reference; appending it is up to the caller.
+        """
+        if self.summary_mode == 'map_reduce':
+            return self.generate_digest_map_reduce(all_repo_data, on_chunk, sections)
+        
+        prompt = self.generate_gemini_prompt(all_repo_data, sections)
+        
+        try:
+            logger.info("Generating digest with Gemini...")
+            return self._call_model(prompt, 'digest', on_chunk)
+        except Exception as e:
+            logger.error(f"Error generating digest: {e}")
+            return self.generate_fallback_digest(all_repo_data)
+    
+    def generate_repo_prompt(self, repo_data: Dict[str, Any]) -> str:
+        """Generate the prompt summarizing a single repository (map step)."""
+        header = f"""You are an AI assistant summarizing GitHub activity for BlueprintLabs, a startup lab managing multiple AI-related projects.
 
-FORMAT REQUIREMENTS:
-- Start with the title "Pulse AI: [Current Date] - Daily Summary"
-- Use proper markdown formatting
-- Include emojis for visual appeal and quick scanning
-- Group related changes logically
-- Highlight critical items with bold text
-- Keep it professional but engaging
-- Focus on business impact and technical progress
-- Extract actionable insights from commit messages and PR descriptions
-- Identify potential TODOs or follow-up items
+PERIOD: {self.period_label()}
 
-STYLE: Write in a clear, professional tone suitable for startup leadership review. Focus on what matters most for business and technical progress. Make it feel like a daily pulse check on the team's progress.
+REPOSITORY ACTIVITY DATA:
 """
-        
-        return prompt
+        # A builder per call: the map step runs concurrently and each builder keeps its own report
+        builder = PromptBuilder(self.prompt_builder.token_budget, PRIORITY_LABELS, self.clusterer)
+        return builder.build(header, [repo_data], REPO_SUMMARY_INSTRUCTIONS)
+    
+    def summary_cache_key(self, repo_data: Dict[str, Any]) -> str:
+        """Content address of a repository summary: its data, the model and the prompt template."""
+        payload = json.dumps({
+            'data': repo_data,
+            'model': self.model_chain.primary,
+            'template': REPO_SUMMARY_TEMPLATE_VERSION,
+            'token_budget': self.prompt_builder.token_budget,
+            'clustering': self.clusterer.settings() if self.clusterer else None,
+        }, sort_keys=True, default=jsonable)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
     
-    def generate_digest(self, all_repo_data: List[Dict[str, Any]]) -> str:
-        """Generate the digest using Gemini API."""
-        prompt = self.generate_gemini_prompt(all_repo_data)
+    def summarize_repo(self, repo_data: Dict[str, Any]) -> str:
+        """Summarize one repository, falling back to its activity counts if every model tier fails.
         
+        Summaries are reused from the summary cache while the repository's data is unchanged.
+        """
+        key = None
+        if self.summary_cache is not None:
+            key = self.summary_cache_key(repo_data)
+            cached = self.summary_cache.get(key)
+            self.summary_cache.record(hit=cached is not None)
+            if cached is not None:
+                logger.info(f"Reusing cached summary for {repo_data['name']}")
+                return cached[0].decode('utf-8')
         try:
-            logger.info("Generating digest with Gemini...")
-            response = self.model.generate_content(prompt)
-            
-            if response.text:
-                return response.text
-            else:
-                logger.error("Empty response from Gemini")
-                return self.generate_fallback_digest(all_repo_data)
-                
+            result = self._generate(self.generate_repo_prompt(repo_data), repo_data['name'], kind='repo')
         except Exception as e:
-            logger.error(f"Error generating digest with Gemini: {e}")
+            logger.error(f"Error summarizing {repo_data['name']}: {e}")
+            return self.fallback_repo_summary(repo_data)
+        summary = result.text.strip()
+        # Only the primary tier's summaries are cached; a fallback tier's is used for this run alone
+        if key is not None and result.tier == self.model_chain.primary:
+            self.summary_cache.put(key, summary.encode('utf-8'), {'repo': repo_data['name']})
+        return summary
+    
+    def generate_merge_prompt(self, summaries: Dict[str, str], sections: str = '') -> str:
+        """Generate the prompt merging per-repository summaries into the digest (reduce step)."""
+        prompt = f"""You are an AI assistant creating a daily pulse digest of GitHub activity for BlueprintLabs, a startup lab managing multiple AI-related projects.
+
+PERIOD: {self.period_label()}
+{self.metrics_reference(sections)}
+PER-REPOSITORY SUMMARIES:
+"""
+        for name, summary in summaries.items():
+            prompt += f"\n## {name}\n{summary}\n"
+        return prompt + DIGEST_TASK_INSTRUCTIONS
+    
+    def generate_digest_map_reduce(self, all_repo_data: List[Dict[str, Any]],
+                                   on_chunk: Optional[Callable[[str], None]] = None, sections: str = '') -> str:
+        """Summarize each repository concurrently, then merge the summaries in one smaller call."""
+        valid_repos = [repo for repo in all_repo_data if 'error' not in repo]
+        if not valid_repos:
             return self.generate_fallback_digest(all_repo_data)
+        
+        logger.info(f"Summarizing {len(valid_repos)} repositories with Gemini (map-reduce)...")
+        started = time.perf_counter()
+        workers = min(LLM_MAX_CONCURRENCY, len(valid_repos))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='summarize') as executor:
+            summaries = dict(zip([repo['name'] for repo in valid_repos],
+                                 executor.map(self.summarize_repo, valid_repos)))
+        logger.info(f"Map step finished in {time.perf_counter() - started:.2f}s")
+        
+        try:
+            return self._call_model(self.generate_merge_prompt(summaries, sections), 'merge', on_chunk)
+        except Exception as e:
+            logger.error(f"Error merging repository summaries: {e}")
+            return self.generate_fallback_digest(all_repo_data, summaries)
     
-    def generate_fallback_digest(self, all_repo_data: List[Dict[str, Any]]) -> str:
-        """Generate a basic digest if Gemini fails."""
+    def fallback_repo_summary(self, repo_data: Dict[str, Any]) -> str:
+        """Activity counts for one repository, as used by the fallback digest."""
+        return (f"- Commits: {len(repo_data['commits'])}\n"
+                f"- Pull Requests: {len(repo_data['pull_requests'])}\n"
+                f"- Issues: {len(repo_data['issues'])}")
+    
+    def generate_fallback_digest(self, all_repo_data: List[Dict[str, Any]],
+                                 summaries: Optional[Dict[str, str]] = None) -> str:
+        """Generate a basic digest once the model chain is exhausted, reusing any per-repository summaries."""
+        self.metrics.set('served_by', {'tier': 'fallback', 'seconds': None, 'hedged': False, 'failed_tiers': []})
         today = datetime.now().strftime('%Y-%m-%d')
         
         digest = f"""# Pulse AI: {today} - Daily Summary
 
 ## Executive Summary
-Generated pulse digest for the last 24 hours ({self.start_date.strftime('%Y-%m-%d %H:%M')} to {self.end_date.strftime('%Y-%m-%d %H:%M')}).
+Generated pulse digest for the last {self.window_length()} ({self.start_date.strftime('%Y-%m-%d %H:%M')} to {self.end_date.strftime('%Y-%m-%d %H:%M')}).
 
 ## Repository Activity
 
@@ -243,27 +774,77 @@ Generated pulse digest for the last 24 hours ({self.start_date.strftime('%Y-%m-%
                 digest += f"### {repo_data['name']}\nError: {repo_data['error']}\n\n"
                 continue
                 
-            digest += f"### {repo_data['name']}\n"
-            digest += f"- Commits: {len(repo_data['commits'])}\n"
-            digest += f"- Pull Requests: {len(repo_data['pull_requests'])}\n"
-            digest += f"- Issues: {len(repo_data['issues'])}\n\n"
+            summary = (summaries or {}).get(repo_data['name']) or self.fallback_repo_summary(repo_data)
+            digest += f"### {repo_data['name']}\n{summary}\n\n"
         
         digest += "## Note\nThis is a fallback digest generated due to API issues. Please check the logs for details.\n"
         
         return digest
     
-    def save_digest(self, digest_content: str) -> str:
-        """Save the digest to a markdown file."""
+    def rollup_first_day(self):
+        """First snapshot and digest date in the rollup; each run covers the day before it was saved."""
+        return (self.start_date + timedelta(days=1)).date()
+    
+    def generate_rollup(self, all_repo_data: List[Dict[str, Any]]) -> str:
+        """Generate a weekly/monthly rollup from snapshot data and the period's daily digests.
+        
+        Makes a single model call whose prompt is held to the usual token budget;
+        the locally computed metrics table is appended to the result.
+        """
+        metrics = {repo['name']: repo_metrics(repo, self.start_date) for repo in all_repo_data}
+        table = metrics_table(metrics)
+        budget = self.prompt_builder.token_budget
+        highlights = daily_highlights(self.digests_dir, self.rollup_first_day(), self.end_date.date(),
+                                      int(budget * ROLLUP_HIGHLIGHT_SHARE), exclude=list(ROLLUP_PERIOD_DAYS))
+        if not all_repo_data and not highlights:
+            return f"No stored activity or daily digests found for {self.start_date.date()} to {self.end_date.date()}.\n"
+        
+        title = self.period.title()
+        noun = 'month' if self.period == 'monthly' else 'week'
+        header = f"""You are an AI assistant creating a {self.period} pulse rollup of GitHub activity for BlueprintLabs, a startup lab managing multiple AI-related projects.
+
+PERIOD: {self.start_date.strftime('%Y-%m-%d')} to {self.end_date.strftime('%Y-%m-%d')}
+
+ACTIVITY METRICS:
+{table}
+DAILY DIGEST HIGHLIGHTS:
+{highlights or 'No daily digests were saved for this period.'}
+REPOSITORY ACTIVITY DATA:
+"""
+        footer = ROLLUP_INSTRUCTIONS.format(period=self.period, title=title, noun=noun, title_noun=title[:-2])
+        builder = PromptBuilder(max(0, budget - estimate_tokens(highlights)), PRIORITY_LABELS, self.clusterer)
+        prompt = builder.build(header, all_repo_data, footer)
+        
+        try:
+            content = self._call_model(prompt, f"{self.period} rollup")
+        except Exception as e:
+            logger.error(f"Error generating {self.period} rollup: {e}")
+            self.metrics.set('served_by', {'tier': 'fallback', 'seconds': None, 'hedged': False, 'failed_tiers': []})
+            content = f"""## Executive Summary
+Rollup for {self.start_date.strftime('%Y-%m-%d')} to {self.end_date.strftime('%Y-%m-%d')}, generated without Gemini due to API issues.
+
+## Daily Highlights
+{highlights or 'No daily digests were saved for this period.'}"""
+        return f"{content.rstrip()}\n\n## 📊 Activity Metrics\n\n{table}"
+    
+    def digest_location(self) -> Tuple[Path, str]:
+        """Return the digest file path and its title header for the current time."""
         today = datetime.now().strftime('%Y-%m-%d')
         current_time = datetime.now().strftime('%H:%M UTC')
         
-        # Create filename with actual time
+        # Create filename with actual time (rollups carry their period in the name)
         time_suffix = current_time.replace(':', '-')
-        filename = f"{today}-pulse-ai-{time_suffix}.md"
+        kind = '' if self.period == 'daily' else f"{self.period}-"
+        filename = f"{today}-pulse-ai-{kind}{time_suffix}.md"
         filepath = self.digests_dir / filename
         
         # Add time header to content and ensure it's not overridden by AI response
-        header = f"# Pulse AI: {today} - Daily Summary ({time_suffix.title()})\n\n"
+        header = f"# Pulse AI: {today} - {self.period.title()} Summary ({time_suffix.title()})\n\n"
+        return filepath, header
+    
+    def save_digest(self, digest_content: str, location: Optional[Tuple[Path, str]] = None) -> str:
+        """Save the digest to a markdown file."""
+        filepath, header = location or self.digest_location()
         
         # Remove any existing title from the AI response to avoid duplication
         lines = digest_content.split('\n')
@@ -279,83 +860,406 @@ Generated pulse digest for the last 24 hours ({self.start_date.strftime('%Y-%m-%
         logger.info(f"Digest saved to {filepath}")
         return str(filepath)
     
-    def send_teams_message(self, digest_content: str, digest_filepath: str):
-        """Send the full digest to Microsoft Teams via webhook."""
-        teams_webhook_url = os.getenv('TEAMS_WEBHOOK_URL')
-        if not teams_webhook_url:
-            logger.info("TEAMS_WEBHOOK_URL not set. Skipping Teams notification.")
+    def stream_digest(self, all_repo_data: List[Dict[str, Any]], sections: str = '') -> Tuple[str, str]:
+        """Generate the digest while writing it to disk as it streams in, followed by `sections`.
+        
+        Returns (digest_content, filepath). If generation fails part-way, the
+        partial file is replaced with whatever generate_digest returned instead.
+        """
+        location = self.digest_location()
+        writer = DigestWriter(*location)
+        try:
+            digest_content = self.generate_digest(all_repo_data, on_chunk=writer.write, sections=sections)
+        finally:
+            streamed = writer.close()
+        if streamed != digest_content:
+            digest_content = append_sections(digest_content, sections)
+            return digest_content, self.save_digest(digest_content, location)
+        full_content = append_sections(digest_content, sections)
+        with open(location[0], 'a', encoding='utf-8') as f:
+            f.write(full_content[len(digest_content):])
+        logger.info(f"Digest streamed to {location[0]}")
+        return full_content, str(location[0])
+    
+    def save_snapshot(self, all_repo_data: List[Dict[str, Any]]):
+        """Persist the collected activity for later rollups, if enabled; failing to do so must never fail the run."""
+        if not self.snapshots_enabled:
             return
         try:
-            # Send the full digest content
-            teams_message = pymsteams.connectorcard(teams_webhook_url)
-            teams_message.title(f"Pulse AI Digest - {datetime.now().strftime('%Y-%m-%d %H:%M UTC')}")
-            teams_message.text(digest_content)
-            # Add a link to the markdown file if possible (Teams webhooks can't upload files)
-            teams_message.addLinkButton("View Full Digest (Markdown)", "")
-            teams_message.send()
-            logger.info("Digest sent to Microsoft Teams.")
+            self.snapshots.write(self.end_date, all_repo_data)
+        except Exception as e:
+            logger.warning(f"Could not save the activity snapshot: {e}")
+    
+    def update_index(self):
+        """Add the new digest to the search index; a stale index must never fail the run."""
+        try:
+            index = DigestIndex(self.digests_dir / '.cache' / 'index.sqlite3', self.digests_dir)
+            index.update()
+            index.close()
         except Exception as e:
-            logger.error(f"Failed to send digest to Microsoft Teams: {e}")
+            logger.warning(f"Could not update the digest search index: {e}")
+    
+    def deliver(self, digest_content: str, filepath: str, skip: Iterable[str] = ()) -> Dict[str, Dict[str, Any]]:
+        """Deliver the digest to every configured sink not in `skip`, concurrently (see sinks.py)."""
+        sinks = build_sinks(self.sink_specs, self.clients, self.digests_dir, self.teams_webhook_url,
+                            SINK_TIMEOUT_SECONDS, REQUEST_TIMEOUT_SECONDS, TEAMS_MAX_CARD_BYTES,
+                            TEAMS_OUTBOX_MAX_AGE_DAYS)
+        sinks = [sink for sink in sinks if sink.name not in skip]
+        message = DigestMessage(f"Pulse AI Digest - {datetime.now().strftime('%Y-%m-%d %H:%M UTC')}",
+                                digest_content, filepath, self.period)
+        with self.metrics.stage('sinks'):
+            results = deliver_all(sinks, message)
+        self.sink_results.update(results)
+        self.metrics.set('sinks', self.sink_results)
+        return results
     
     def commit_and_push(self, filepath: str):
-        """Commit and push the digest file to the repository."""
+        """Commit the digest file, collection watermarks and any activity snapshot in one commit, and push it.
+        
+        The commit is checkpointed with its digest file, so a rerun after a failed
+        push of the same digest only pushes. With `defer_push` (batch mode) the push is left to the caller, so several
+        digests go out in one push.
+        """
         try:
-            # Add the file
-            subprocess.run(['git', 'add', filepath], check=True)
-            
-            # Commit
-            today = datetime.now().strftime('%Y-%m-%d')
-            current_time = datetime.now().strftime('%H:%M UTC')
-            
-            commit_message = f"🤖 Add Pulse AI for {today} ({current_time})"
-            subprocess.run(['git', 'commit', '-m', commit_message], check=True)
-            
-            # Push
-            subprocess.run(['git', 'push'], check=True)
+            committed = self.stages.load('commit')
+            if committed is not None and committed.get('filepath') == filepath and self.git.contains(committed['sha']):
+                logger.info(f"Digest already committed as {committed['sha'][:7]}")
+            else:
+                # The digest, the watermark state it was collected against and any activity snapshot
+                paths = [filepath, str(self.watermarks.path), *(str(path) for path in self.snapshots.written)]
+                today = datetime.now().strftime('%Y-%m-%d')
+                current_time = datetime.now().strftime('%H:%M UTC')
+                sha = self.git.commit(paths, f"🤖 Add Pulse AI for {today} ({current_time})")
+                self.stages.save('commit', {'sha': sha or self.git.head(), 'filepath': filepath})
             
-            logger.info(f"Successfully committed and pushed {filepath}")
+            if not self.defer_push:
+                self.git.push()
+                logger.info(f"Successfully committed and pushed {filepath}")
             
         except subprocess.CalledProcessError as e:
-            logger.error(f"Error in git operations: {e}")
+            logger.error(f"Error in git operations: {e}: {(e.stderr or '').strip()}")
             raise
     
-    def run(self):
-        """Main execution method."""
+    def publish(self, digest_content: str, filepath: str):
+        """Deliver the digest to its sinks and push it; recorded and replayed runs stop at the saved file."""
+        if self.fixtures is not None:
+            logger.info(f"Offline {self.fixtures.mode} run - digest saved to {filepath}, not sent or pushed")
+            return
+        # Sinks that succeeded before a failed run are not delivered to again (for this digest file only)
+        notified = self.stages.load('notify') or {}
+        if notified.get('filepath') != filepath:
+            notified = {}
+        delivered = set(notified.get('delivered', []))
+        # Sinks that timed out were abandoned mid-delivery and may have delivered; sending again could duplicate
+        unknown = set(notified.get('unknown', []))
+        if delivered:
+            logger.info(f"Already delivered to {', '.join(sorted(delivered))}; skipping")
+        if unknown:
+            logger.warning(f"Delivery to {', '.join(sorted(unknown))} timed out in the previous attempt and may "
+                           f"have gone through; not sending it again (check it, or rerun with --no-resume)")
+        
+        # Deliver in the background while the digest is committed and pushed
+        def notify():
+            results = self.deliver(digest_content, filepath, skip=delivered | unknown)
+            # A sink that queued the rest of its delivery (Teams' outbox) failed, but retries on its own next run;
+            # delivering to it again on resume would send its cards twice
+            delivered.update(name for name, result in results.items() if result['ok'] or result.get('queued'))
+            unknown.update(name for name, result in results.items() if result.get('unknown'))
+            self.stages.save('notify', {'delivered': sorted(delivered), 'unknown': sorted(unknown),
+                                        'filepath': filepath})
+        
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix='deliver') as executor:
+            delivery = executor.submit(notify)
+            try:
+                with self.metrics.stage('git'):
+                    self.commit_and_push(filepath)
+            finally:
+                # A failed push still waits for (and checkpoints) the delivery
+                delivery.result()
+    
+    def collect(self, prefetched: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+        """Collect every repository, store the activity snapshot and checkpoint the collection."""
+        with self.metrics.stage('collect'):
+            all_repo_data = self.collect_all_repos(prefetched)
+        if self.fixtures is None and self.snapshots_enabled:
+            with self.metrics.stage('snapshot'):
+                self.save_snapshot(all_repo_data)
+        self.stages.save('collect', {
+            'start_date': self.start_date.isoformat(),
+            'end_date': self.end_date.isoformat(),
+            'repos': all_repo_data,
+            'watermarks': self.watermarks.pending,
+            'snapshots': [str(path) for path in self.snapshots.written],
+        })
+        return all_repo_data
+    
+    def restore_collection(self, collected: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Pick up a checkpointed collection: its window, staged watermarks and snapshot files."""
+        # Summarize the window that was collected, not one ending now
+        self.start_date = datetime.fromisoformat(collected['start_date'])
+        self.end_date = datetime.fromisoformat(collected['end_date'])
+        self.watermarks.pending = collected['watermarks']
+        self.snapshots.written = [Path(path) for path in collected['snapshots']]
+        if self.fixtures is None and not all(path.exists() for path in self.snapshots.written):
+            # Resumed in a fresh checkout (e.g. a re-run CI job): write the snapshot again
+            self.snapshots.written = []
+            self.save_snapshot(collected['repos'])
+        self.metrics.set('resumed_from', 'collect')
+        return collected['repos']
+    
+    def summarize(self, all_repo_data: List[Dict[str, Any]]) -> Tuple[str, str]:
+        """Generate and save the digest, advance the watermarks it covers, index and checkpoint it.
+        
+        The digest is streamed to disk as it is generated, if enabled. Returns
+        (digest_content, filepath).
+        """
+        watermarks = dict(self.watermarks.pending)
+        sections = self.activity_sections(all_repo_data)
+        if self.stream_generation:
+            with self.metrics.stage('generate'):
+                digest_content, filepath = self.stream_digest(all_repo_data, sections)
+        else:
+            with self.metrics.stage('generate'):
+                digest_content = append_sections(self.generate_digest(all_repo_data, sections=sections), sections)
+            with self.metrics.stage('save'):
+                filepath = self.save_digest(digest_content)
+        if self.fixtures is None:
+            self.watermarks.commit()
+        with self.metrics.stage('index'):
+            self.update_index()
+        self.stages.save('summarize', {
+            'filepath': filepath,
+            'content': digest_content,
+            'file_text': Path(filepath).read_text(encoding='utf-8'),
+            'watermarks': watermarks,
+            'snapshots': [str(path) for path in self.snapshots.written],
+        })
+        return digest_content, filepath
+    
+    def restore_summary(self, summarized: Dict[str, Any]) -> Tuple[str, str]:
+        """Pick up a checkpointed digest, restoring its file and watermarks if this checkout lacks them."""
+        filepath = summarized['filepath']
+        self.snapshots.written = [Path(path) for path in summarized['snapshots']]
+        if not all(path.exists() for path in self.snapshots.written):
+            collected = self.stages.load('collect')
+            self.snapshots.written = []
+            if collected is not None and self.fixtures is None:
+                self.save_snapshot(collected['repos'])
+        if not Path(filepath).exists():
+            Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+            Path(filepath).write_text(summarized['file_text'], encoding='utf-8')
+            if self.fixtures is None:
+                self.watermarks.pending = summarized['watermarks']
+                self.watermarks.commit()
+            self.update_index()
+        self.metrics.set('resumed_from', 'summarize')
+        return summarized['content'], filepath
+    
+    def will_resume(self) -> bool:
+        """Whether run() would pick up a checkpointed collection or digest instead of collecting."""
+        if self.fixtures is not None:
+            return False
+        return self.stages.load('summarize') is not None or self.stages.load('collect') is not None
+    
+    def run(self, prefetched: Optional[Dict[str, Dict[str, Any]]] = None, exit_on_error: bool = True,
+            resume: bool = True) -> bool:
+        """Main execution method. Returns whether the run succeeded (unless it exits on errors).
+        
+        Unless `resume` is off, a run after a failed one continues from the
+        first stage that has no checkpoint.
+        """
+        filepath = None
         try:
             logger.info("Starting AI Digest generation...")
+            if not resume or self.fixtures is not None:
+                self.stages.clear()
             
-            # Collect data from all repositories
-            all_repo_data = []
+            summarized = self.stages.load('summarize')
+            if summarized is not None:
+                logger.info("Resuming the previous run: its digest was saved, publishing it")
+                digest_content, filepath = self.restore_summary(summarized)
+            else:
+                collected = self.stages.load('collect')
+                if collected is not None:
+                    logger.info("Resuming the previous run: its collected activity was saved, summarizing it")
+                    all_repo_data = self.restore_collection(collected)
+                else:
+                    # Drop any stale checkpoints before starting afresh
+                    self.stages.clear()
+                    all_repo_data = self.collect(prefetched)
+                digest_content, filepath = self.summarize(all_repo_data)
             
-            for repo in self.repos:
-                repo = repo.strip()
-                if repo:
-                    data = self.collect_repo_data(repo)
-                    if data is not None:  # Only add repositories with activity
-                        all_repo_data.append(data)
+            # Send to Teams, then commit and push
+            self.publish(digest_content, filepath)
+            if not self.defer_push:
+                # A deferred push (batch mode) may still fail; the batch clears the checkpoints once it succeeds
+                self.stages.clear()
             
-            # Generate digest
-            digest_content = self.generate_digest(all_repo_data)
+            self.log_run_summary()
+            self.write_run_report(filepath, 'success')
+            logger.info("AI Digest generation completed successfully!")
+            return True
             
-            # Save digest
-            filepath = self.save_digest(digest_content)
+        except Exception as e:
+            logger.error(f"Error in digest generation: {e}")
+            self.write_run_report(filepath, 'failed', str(e))
+            if exit_on_error:
+                sys.exit(1)
+            return False
+
+    def run_rollup(self, exit_on_error: bool = True) -> bool:
+        """Generate a weekly or monthly rollup from stored snapshots without calling GitHub."""
+        filepath = None
+        try:
+            logger.info(f"Starting {self.period} Pulse AI rollup...")
+            # A rollup is generated afresh each time, so earlier publish checkpoints belong to another file
+            self.stages.clear()
             
-            # Send to Teams
-            self.send_teams_message(digest_content, filepath)
+            with self.metrics.stage('load_snapshots'):
+                all_repo_data = self.snapshots.load(self.rollup_first_day(), self.end_date.date())
+            logger.info(f"Loaded stored activity for {len(all_repo_data)} repositories")
+            if not all_repo_data and not self.snapshots_enabled:
+                logger.info("Activity snapshots are off (DIGEST_SNAPSHOTS); the rollup uses the daily digests only")
             
-            # Commit and push
-            self.commit_and_push(filepath)
+            with self.metrics.stage('generate'):
+                digest_content = self.generate_rollup(all_repo_data)
+            with self.metrics.stage('save'):
+                filepath = self.save_digest(digest_content)
+            with self.metrics.stage('index'):
+                self.update_index()
             
-            logger.info("AI Digest generation completed successfully!")
+            self.publish(digest_content, filepath)
+            if not self.defer_push:
+                self.stages.clear()
+            
+            self.log_run_summary()
+            self.write_run_report(filepath, 'success')
+            logger.info(f"{self.period.title()} rollup completed successfully!")
+            return True
             
         except Exception as e:
-            logger.error(f"Error in digest generation: {e}")
-            sys.exit(1)
+            logger.error(f"Error in rollup generation: {e}")
+            self.write_run_report(filepath, 'failed', str(e))
+            if exit_on_error:
+                sys.exit(1)
+            return False
+
+    def run_stage(self, command: str, exit_on_error: bool = True) -> bool:
+        """Run one step of a daily run (collect, summarize or publish) on its own.
+        
+        The steps hand over through the stage checkpoints, so each can be a
+        separate process that only loads the clients it needs: summarize never
+        talks to GitHub and publish talks to neither GitHub nor Gemini.
+        """
+        filepath = None
+        try:
+            if command == 'collect':
+                self.stages.clear()
+                self.collect()
+            elif command == 'summarize':
+                _, filepath = self.summarize(self.restore_collection(self.stages.require('collect', 'collect')))
+            else:
+                digest_content, filepath = self.restore_summary(self.stages.require('summarize', 'summarize'))
+                self.publish(digest_content, filepath)
+                if not self.defer_push:
+                    self.stages.clear()
+            
+            self.log_run_summary()
+            self.write_run_report(filepath, 'success', stage=command)
+            logger.info(f"{command.title()} step completed successfully!")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error in {command} step: {e}")
+            self.write_run_report(filepath, 'failed', str(e), stage=command)
+            if exit_on_error:
+                sys.exit(1)
+            return False
+
+def search_digests(args: argparse.Namespace):
+    """Print digest sections matching the search arguments, newest first."""
+    digests_dir = Path('digests')
+    index = DigestIndex(digests_dir / '.cache' / 'index.sqlite3', digests_dir)
+    # Cheap when nothing changed, and rebuilds the index if the cache was cleared
+    index.update()
+    started = time.perf_counter()
+    results = index.search(' '.join(args.query), repo=args.repo, number=args.number,
+                           since=args.since, until=args.until, limit=args.limit)
+    elapsed = (time.perf_counter() - started) * 1000
+    index.close()
+    
+    for result in results:
+        heading = f" [{result['heading']}]" if result['heading'] else ''
+        print(f"{result['date']} {result['path']}{heading}")
+        print(f"    {' '.join(result['snippet'].split())}")
+    print(f"{len(results)} result(s) in {elapsed:.1f}ms")
 
 def main():
     """Main entry point."""
-    generator = AIDigestGenerator()
-    generator.run()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Generate the Pulse AI digest of recent GitHub activity.")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="bypass the on-disk GitHub response and summary caches in digests/.cache")
+    parser.add_argument('--full-rescan', action='store_true',
+                        help="ignore collection watermarks and re-scan the full 24-hour window")
+    parser.add_argument('--period', choices=['daily', *ROLLUP_PERIOD_DAYS], default='daily',
+                        help="daily digest from GitHub, or a rollup built from stored snapshots and digests")
+    parser.add_argument('--no-resume', action='store_true',
+                        help="discard the checkpoints of a failed run and start again from collection")
+    parser.add_argument('--record', metavar='DIR',
+                        help="record every GitHub and Gemini response to fixtures in DIR (nothing is sent or pushed)")
+    parser.add_argument('--replay', metavar='DIR',
+                        help="serve GitHub and Gemini from fixtures recorded in DIR; needs no tokens or network")
+    parser.add_argument('--replay-latency-ms', type=float, default=0.0,
+                        help="latency to inject into each replayed request (default 0)")
+    commands = parser.add_subparsers(dest='command')
+    search = commands.add_parser('search', help="search past digests instead of generating a new one")
+    search.add_argument('query', nargs='*', help="words to find in digest text")
+    search.add_argument('--repo', help="only digests covering this owner/repo")
+    search.add_argument('--number', type=int, help="only digests mentioning this PR or issue number")
+    search.add_argument('--since', help="earliest digest date (YYYY-MM-DD)")
+    search.add_argument('--until', help="latest digest date (YYYY-MM-DD)")
+    search.add_argument('--limit', type=int, default=20, help="maximum number of results (default 20)")
+    commands.add_parser('collect', help="only collect GitHub activity, saving it for 'summarize'")
+    commands.add_parser('summarize', help="only generate and save the digest from the last 'collect'")
+    commands.add_parser('publish', help="only send and push the digest saved by the last 'summarize'")
+    batch = commands.add_parser('batch', help="run several digest configurations (tenants) in one process")
+    batch.add_argument('tenants', help="JSON file listing the tenants (see batch.py)")
+    args = parser.parse_args()
+    
+    if args.command == 'search':
+        search_digests(args)
+        return
+    
+    if args.record and args.replay:
+        parser.error("--record and --replay are mutually exclusive")
+    fixtures = None
+    if args.record or args.replay:
+        from replay import FixtureStore
+    if args.record:
+        fixtures = FixtureStore(Path(args.record), 'record')
+    elif args.replay:
+        fixtures = FixtureStore(Path(args.replay), 'replay', latency=args.replay_latency_ms / 1000)
+    
+    if args.command == 'batch':
+        from batch import DigestBatch, load_tenants
+        failed = DigestBatch(AIDigestGenerator, load_tenants(Path(args.tenants)), use_cache=not args.no_cache,
+                             full_rescan=args.full_rescan, fixtures=fixtures).run()
+        if failed:
+            logger.error(f"Failed tenants: {', '.join(failed)}")
+            sys.exit(1)
+        return
+    
+    generator = AIDigestGenerator(use_cache=not args.no_cache, full_rescan=args.full_rescan, period=args.period,
+                                  fixtures=fixtures)
+    if args.command in ('collect', 'summarize', 'publish'):
+        if args.period != 'daily':
+            parser.error(f"'{args.command}' is a step of the daily digest; rollups run as a whole")
+        generator.run_stage(args.command)
+    elif args.period == 'daily':
+        generator.run(resume=not args.no_resume)
+    else:
+        generator.run_rollup()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
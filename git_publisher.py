@@ -0,0 +1,112 @@
+"""
+Git publishing for digests.
+
+Each digest is committed together with its sidecar files (watermarks,
+activity snapshot) in a single commit. Commits are pushed once, after all of
+a run's digests are committed. Publishing takes two git processes per digest
+(one `git add` for all of its files, then `git commit`) and one per push, where
+the previous flow also ran `git rev-parse` after every commit:
+
+- The new commit is taken from `git commit`'s own output, and expanded to the
+  full sha by reading .git directly, instead of running `git rev-parse`.
+- A commit with nothing staged is skipped instead of failing the run, which
+  happens when a resumed run has already committed.
+- A push rejected because the remote moved on (a concurrent run pushed
+  first) is rebased onto the remote and retried.
+
+`repo_dir` and `remote` make it easy to point at a scratch clone of a local
+bare repository.
+"""
+
+import logging
+import re
+import subprocess
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+REJECTED_MARKERS = ('non-fast-forward', 'fetch first', '[rejected]', 'failed to push some refs')
+# First line of `git commit` output: "[main 1a2b3c4] message" or "[main (root-commit) 1a2b3c4] message"
+COMMITTED = re.compile(r'^\[[^\]]* ([0-9a-f]{7,})\]')
+
+
+class GitPublisher:
+    def __init__(self, repo_dir: Path = Path('.'), remote: Optional[str] = None, max_attempts: int = 3):
+        self.repo_dir = Path(repo_dir)
+        self.remote = remote
+        self.max_attempts = max(1, max_attempts)
+        # Commits made since the last successful push
+        self.unpushed: List[str] = []
+
+    def _git(self, *args: str, check: bool = True) -> subprocess.CompletedProcess:
+        return subprocess.run(['git', *args], cwd=self.repo_dir, capture_output=True, text=True, check=check)
+
+    def head(self) -> str:
+        """The commit HEAD points at, read from .git without running git where possible."""
+        return self._read_head() or self._git('rev-parse', 'HEAD').stdout.strip()
+
+    def _read_head(self) -> Optional[str]:
+        git_dir = self.repo_dir / '.git'
+        try:
+            ref = (git_dir / 'HEAD').read_text(encoding='utf-8').strip()
+            if not ref.startswith('ref: '):
+                return ref
+            name = ref[len('ref: '):]
+            loose = git_dir / name
+            if loose.exists():
+                return loose.read_text(encoding='utf-8').strip()
+            for line in (git_dir / 'packed-refs').read_text(encoding='utf-8').splitlines():
+                if line.endswith(f' {name}'):
+                    return line.split(' ', 1)[0]
+        except OSError:
+            # Worktrees and submodules keep .git elsewhere
+            pass
+        return None
+
+    def contains(self, sha: str) -> bool:
+        """Whether HEAD already includes a commit (e.g. one checkpointed by an earlier attempt)."""
+        return self._git('merge-base', '--is-ancestor', sha, 'HEAD', check=False).returncode == 0
+
+    def commit(self, paths: List[str], message: str) -> Optional[str]:
+        """Stage the paths and commit them in one commit; returns the new commit, or None if nothing changed."""
+        existing = [path for path in paths if Path(self.repo_dir, path).exists()]
+        if not existing:
+            logger.info("Nothing to commit")
+            return None
+        self._git('add', '--', *existing)
+        result = self._git('commit', '-m', message, '--', *existing, check=False)
+        if result.returncode != 0:
+            if 'nothing to commit' in result.stdout or 'no changes added to commit' in result.stdout:
+                logger.info("Digest files are unchanged since the last commit; nothing to commit")
+                return None
+            raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+        match = COMMITTED.match(result.stdout)
+        if match is None:
+            sha = self.head()
+        else:
+            # git prints an abbreviated sha; HEAD now points at the full one
+            full = self._read_head()
+            sha = full if full and full.startswith(match.group(1)) else match.group(1)
+        self.unpushed.append(sha)
+        logger.info(f"Committed {len(existing)} file(s) as {sha[:7]}")
+        return sha
+
+    def push(self):
+        """Push the current branch, rebasing onto the remote and retrying when the push is rejected."""
+        target = [self.remote] if self.remote else []
+        for attempt in range(1, self.max_attempts + 1):
+            result = self._git('push', *target, check=False)
+            if result.returncode == 0:
+                if self.unpushed:
+                    logger.info(f"Pushed {len(self.unpushed)} commit(s)")
+                self.unpushed = []
+                return
+            if attempt == self.max_attempts or not any(marker in result.stderr for marker in REJECTED_MARKERS):
+                raise subprocess.CalledProcessError(result.returncode, result.args, result.stdout, result.stderr)
+            logger.warning(f"Push rejected, the remote has new commits; rebasing and retrying "
+                           f"(attempt {attempt + 1}/{self.max_attempts})")
+            rebase = self._git('pull', '--rebase', *target, check=False)
+            if rebase.returncode != 0:
+                self._git('rebase', '--abort', check=False)
+                raise subprocess.CalledProcessError(rebase.returncode, rebase.args, rebase.stdout, rebase.stderr)
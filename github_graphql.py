@@ -0,0 +1,275 @@
+"""
+Batched GitHub collection through the GraphQL API.
+
+One query returns a repository's commits, pull requests (with their changed
+files) and issues, so a repository costs a handful of requests instead of one
+REST call per commit and per pull request.
+"""
+
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+
+from records import FILES_KEPT, CommitRecord, IssueRecord, PullRequestRecord, cap_files, truncate_body
+
+logger = logging.getLogger(__name__)
+
+GRAPHQL_URL = 'https://api.github.com/graphql'
+
+COMMIT_PAGE_SIZE = 100
+PR_PAGE_SIZE = 50
+ISSUE_PAGE_SIZE = 100
+LABELS_PER_ITEM = 20
+
+COMMIT_FIELDS = """
+    pageInfo { hasNextPage endCursor }
+    nodes {
+        oid
+        message
+        author { name date user { login } }
+        associatedPullRequests(first: 1) { nodes { number } }
+    }
+"""
+
+PR_FIELDS = f"""
+    pageInfo {{ hasNextPage endCursor }}
+    nodes {{
+        number title body state createdAt updatedAt mergedAt closedAt
+        author {{ login }}
+        labels(first: {LABELS_PER_ITEM}) {{ nodes {{ name }} }}
+        files(first: {FILES_KEPT}) {{ nodes {{ path }} }}
+    }}
+"""
+
+ISSUE_FIELDS = f"""
+    pageInfo {{ hasNextPage endCursor }}
+    nodes {{
+        number title body state createdAt updatedAt
+        author {{ login }}
+        labels(first: {LABELS_PER_ITEM}) {{ nodes {{ name }} }}
+        comments {{ totalCount }}
+    }}
+"""
+
+COMMITS_CONNECTION = f"""
+    defaultBranchRef {{
+        target {{
+            ... on Commit {{
+                history(first: {COMMIT_PAGE_SIZE}, since: $commitSince, until: $commitUntil, after: $commitCursor) {{
+                    {COMMIT_FIELDS}
+                }}
+            }}
+        }}
+    }}
+"""
+
+PRS_CONNECTION = f"""
+    pullRequests(first: {PR_PAGE_SIZE}, after: $prCursor, orderBy: {{field: UPDATED_AT, direction: DESC}}) {{
+        {PR_FIELDS}
+    }}
+"""
+
+ISSUES_CONNECTION = f"""
+    issues(first: {ISSUE_PAGE_SIZE}, after: $issueCursor, filterBy: {{since: $issueSince}},
+           orderBy: {{field: UPDATED_AT, direction: DESC}}) {{
+        {ISSUE_FIELDS}
+    }}
+"""
+
+QUERY_VARIABLES = {
+    'commits': ['$commitSince: GitTimestamp!', '$commitUntil: GitTimestamp!', '$commitCursor: String'],
+    'pull_requests': ['$prCursor: String'],
+    'issues': ['$issueSince: DateTime!', '$issueCursor: String'],
+}
+
+CONNECTIONS = {
+    'commits': COMMITS_CONNECTION,
+    'pull_requests': PRS_CONNECTION,
+    'issues': ISSUES_CONNECTION,
+}
+
+
+class GraphQLError(Exception):
+    """Raised when the GraphQL API reports errors for a query."""
+
+
+def _build_query(parts: List[str]) -> str:
+    """Build a query fetching the given connections ('commits', 'pull_requests', 'issues')."""
+    declarations = ['$owner: String!', '$name: String!']
+    for part in parts:
+        declarations.extend(QUERY_VARIABLES[part])
+    body = ''.join(CONNECTIONS[part] for part in parts)
+    return f"query({', '.join(declarations)}) {{ repository(owner: $owner, name: $name) {{ description {body} }} }}"
+
+
+def _iso(timestamp: str) -> str:
+    """Normalize a GraphQL timestamp to the isoformat() strings the REST collector produces."""
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).isoformat()
+
+
+def _naive(timestamp: str) -> datetime:
+    return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).replace(tzinfo=None)
+
+
+def _state(state: str) -> str:
+    # REST reports merged pull requests as closed
+    return 'closed' if state == 'MERGED' else state.lower()
+
+
+def _login(node: Dict[str, Any]) -> str:
+    # Deleted accounts come back as a null author
+    return (node.get('author') or {}).get('login') or 'ghost'
+
+
+class GraphQLCollector:
+    """Collects the per-repository `data` dict used by generate_gemini_prompt."""
+
+    def __init__(self, token: str, timeout: int, session: Optional[requests.Session] = None):
+        self.timeout = timeout
+        self.session = session or requests.Session()
+        self.headers = {'Authorization': f'bearer {token}'}
+
+    def query(self, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a GraphQL query and return its `data` payload."""
+        response = self.session.post(GRAPHQL_URL, json={'query': query, 'variables': variables},
+                                     headers=self.headers, timeout=self.timeout)
+        response.raise_for_status()
+        payload = response.json()
+        if payload.get('errors'):
+            raise GraphQLError('; '.join(error.get('message', str(error)) for error in payload['errors']))
+        return payload['data']
+
+    def collect_repo(self, repo_name: str, since: datetime, until: datetime,
+                     max_prs: int, max_issues: int) -> Tuple[Dict[str, Any], int]:
+        """Collect commits, pull requests and issues updated in [since, until].
+
+        Returns the data dict and the number of GraphQL requests it took. Commit
+        `files_changed` is filled in by the caller, since GraphQL does not expose
+        per-commit file lists; `pr_number` records the commit's pull request.
+        """
+        owner, name = repo_name.split('/', 1)
+        window_start = since.strftime('%Y-%m-%dT%H:%M:%SZ')
+        variables = {
+            'owner': owner,
+            'name': name,
+            'commitSince': window_start,
+            'commitUntil': until.strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'issueSince': window_start,
+            'commitCursor': None,
+            'prCursor': None,
+            'issueCursor': None,
+        }
+        data = {
+            'name': repo_name,
+            'description': '',
+            'commits': [],
+            'pull_requests': [],
+            'issues': [],
+            'file_changes': []
+        }
+        pending = ['commits', 'pull_requests', 'issues']
+        request_count = 0
+
+        while pending:
+            query = _build_query(pending)
+            used = {key: value for key, value in variables.items() if f'${key}:' in query}
+            repository = self.query(query, used)['repository']
+            request_count += 1
+            if repository is None:
+                raise GraphQLError(f"Repository {repo_name} not found")
+            data['description'] = repository.get('description') or ''
+
+            next_pending = []
+            if 'commits' in pending:
+                cursor = self._read_commits(repository, data)
+                if cursor:
+                    variables['commitCursor'] = cursor
+                    next_pending.append('commits')
+            if 'pull_requests' in pending:
+                cursor = self._read_updated(repository['pullRequests'], data['pull_requests'],
+                                            since, until, max_prs, self._pr_record)
+                if cursor:
+                    variables['prCursor'] = cursor
+                    next_pending.append('pull_requests')
+            if 'issues' in pending:
+                cursor = self._read_updated(repository['issues'], data['issues'],
+                                            since, until, max_issues, self._issue_record)
+                if cursor:
+                    variables['issueCursor'] = cursor
+                    next_pending.append('issues')
+            pending = next_pending
+
+        return data, request_count
+
+    def _read_commits(self, repository: Dict[str, Any], data: Dict[str, Any]) -> Optional[str]:
+        """Append a page of commits; return the next cursor if there are more."""
+        branch = repository.get('defaultBranchRef')
+        if not branch:
+            # Empty repository
+            return None
+        history = branch['target']['history']
+        for node in history['nodes']:
+            pull_requests = node['associatedPullRequests']['nodes']
+            data['commits'].append(CommitRecord(
+                sha=node['oid'][:8],
+                full_sha=node['oid'],
+                message=node['message'],
+                author=(node.get('author') or {}).get('name') or 'unknown',
+                login=((node.get('author') or {}).get('user') or {}).get('login'),
+                date=_iso(node['author']['date']),
+                files_changed=[],
+                pr_number=pull_requests[0]['number'] if pull_requests else None,
+            ))
+        page = history['pageInfo']
+        return page['endCursor'] if page['hasNextPage'] else None
+
+    def _read_updated(self, connection: Dict[str, Any], records: List[Dict[str, Any]],
+                      since: datetime, until: datetime, limit: int, to_record) -> Optional[str]:
+        """Append items updated inside the window from a newest-first page.
+
+        Returns the next cursor only if the page ended inside the window and the
+        limit has not been reached, so stale history is never requested.
+        """
+        for node in connection['nodes']:
+            updated = _naive(node['updatedAt'])
+            if updated > until:
+                continue
+            if updated < since or len(records) >= limit:
+                return None
+            records.append(to_record(node))
+        page = connection['pageInfo']
+        if len(records) >= limit or not page['hasNextPage']:
+            return None
+        return page['endCursor']
+
+    @staticmethod
+    def _pr_record(node: Dict[str, Any]) -> PullRequestRecord:
+        return PullRequestRecord(
+            number=node['number'],
+            title=node['title'],
+            body=truncate_body(node['body']),
+            state=_state(node['state']),
+            author=_login(node),
+            created_at=_iso(node['createdAt']),
+            updated_at=_iso(node['updatedAt']),
+            merged_at=_iso(node['mergedAt']) if node.get('mergedAt') else None,
+            closed_at=_iso(node['closedAt']) if node.get('closedAt') else None,
+            labels=[label['name'] for label in node['labels']['nodes']],
+            files_changed=cap_files(f['path'] for f in (node.get('files') or {}).get('nodes', [])),
+        )
+
+    @staticmethod
+    def _issue_record(node: Dict[str, Any]) -> IssueRecord:
+        return IssueRecord(
+            number=node['number'],
+            title=node['title'],
+            body=truncate_body(node['body']),
+            state=_state(node['state']),
+            author=_login(node),
+            created_at=_iso(node['createdAt']),
+            updated_at=_iso(node['updatedAt']),
+            labels=[label['name'] for label in node['labels']['nodes']],
+            comments_count=node['comments']['totalCount'],
+        )
@@ -0,0 +1,335 @@
+"""
+HTTP transport shared by every GitHub request.
+
+PyGithub lets callers inject their own connection classes. We use that hook to
+send all REST calls through one pooled requests.Session and a persistent
+response cache that revalidates entries with If-None-Match / If-Modified-Since,
+so unchanged resources come back as 304s that do not count against the rate limit.
+
+The session itself (also used for GraphQL) hands every request to a shared
+RequestScheduler, which paces workers with a token bucket, slows down as the
+rate limit budget runs out and retries throttled requests with backoff. It
+also counts what each thread sends inside `track()`, so collection metrics
+report the requests a repository really took.
+"""
+
+import hashlib
+import logging
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+import requests
+from github.GithubRetry import GithubRetry
+from github.Requester import Requester
+
+from sqlite_cache import SQLiteCache
+
+logger = logging.getLogger(__name__)
+
+# Commit details addressed by full SHA never change, so they are served without revalidation
+IMMUTABLE_PATH = re.compile(r'/repos/[^/]+/[^/]+/commits/[0-9a-f]{40}$')
+
+
+def cache_key(url: str, headers: Dict[str, str]) -> str:
+    """Key a response by URL and credentials, so tokens with different access never share entries."""
+    authorization = headers.get('Authorization', '')
+    return hashlib.sha256(f"{url}\n{authorization}".encode('utf-8')).hexdigest()
+
+
+class CachedResponse:
+    # mimic the httplib response object PyGithub expects
+    def __init__(self, status: int, headers: Dict[str, str], text: str):
+        self.status = status
+        self.headers = headers
+        self.text = text
+
+    def getheaders(self):
+        return self.headers.items()
+
+    def read(self) -> str:
+        return self.text
+
+
+class GitHubConnection:
+    """PyGithub connection class backed by the shared session and response cache."""
+
+    session: Optional[requests.Session] = None
+    cache: Optional[SQLiteCache] = None
+
+    def __init__(self, host: str, port: Optional[int] = None, strict: bool = False,
+                 timeout: Optional[int] = None, retry: Any = None, pool_size: Optional[int] = None, **kwargs):
+        self.host = host
+        self.port = port if port else 443
+        self.protocol = 'https'
+        self.timeout = timeout
+        self.verify = kwargs.get('verify', True)
+
+    def request(self, verb: str, url: str, input: Any, headers: Dict[str, str]):
+        self.verb = verb
+        self.url = url
+        self.input = input
+        self.headers = headers
+
+    def getresponse(self) -> CachedResponse:
+        url = f"{self.protocol}://{self.host}:{self.port}{self.url}"
+        headers = dict(self.headers)
+        key = None
+        cached = None
+
+        conditional = 'If-None-Match' in headers or 'If-Modified-Since' in headers
+        if self.cache is not None and self.verb == 'GET' and not conditional:
+            key = cache_key(url, headers)
+            cached = self.cache.get(key)
+            if cached is not None:
+                body, meta = cached
+                if IMMUTABLE_PATH.search(urlparse(self.url).path):
+                    self.cache.record(hit=True)
+                    return CachedResponse(200, meta['headers'], body.decode('utf-8'))
+                if meta.get('etag'):
+                    headers['If-None-Match'] = meta['etag']
+                if meta.get('last_modified'):
+                    headers['If-Modified-Since'] = meta['last_modified']
+
+        response = self.session.request(self.verb, url, headers=headers, data=self.input,
+                                        timeout=self.timeout, verify=self.verify, allow_redirects=False)
+
+        if key is not None:
+            if response.status_code == 304 and cached is not None:
+                body, meta = cached
+                self.cache.record(hit=True)
+                self.cache.touch(key)
+                # Keep the cached representation but pick up fresh rate limit headers
+                merged = dict(meta['headers'])
+                merged.update(response.headers)
+                return CachedResponse(200, merged, body.decode('utf-8'))
+            self.cache.record(hit=False)
+            etag = response.headers.get('ETag')
+            last_modified = response.headers.get('Last-Modified')
+            if response.status_code == 200 and (etag or last_modified):
+                self.cache.put(key, response.text.encode('utf-8'), {
+                    'headers': dict(response.headers),
+                    'etag': etag,
+                    'last_modified': last_modified,
+                })
+
+        return CachedResponse(response.status_code, dict(response.headers), response.text)
+
+    def close(self):
+        # The shared session outlives individual connections
+        pass
+
+
+class RequestScheduler:
+    """Shared pacing and retry policy for GitHub requests.
+
+    A token bucket admits `rate` requests per second (bursting to `burst`).
+    Rate limit headers from every response update the budget; once less than
+    `low_budget_ratio` of it remains, the rate drops so the rest is spread
+    until the reset. Throttled (403/429) and transient (5xx, connection)
+    failures are retried up to `max_retries` times, honoring Retry-After or the
+    reset time, otherwise with jittered exponential backoff. While one worker
+    is backing off every worker pauses, instead of each burning its retries.
+    """
+
+    RETRYABLE_STATUSES = {500, 502, 503, 504}
+
+    def __init__(self, rate: float, burst: int, max_retries: int, base_delay: float,
+                 max_wait: float, low_budget_ratio: float = 0.1):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_wait = max_wait
+        self.low_budget_ratio = low_budget_ratio
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.waited_seconds = 0.0
+        self.response_bytes = 0
+        # resource -> {'first': remaining at first response, 'remaining', 'limit', 'reset'}
+        self.budgets: Dict[str, Dict[str, int]] = {}
+        self._local = threading.local()
+
+    @contextmanager
+    def track(self) -> Iterator[Dict[str, int]]:
+        """Count the requests, retries and 304 responses the calling thread sends inside the block."""
+        counts = {'requests': 0, 'retries': 0, 'not_modified': 0}
+        outer = getattr(self._local, 'counts', None)
+        self._local.counts = counts
+        try:
+            yield counts
+        finally:
+            self._local.counts = outer
+            if outer is not None:
+                for key, value in counts.items():
+                    outer[key] += value
+
+    def _count(self, key: str):
+        counts = getattr(self._local, 'counts', None)
+        if counts is not None:
+            counts[key] += 1
+
+    def acquire(self):
+        """Block until the token bucket admits one request."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = self._paused_until - now
+                if wait <= 0:
+                    self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                    self._updated = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        self.requests += 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                self.waited_seconds += wait
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold every worker for the given time."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def observe(self, headers) -> Optional[Dict[str, int]]:
+        """Record rate limit headers and adapt the request rate to the remaining budget."""
+        if 'X-RateLimit-Remaining' not in headers:
+            return None
+        resource = headers.get('X-RateLimit-Resource', 'core')
+        remaining = int(headers['X-RateLimit-Remaining'])
+        limit = int(headers.get('X-RateLimit-Limit', remaining))
+        reset = int(headers.get('X-RateLimit-Reset', 0))
+        with self._lock:
+            budget = self.budgets.setdefault(resource, {'first': remaining})
+            budget.update(remaining=remaining, limit=limit, reset=reset)
+            if limit and remaining < limit * self.low_budget_ratio:
+                seconds_to_reset = max(1.0, reset - time.time())
+                self.rate = max(0.1, min(self.max_rate, remaining / seconds_to_reset))
+            else:
+                self.rate = self.max_rate
+        return budget
+
+    def _retry_delay(self, response: Optional[requests.Response], attempt: int) -> Optional[float]:
+        """Seconds to wait before retrying, or None if the response should be returned as is."""
+        backoff = self.base_delay * (2 ** attempt) * random.uniform(0.5, 1.5)
+        if response is None:
+            return backoff
+        status = response.status_code
+        if status in self.RETRYABLE_STATUSES:
+            return backoff
+        if status not in (403, 429):
+            return None
+        retry_after = response.headers.get('Retry-After')
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        if response.headers.get('X-RateLimit-Remaining') == '0':
+            return max(1.0, int(response.headers.get('X-RateLimit-Reset', 0)) - time.time() + 1)
+        if status == 429 or 'rate limit' in response.text.lower():
+            return backoff
+        # A plain 403 is a permission error, not throttling
+        return None
+
+    def send(self, send_request: Callable[[], requests.Response]) -> requests.Response:
+        """Send a request through the bucket, retrying throttled and transient failures."""
+        for attempt in range(self.max_retries + 1):
+            self.acquire()
+            self._count('requests')
+            response = None
+            try:
+                response = send_request()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+            if response is not None:
+                if response.status_code == 304:
+                    self._count('not_modified')
+                self.observe(response.headers)
+                with self._lock:
+                    self.response_bytes += len(response.content)
+            delay = self._retry_delay(response, attempt)
+            if delay is None or attempt == self.max_retries:
+                return response
+            if delay > self.max_wait:
+                logger.warning(f"GitHub asked to wait {delay:.0f}s, more than the {self.max_wait:.0f}s limit; giving up")
+                return response
+            reason = response.status_code if response is not None else 'connection error'
+            logger.warning(f"GitHub request throttled or failed ({reason}); retrying in {delay:.1f}s "
+                           f"(attempt {attempt + 1}/{self.max_retries})")
+            with self._lock:
+                self.retries += 1
+            self._count('retries')
+            self.pause(delay)
+        return response
+
+    def usage(self) -> Dict[str, Any]:
+        """Requests, retries, pacing and rate limit consumption as structured data."""
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'retries': self.retries,
+                'paced_seconds': round(self.waited_seconds, 3),
+                'response_bytes': self.response_bytes,
+                'rate_limit': {
+                    resource: {'used': budget['first'] - budget['remaining'], 'remaining': budget['remaining'],
+                               'limit': budget['limit']}
+                    for resource, budget in sorted(self.budgets.items())
+                },
+            }
+
+    def summary(self) -> str:
+        """Describe the requests sent and the rate limit budget consumed this run."""
+        parts = [f"{self.requests} requests, {self.retries} retries, {self.waited_seconds:.1f}s paced"]
+        with self._lock:
+            for resource, budget in sorted(self.budgets.items()):
+                used = budget['first'] - budget['remaining']
+                parts.append(f"{resource}: used {used}, {budget['remaining']}/{budget['limit']} remaining")
+        return '; '.join(parts)
+
+
+class ScheduledSession(requests.Session):
+    """Session whose requests all go through the shared RequestScheduler."""
+
+    def __init__(self, scheduler: Optional[RequestScheduler] = None):
+        super().__init__()
+        self.scheduler = scheduler
+
+    def request(self, method, url, *args, **kwargs):
+        if self.scheduler is None:
+            return super().request(method, url, *args, **kwargs)
+        return self.scheduler.send(lambda: super(ScheduledSession, self).request(method, url, *args, **kwargs))
+
+
+def create_session(pool_size: int, scheduler: Optional[RequestScheduler] = None,
+                   adapter: Optional[requests.adapters.BaseAdapter] = None) -> requests.Session:
+    """Create a pooled session; retries are left to the scheduler when one is given.
+
+    A custom transport `adapter` (e.g. for recording or replaying traffic) replaces the pooled one.
+    """
+    session = ScheduledSession(scheduler)
+    # Stop requests from falling back to credentials in ~/.netrc, as PyGithub does
+    session.auth = Requester.noopAuth
+    if adapter is None:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                                                max_retries=0 if scheduler else GithubRetry())
+    session.mount('https://', adapter)
+    return session
+
+
+def install_transport(pool_size: int, cache: Optional[SQLiteCache],
+                      scheduler: Optional[RequestScheduler] = None,
+                      adapter: Optional[requests.adapters.BaseAdapter] = None) -> requests.Session:
+    """Route every PyGithub request through a shared session, the scheduler and the optional cache."""
+    session = create_session(pool_size, scheduler, adapter)
+    GitHubConnection.session = session
+    GitHubConnection.cache = cache
+    Requester.injectConnectionClasses(GitHubConnection, GitHubConnection)
+    return session
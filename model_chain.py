@@ -0,0 +1,303 @@
+"""
+Model provider chain for digest generation.
+
+MODEL_CHAIN in config.py (or the DIGEST_MODEL_CHAIN environment variable, as
+JSON) lists the tiers every generation call may use, in order:
+
+    {"type": "gemini", "model": "gemini-1.5-flash"}
+    {"type": "gemini", "model": "gemini-1.5-pro", "timeout": 180}
+    {"type": "local"}     # deterministic stand-in, for tests and offline runs
+
+Each tier gets a deadline (its `timeout`, else MODEL_CALL_TIMEOUT_SECONDS).
+If a tier has not responded (first chunk when streaming, the whole reply
+otherwise) within MODEL_HEDGE_PERCENTILE of its recent latencies, one hedged
+duplicate request is sent and whichever answers first is used. A tier that
+fails, returns nothing or misses its deadline hands over to the next one;
+only when every tier has failed does the caller fall back to the count-only
+digest. Recent latencies are kept in a small JSON file between runs.
+"""
+
+import json
+import logging
+import math
+import os
+import queue
+import re
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ModelChainExhausted(Exception):
+    """Raised when no tier of the chain produced a response."""
+
+
+class GeminiModel:
+    """A google.generativeai model whose requests are cut off at the tier's deadline."""
+
+    def __init__(self, model: Any, timeout: float):
+        self.model = model
+        self.model_name = model.model_name
+        self.timeout = timeout
+
+    def generate_content(self, prompt: str, stream: bool = False) -> Any:
+        return self.model.generate_content(prompt, stream=stream, request_options={'timeout': self.timeout})
+
+
+class LocalResponse:
+    """Stands in for a model response: `.text`, `.usage_metadata` and chunk iteration when streamed."""
+
+    def __init__(self, text: str, prompt: str, latency: float):
+        self.text = text
+        self.latency = latency
+        # Same rough estimate as the prompt builder: about four characters per token
+        self.usage_metadata = SimpleNamespace(prompt_token_count=(len(prompt) + 3) // 4,
+                                              candidates_token_count=(len(text) + 3) // 4)
+
+    def __iter__(self) -> Iterator[SimpleNamespace]:
+        time.sleep(self.latency)
+        for line in self.text.splitlines(keepends=True):
+            yield SimpleNamespace(text=line)
+
+
+class LocalModel:
+    """Deterministic stand-in for a hosted model; no network, no credentials.
+
+    Replies with a plain digest listing the repositories in the prompt and their
+    activity counts. `latency_ms` delays each reply and `fail` makes every call
+    raise, to exercise hedging and fallback.
+    """
+
+    model_name = 'local'
+
+    def __init__(self, latency_ms: float = 0.0, fail: bool = False):
+        self.latency = latency_ms / 1000
+        self.fail = fail
+
+    def generate_content(self, prompt: str, stream: bool = False) -> LocalResponse:
+        if self.fail:
+            raise RuntimeError("Local model configured to fail")
+        sections = []
+        for block in re.split(r'^## ', prompt, flags=re.MULTILINE)[1:]:
+            name = block.split('\n', 1)[0].strip()
+            counts = re.findall(r'^### (.+?) \((\d+)\)', block, flags=re.MULTILINE)
+            # Repository blocks list their activity counts; other headings (reference tables) are skipped
+            if counts:
+                detail = ', '.join(f"{count} {label.lower()}" for label, count in counts)
+                sections.append(f"### {name}\n- {detail}\n")
+        text = ("# Pulse AI Digest\n\n## Executive Summary\n"
+                f"Activity in {len(sections)} repositories, summarized by the local stand-in model.\n\n"
+                "## Repository Breakdown\n" + '\n'.join(sections))
+        response = LocalResponse(text, prompt, self.latency)
+        if not stream:
+            time.sleep(self.latency)
+        return response
+
+
+class ModelTier:
+    """One entry of the chain; its model is created on first use."""
+
+    def __init__(self, name: str, factory: Callable[[], Any], timeout: float):
+        self.name = name
+        self.timeout = timeout
+        self._factory = factory
+        self._model = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> Any:
+        with self._lock:
+            if self._model is None:
+                self._model = self._factory()
+            return self._model
+
+
+class ModelResult:
+    def __init__(self, text: str, tier: str, seconds: float, first_token_seconds: Optional[float],
+                 usage: Any, hedged: bool, failed_tiers: List[str]):
+        self.text = text
+        self.tier = tier
+        self.seconds = seconds
+        self.first_token_seconds = first_token_seconds
+        self.usage = usage
+        self.hedged = hedged
+        self.failed_tiers = failed_tiers
+
+
+class LatencyHistory:
+    """Recent response latencies per tier and call kind, optionally kept on disk between runs."""
+
+    def __init__(self, path: Optional[Path], size: int):
+        self.path = Path(path) if path else None
+        self.size = size
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+        if self.path is not None and self.path.exists():
+            try:
+                self.samples = json.loads(self.path.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable model latency history: {e}")
+
+    def percentile(self, key: str, share: float, min_samples: int) -> Optional[float]:
+        """Nearest-rank percentile of the recorded latencies, or None with fewer than min_samples."""
+        with self._lock:
+            values = sorted(self.samples.get(key, []))
+        if len(values) < max(1, min_samples):
+            return None
+        return values[max(0, math.ceil(len(values) * share) - 1)]
+
+    def record(self, key: str, seconds: float):
+        with self._lock:
+            values = self.samples.setdefault(key, [])
+            values.append(round(seconds, 3))
+            del values[:-self.size]
+            if self.path is None:
+                return
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                tmp_path = self.path.with_suffix('.tmp')
+                tmp_path.write_text(json.dumps(self.samples), encoding='utf-8')
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                logger.warning(f"Could not save the model latency history: {e}")
+
+
+def load_chain_specs(default: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The configured tiers: DIGEST_MODEL_CHAIN from the environment (JSON) if set, else config.py."""
+    raw = os.getenv('DIGEST_MODEL_CHAIN')
+    specs = json.loads(raw) if raw else default
+    if not specs:
+        raise ValueError("The model chain needs at least one tier")
+    return specs
+
+
+def build_tiers(specs: List[Dict[str, Any]], gemini: Callable[[str, float], Any],
+                default_timeout: float) -> List[ModelTier]:
+    """Tiers for the specs; `gemini(model_name, timeout)` creates a hosted Gemini model."""
+    tiers = []
+    for spec in specs:
+        kind = spec.get('type', 'gemini')
+        timeout = float(spec.get('timeout', default_timeout))
+        if kind == 'gemini':
+            name = spec['model']
+            factory = (lambda name=name, timeout=timeout: gemini(name, timeout))
+        elif kind == 'local':
+            name = 'local'
+            factory = (lambda spec=spec: LocalModel(spec.get('latency_ms', 0), spec.get('fail', False)))
+        else:
+            raise ValueError(f"Unknown model tier type: {kind}")
+        tiers.append(ModelTier(spec.get('name', name), factory, timeout))
+    names = [tier.name for tier in tiers]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Model tier names must be unique (set 'name'): {', '.join(names)}")
+    return tiers
+
+
+class ModelChain:
+    def __init__(self, tiers: List[ModelTier], history: LatencyHistory, hedge_percentile: Optional[float],
+                 hedge_min_samples: int, hedge_default_seconds: Optional[float]):
+        self.tiers = tiers
+        self.history = history
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_default_seconds = hedge_default_seconds
+
+    @property
+    def primary(self) -> str:
+        return self.tiers[0].name
+
+    def hedge_delay(self, key: str) -> Optional[float]:
+        """How long to wait for a response before sending a hedged request (None: never hedge)."""
+        if not self.hedge_percentile:
+            return None
+        delay = self.history.percentile(key, self.hedge_percentile, self.hedge_min_samples)
+        return delay if delay is not None else self.hedge_default_seconds
+
+    def generate(self, prompt: str, label: str, on_chunk: Optional[Callable[[str], None]] = None,
+                 kind: str = 'digest') -> ModelResult:
+        """Generate with the first tier that answers in time; raises ModelChainExhausted if none does.
+
+        `kind` groups calls of similar size ('digest', 'repo') so each is hedged against its own latencies.
+        """
+        failed: List[str] = []
+        errors = []
+        for tier in self.tiers:
+            try:
+                result = self._call_tier(tier, prompt, on_chunk, kind)
+            except Exception as e:
+                logger.warning(f"Model tier {tier.name} failed for {label}: {e}")
+                failed.append(tier.name)
+                errors.append(f"{tier.name}: {e}")
+                continue
+            result.failed_tiers = failed
+            if failed:
+                logger.info(f"{label} served by fallback tier {tier.name} after {', '.join(failed)} failed")
+            return result
+        raise ModelChainExhausted(f"Every model tier failed ({'; '.join(errors)})")
+
+    def _call_tier(self, tier: ModelTier, prompt: str, on_chunk: Optional[Callable[[str], None]],
+                   kind: str) -> ModelResult:
+        """Call one tier within its deadline, hedging once if it is slower than usual."""
+        stream = on_chunk is not None
+        key = f"{tier.name}:{kind}:{'stream' if stream else 'call'}"
+        events: queue.Queue = queue.Queue()
+        started = time.perf_counter()
+        deadline = started + tier.timeout
+        delay = self.hedge_delay(key)
+        hedge_at = started + delay if delay is not None and delay < tier.timeout else None
+
+        def attempt(number: int):
+            try:
+                response = tier.model.generate_content(prompt, stream=stream)
+                for chunk in (response if stream else [response]):
+                    events.put((number, 'chunk', chunk.text))
+                events.put((number, 'done', response))
+            except Exception as e:
+                events.put((number, 'error', e))
+
+        def launch(number: int):
+            # Daemon threads: a request that never returns must not keep the process alive
+            threading.Thread(target=attempt, args=(number,), name=f'model-{tier.name}-{number}', daemon=True).start()
+
+        launch(1)
+        attempts, failures = 1, 0
+        winner: Optional[int] = None
+        first_token: Optional[float] = None
+        chunks: List[str] = []
+        while True:
+            wake = deadline if hedge_at is None or winner is not None else min(deadline, hedge_at)
+            try:
+                number, event, value = events.get(timeout=max(0.0, wake - time.perf_counter()))
+            except queue.Empty:
+                if time.perf_counter() >= deadline:
+                    raise TimeoutError(f"no response within {tier.timeout:g}s")
+                logger.info(f"Model tier {tier.name} slower than {delay:.2f}s; sending a hedged request")
+                launch(2)
+                attempts, hedge_at = 2, None
+                continue
+            if winner is not None and number != winner:
+                continue
+            if event == 'error':
+                failures += 1
+                # Wait for the other attempt if it is still running and nothing was relayed yet
+                if winner is None and failures < attempts:
+                    continue
+                raise value
+            if winner is None:
+                winner = number
+                first_token = time.perf_counter() - started
+                self.history.record(key, first_token)
+            if event == 'chunk':
+                chunks.append(value)
+                if on_chunk is not None:
+                    on_chunk(value)
+                continue
+            text = ''.join(chunks)
+            if not text:
+                raise ValueError("Empty response")
+            return ModelResult(text, tier.name, time.perf_counter() - started, first_token if stream else None,
+                               getattr(value, 'usage_metadata', None), hedged=attempts > 1, failed_tiers=[])
@@ -0,0 +1,252 @@
+"""
+Token-budgeted assembly of the repository activity part of the Gemini prompt.
+
+Commits are first grouped into clusters (one pull request, near-identical
+messages, overlapping files; see commit_clusters.py) and each cluster is
+rendered as one entry with its count. Every repository is rendered in full
+while the prompt fits the budget. Repositories that don't fit get a fair
+share of the budget and are compacted step by step: similar commits are collapsed, bodies and file lists
+are shortened, and finally the lowest-ranked items are dropped (priority
+labels first, then recency).
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from commit_clusters import CommitClusterer, normalize_subject
+
+logger = logging.getLogger(__name__)
+
+# (body characters, files per item, collapse similar commits) for each compaction level
+COMPACTION_LEVELS = [
+    (200, 5, False),
+    (200, 5, True),
+    (80, 3, True),
+    (0, 0, True),
+]
+
+SECTIONS = [
+    ('commits', 'Commits'),
+    ('pull_requests', 'Pull Requests'),
+    ('issues', 'Issues'),
+]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (Gemini averages about four characters per token for English and code)."""
+    return (len(text) + 3) // 4
+
+
+def _truncate(text: str, limit: int) -> str:
+    return f"{text[:limit]}{'...' if len(text) > limit else ''}"
+
+
+def _files_line(files: List[str], limit: int) -> str:
+    return f"  Files: {', '.join(files[:limit])}{'...' if len(files) > limit else ''}\n"
+
+
+class PromptBuilder:
+    """Renders repository sections within a token budget and reports what it changed."""
+
+    def __init__(self, token_budget: int, priority_labels: List[str], clusterer: Optional[CommitClusterer] = None):
+        self.token_budget = token_budget
+        self.priority_labels = {label.lower() for label in priority_labels}
+        self.clusterer = clusterer
+        self.report: Dict[str, Any] = {}
+        self._clusters: Dict[str, List[List[Dict[str, Any]]]] = {}
+
+    def build(self, header: str, repos: List[Dict[str, Any]], footer: str) -> str:
+        """Return header + repository sections + footer, compacted to fit the token budget."""
+        available = self.token_budget - estimate_tokens(header) - estimate_tokens(footer)
+        clustering = self._cluster(repos)
+        full = {repo['name']: self._render(repo, 0) for repo in repos}
+        allotments = self._allot({name: estimate_tokens(text) for name, text in full.items()}, available)
+
+        sections = []
+        compacted = {}
+        dropped = {}
+        for repo in repos:
+            name = repo['name']
+            text = full[name]
+            if estimate_tokens(text) > allotments[name]:
+                text, level, repo_dropped = self._compact(repo, allotments[name])
+                compacted[name] = level
+                if any(repo_dropped.values()):
+                    dropped[name] = repo_dropped
+            sections.append(text)
+
+        prompt = header + ''.join(sections) + footer
+        self.report = {
+            'tokens': estimate_tokens(prompt),
+            'budget': self.token_budget,
+            'uncompacted_tokens': estimate_tokens(header + ''.join(full.values()) + footer),
+            'compacted': compacted,
+            'dropped': dropped,
+        }
+        if clustering:
+            self.report['commit_clusters'] = clustering
+        self._log_report()
+        return prompt
+
+    def _cluster(self, repos: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Cluster each repository's commits; returns the compression figures (None when clustering is off)."""
+        self._clusters = {}
+        if self.clusterer is None:
+            return None
+        commits = entries = raw_tokens = clustered_tokens = 0
+        for repo in repos:
+            clusters = self.clusterer.cluster(repo['commits'])
+            self._clusters[repo['name']] = clusters
+            commits += len(repo['commits'])
+            entries += len(clusters)
+            raw_tokens += sum(estimate_tokens(self._commit_text([commit], 0)) for commit in repo['commits'])
+            clustered_tokens += sum(estimate_tokens(self._commit_text(cluster, 0)) for cluster in clusters)
+        return {
+            'commits': commits,
+            'entries': entries,
+            'ratio': round(commits / entries, 2) if entries else 1.0,
+            'commit_tokens': raw_tokens,
+            'clustered_tokens': clustered_tokens,
+        }
+
+    def _log_report(self):
+        report = self.report
+        clustering = report.get('commit_clusters')
+        if clustering and clustering['commits']:
+            logger.info(f"Clustered {clustering['commits']} commits into {clustering['entries']} prompt entries "
+                        f"({clustering['ratio']:.1f}:1; ~{clustering['commit_tokens']} -> "
+                        f"~{clustering['clustered_tokens']} tokens)")
+        logger.info(f"Prompt size: ~{report['tokens']} tokens (budget {report['budget']}, "
+                    f"~{report['uncompacted_tokens']} before compaction)")
+        for name, level in report['compacted'].items():
+            logger.info(f"Compacted {name} to level {level}")
+        for name, counts in report['dropped'].items():
+            summary = ', '.join(f"{count} {kind.replace('_', ' ')}" for kind, count in counts.items() if count)
+            logger.info(f"Dropped from {name} to fit the prompt budget: {summary}")
+
+    @staticmethod
+    def _allot(costs: Dict[str, int], available: int) -> Dict[str, int]:
+        """Split the budget fairly: small repos keep everything, the rest share what is left equally."""
+        allotments = {}
+        remaining = max(0, available)
+        pending = sorted(costs.items(), key=lambda item: item[1])
+        while pending:
+            share = remaining // len(pending)
+            name, cost = pending[0]
+            if cost <= share:
+                allotments[name] = cost
+                remaining -= cost
+                pending.pop(0)
+            else:
+                for name, _ in pending:
+                    allotments[name] = share
+                break
+        return allotments
+
+    def _compact(self, repo: Dict[str, Any], allotment: int) -> Tuple[str, int, Dict[str, int]]:
+        """Try each compaction level, then drop the lowest-ranked items until the repo fits."""
+        for level in range(1, len(COMPACTION_LEVELS)):
+            text = self._render(repo, level)
+            if estimate_tokens(text) <= allotment:
+                return text, level, {}
+
+        level = len(COMPACTION_LEVELS) - 1
+        heading, entries = self._entries(repo, level)
+        kept = sorted(entries, key=lambda entry: entry[1], reverse=True)
+        cost = estimate_tokens(heading) + sum(estimate_tokens(entry[2]) for entry in kept)
+        # Section headings are small; reserve a little room for them
+        cost += 10 * len(SECTIONS)
+        dropped = {key: 0 for key, _ in SECTIONS}
+        while kept and cost > allotment:
+            kind, _, text, weight = kept.pop()
+            cost -= estimate_tokens(text)
+            dropped[kind] += weight
+        return self._assemble(repo, heading, kept), level, dropped
+
+    def _render(self, repo: Dict[str, Any], level: int) -> str:
+        heading, entries = self._entries(repo, level)
+        return self._assemble(repo, heading, entries)
+
+    def _assemble(self, repo: Dict[str, Any], heading: str, entries: List[Tuple[str, Any, str, int]]) -> str:
+        parts = [heading]
+        for key, title in SECTIONS:
+            section = [entry for entry in entries if entry[0] == key]
+            if not section:
+                continue
+            total = len(repo[key])
+            shown = sum(entry[3] for entry in section)
+            count = f"{total}" if shown == total else f"{total}, {shown} shown"
+            parts.append(f"\n### {title} ({count})\n")
+            # Keep the collector's order (newest first) inside each section
+            parts.extend(entry[2] for entry in sorted(section, key=lambda entry: -entry[1][2]))
+        return ''.join(parts)
+
+    @staticmethod
+    def _commit_text(group: List[Dict[str, Any]], level: int) -> str:
+        """Render one commit, or a cluster of commits as a single entry with its count."""
+        body_limit, file_limit, _ = COMPACTION_LEVELS[level]
+        commit = group[0]
+        if len(group) == 1:
+            # Shorter levels keep only the subject line of the commit message
+            message = commit['message'] if body_limit >= 200 else commit['message'].split('\n', 1)[0]
+            text = f"- **{commit['sha']}** by {commit['author']}: {message}\n"
+            files = commit['files_changed']
+        else:
+            authors = ', '.join(dict.fromkeys(c['author'] for c in group))
+            numbers = {c.get('pr_number') for c in group} - {None}
+            pull_request = f" in PR #{numbers.pop()}" if len(numbers) == 1 else ''
+            subject = commit['message'].split('\n', 1)[0]
+            text = f"- **{commit['sha']}** (+{len(group) - 1} related commits{pull_request}) by {authors}: {subject}\n"
+            # Keep the other distinct subjects visible, as far as the level allows
+            seen = {normalize_subject(subject)}
+            others = []
+            for c in group[1:]:
+                other = c['message'].split('\n', 1)[0]
+                key = normalize_subject(other)
+                if key not in seen:
+                    seen.add(key)
+                    others.append(other)
+            if file_limit and others:
+                more = f" (+{len(others) - file_limit} more)" if len(others) > file_limit else ''
+                text += f"  Also: {'; '.join(others[:file_limit])}{more}\n"
+            files = list(dict.fromkeys(path for c in group for path in c['files_changed']))
+        if file_limit and files:
+            text += _files_line(files, file_limit)
+        return text
+
+    def _entries(self, repo: Dict[str, Any], level: int) -> Tuple[str, List[Tuple[str, Any, str, int]]]:
+        """Render a repo as (heading, entries); each entry is (section, rank, text, items covered).
+
+        Ranks sort ascending from least to most important: (has priority label, recency, -position).
+        """
+        body_limit, file_limit, collapse = COMPACTION_LEVELS[level]
+        heading = f"\n## {repo['name']}\nDescription: {repo['description']}\n"
+        entries = []
+
+        if repo['name'] in self._clusters:
+            clusters = self._clusters[repo['name']]
+        else:
+            clusters = [[commit] for commit in repo['commits']]
+        if collapse:
+            # Further merge clusters whose newest commits share a normalized subject
+            merged: Dict[str, List[Dict[str, Any]]] = {}
+            for index, cluster in enumerate(clusters):
+                key = normalize_subject(cluster[0]['message'])
+                merged.setdefault(key or str(index), []).extend(cluster)
+            clusters = list(merged.values())
+        for position, group in enumerate(clusters):
+            rank = (False, max(commit['date'] for commit in group), -position)
+            entries.append(('commits', rank, self._commit_text(group, level), len(group)))
+
+        for key in ('pull_requests', 'issues'):
+            for position, item in enumerate(repo[key]):
+                text = f"- **#{item['number']}** {item['title']} ({item['state']}) by {item['author']}\n"
+                if body_limit and item['body']:
+                    text += f"  Description: {_truncate(item['body'], body_limit)}\n"
+                if item['labels']:
+                    text += f"  Labels: {', '.join(item['labels'])}\n"
+                priority = any(label.lower() in self.priority_labels for label in item['labels'])
+                rank = (priority, item['updated_at'], -position)
+                entries.append((key, rank, text, 1))
+
+        return heading, entries
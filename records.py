@@ -0,0 +1,93 @@
+"""
+Compact records for collected commits, pull requests and issues.
+
+Collectors stream items from GitHub straight into these `__slots__` records
+and apply the prompt's own limits while reading: bodies are cut to the body
+length of an uncompacted prompt and file lists keep one path more than it
+shows (enough for its "..." marker). What a repository costs in memory is then
+bounded per item, however large its bodies or pull requests are, and the
+prompt renders exactly as it would from the full data.
+
+Records read like the dicts they replace (`item['title']`, `item.get(...)`,
+`{**item}`); `jsonable` serializes them for checkpoints and cache keys.
+"""
+
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from prompt_builder import COMPACTION_LEVELS
+
+BODY_LIMIT, FILE_LIMIT, _ = COMPACTION_LEVELS[0]
+# Files kept per item: one past what the prompt lists, so it still knows to add "..."
+FILES_KEPT = FILE_LIMIT + 1
+
+
+def truncate_body(text: Optional[str]) -> str:
+    """A body cut the way the prompt cuts it (the prompt renders the result unchanged)."""
+    text = text or ''
+    return f"{text[:BODY_LIMIT]}..." if len(text) > BODY_LIMIT else text
+
+
+def cap_files(paths: Iterable[str]) -> List[str]:
+    """The first FILES_KEPT paths; stops reading a lazy (paginated) iterable there."""
+    return list(islice(paths, FILES_KEPT))
+
+
+class Record:
+    """Base class: a fixed set of fields in __slots__, readable as a mapping."""
+
+    __slots__ = ()
+
+    def __init__(self, **fields: Any):
+        for name in self.__slots__:
+            setattr(self, name, fields.pop(name, None))
+        if fields:
+            raise TypeError(f"Unknown {type(self).__name__} fields: {', '.join(fields)}")
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key: str, value: Any):
+        setattr(self, key, value)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.__slots__
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return getattr(self, key, default)
+
+    def keys(self) -> tuple:
+        return self.__slots__
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class CommitRecord(Record):
+    __slots__ = ('sha', 'full_sha', 'message', 'author', 'login', 'date', 'files_changed', 'pr_number')
+
+
+class PullRequestRecord(Record):
+    __slots__ = ('number', 'title', 'body', 'state', 'author', 'created_at', 'updated_at', 'merged_at',
+                 'closed_at', 'labels', 'files_changed')
+
+
+class IssueRecord(Record):
+    __slots__ = ('number', 'title', 'body', 'state', 'author', 'created_at', 'updated_at', 'labels',
+                 'comments_count')
+
+
+def jsonable(value: Any) -> Any:
+    """`default` hook for json.dump(s): records become dicts, anything else its str()."""
+    if isinstance(value, Record):
+        return value.to_dict()
+    return str(value)
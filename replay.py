@@ -0,0 +1,280 @@
+"""
+Record and replay GitHub and Gemini traffic for offline runs.
+
+In record mode every GitHub response (REST and GraphQL) and every Gemini
+reply is written to a fixture directory while the run proceeds normally. In
+replay mode the same run is served entirely from those fixtures, optionally
+with injected latency, so it needs no network access or credentials.
+
+Requests are matched on method, URL and body with the time-dependent parts
+(`since`/`until` parameters and window variables) removed. The recording's
+collection window is kept in the manifest and restored on replay, so the
+client-side window filters select the same items and a replay still
+matches when it runs on a later day than the recording. Gemini replies are
+matched on the prompt with dates removed, falling back to the recorded
+replies in order.
+"""
+
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+# Query parameters and GraphQL variables that change with the collection window
+WINDOW_PARAMETERS = {'since', 'until', 'commitSince', 'commitUntil', 'issueSince'}
+DATE_PATTERN = re.compile(r'\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?')
+
+
+class FixtureNotFound(requests.RequestException):
+    """Raised in replay mode for a request that was never recorded (not retried like a connection error)."""
+
+
+def request_key(method: str, url: str, body: Optional[bytes]) -> str:
+    """Stable key for a request, ignoring the collection window."""
+    parts = urlsplit(url)
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if k not in WINDOW_PARAMETERS))
+    normalized_url = urlunsplit((parts.scheme, parts.netloc, parts.path, query, ''))
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    normalized_body = body or b''
+    if body:
+        try:
+            payload = json.loads(body)
+            if isinstance(payload, dict) and isinstance(payload.get('variables'), dict):
+                payload['variables'] = {k: v for k, v in payload['variables'].items() if k not in WINDOW_PARAMETERS}
+            normalized_body = json.dumps(payload, sort_keys=True).encode('utf-8')
+        except ValueError:
+            pass
+    return hashlib.sha256(f"{method} {normalized_url}\n".encode('utf-8') + normalized_body).hexdigest()
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(DATE_PATTERN.sub('', prompt).encode('utf-8')).hexdigest()
+
+
+class FixtureStore:
+    """A directory of recorded interactions, used in 'record' or 'replay' mode."""
+
+    def __init__(self, path: Path, mode: str, latency: float = 0.0):
+        if mode not in ('record', 'replay'):
+            raise ValueError(f"Unknown fixture mode: {mode}")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        self._lock = threading.Lock()
+        self._model_sequence = 0
+        self._replayed_models: set = set()
+        self.manifest: Dict[str, Any] = {}
+        manifest = self.path / 'manifest.json'
+        if mode == 'replay' and manifest.exists():
+            with open(manifest, 'r', encoding='utf-8') as f:
+                self.manifest = json.load(f)
+        (self.path / 'http').mkdir(parents=True, exist_ok=True)
+        (self.path / 'gemini').mkdir(parents=True, exist_ok=True)
+        if mode == 'replay':
+            logger.info(f"Replaying GitHub and Gemini traffic from {self.path}"
+                        f"{f' with {latency * 1000:.0f}ms injected latency' if latency else ''}")
+        else:
+            logger.info(f"Recording GitHub and Gemini traffic to {self.path}")
+
+    def _save_manifest(self, **fields: Any):
+        with self._lock:
+            self.manifest.update(fields)
+            self._write(self.path / 'manifest.json', self.manifest)
+
+    def repo_list(self, repos: List[str]) -> List[str]:
+        """Save the recorded run's repositories, or return them when replaying without REPO_LIST."""
+        if self.mode == 'record':
+            self._save_manifest(repos=repos)
+            return repos
+        if any(repos) or 'repos' not in self.manifest:
+            return repos
+        return self.manifest['repos']
+
+    def window(self, period: str, start_date: datetime, end_date: datetime) -> Tuple[datetime, datetime]:
+        """Save the recorded run's collection window for a period, or return it when replaying."""
+        if self.mode == 'record':
+            windows = {**self.manifest.get('windows', {}),
+                       period: {'start_date': start_date.isoformat(), 'end_date': end_date.isoformat()}}
+            self._save_manifest(windows=windows)
+            return start_date, end_date
+        recorded = self.manifest.get('windows', {}).get(period)
+        if recorded is None:
+            return start_date, end_date
+        return datetime.fromisoformat(recorded['start_date']), datetime.fromisoformat(recorded['end_date'])
+
+    def adapter(self, pool_size: int) -> BaseAdapter:
+        """Transport adapter for the shared GitHub session."""
+        if self.mode == 'replay':
+            return ReplayAdapter(self)
+        # Retries are left to the RequestScheduler, as with the default adapter
+        return RecordingAdapter(self, pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+
+    def wrap_model(self, model: Any) -> Any:
+        return ReplayModel(self) if self.mode == 'replay' else RecordingModel(model, self)
+
+    def _write(self, path: Path, payload: Dict[str, Any]):
+        tmp_path = path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(payload, f, indent=1)
+        tmp_path.replace(path)
+
+    def save_http(self, key: str, response: requests.Response):
+        self._write(self.path / 'http' / f'{key}.json', {
+            'status': response.status_code,
+            'headers': dict(response.headers),
+            'text': response.text,
+            'elapsed': response.elapsed.total_seconds(),
+        })
+
+    def load_http(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.path / 'http' / f'{key}.json', 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save_model(self, prompt: str, chunks: List[str], usage: Any):
+        with self._lock:
+            self._model_sequence += 1
+            sequence = self._model_sequence
+        self._write(self.path / 'gemini' / f'{prompt_key(prompt)}.json', {
+            'sequence': sequence,
+            'chunks': chunks,
+            'prompt_tokens': getattr(usage, 'prompt_token_count', None),
+            'response_tokens': getattr(usage, 'candidates_token_count', None),
+        })
+
+    def load_model(self, prompt: str) -> Dict[str, Any]:
+        """Recorded reply for a prompt, else the first unused recording in order."""
+        with self._lock:
+            path = self.path / 'gemini' / f'{prompt_key(prompt)}.json'
+            if not path.exists():
+                recordings = sorted(self.path.glob('gemini/*.json'),
+                                    key=lambda p: json.loads(p.read_text(encoding='utf-8'))['sequence'])
+                unused = [p for p in recordings if p not in self._replayed_models]
+                if not unused:
+                    raise KeyError("No recorded Gemini reply left to replay")
+                logger.warning(f"No recorded Gemini reply for this prompt; replaying {unused[0].name}")
+                path = unused[0]
+            self._replayed_models.add(path)
+            return json.loads(path.read_text(encoding='utf-8'))
+
+
+class RecordingAdapter(HTTPAdapter):
+    def __init__(self, store: FixtureStore, **kwargs):
+        super().__init__(**kwargs)
+        self.store = store
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        self.store.save_http(request_key(request.method, request.url, request.body), response)
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    def __init__(self, store: FixtureStore):
+        super().__init__()
+        self.store = store
+
+    def send(self, request, **kwargs):
+        recorded = self.store.load_http(request_key(request.method, request.url, request.body))
+        if recorded is None:
+            raise FixtureNotFound(f"No recorded response for {request.method} {request.url}")
+        if self.store.latency:
+            time.sleep(self.store.latency)
+        response = requests.Response()
+        response.status_code = recorded['status']
+        response.headers = CaseInsensitiveDict(recorded['headers'])
+        # The body is stored decoded; drop headers describing the original encoding
+        response.headers.pop('Content-Encoding', None)
+        response.headers.pop('Transfer-Encoding', None)
+        response._content = recorded['text'].encode('utf-8')
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+
+class ReplayResponse:
+    """Stands in for a Gemini response: `.text`, `.usage_metadata` and chunk iteration when streamed."""
+
+    def __init__(self, chunks: List[str], prompt_tokens: Optional[int], response_tokens: Optional[int],
+                 chunk_delay: float = 0.0):
+        self.chunks = chunks
+        self.text = ''.join(chunks)
+        self.chunk_delay = chunk_delay
+        self.usage_metadata = None
+        if prompt_tokens is not None:
+            self.usage_metadata = SimpleNamespace(prompt_token_count=prompt_tokens,
+                                                  candidates_token_count=response_tokens)
+
+    def __iter__(self) -> Iterator[SimpleNamespace]:
+        for chunk in self.chunks:
+            if self.chunk_delay:
+                time.sleep(self.chunk_delay)
+            yield SimpleNamespace(text=chunk)
+
+
+class RecordingModel:
+    def __init__(self, model: Any, store: FixtureStore):
+        self.model = model
+        self.store = store
+
+    def generate_content(self, prompt: str, stream: bool = False):
+        response = self.model.generate_content(prompt, stream=stream)
+        if not stream:
+            self.store.save_model(prompt, [response.text], getattr(response, 'usage_metadata', None))
+            return response
+        return RecordingStream(response, lambda chunks: self.store.save_model(
+            prompt, chunks, getattr(response, 'usage_metadata', None)))
+
+
+class RecordingStream:
+    """Passes a streamed response through, saving its chunks once it is fully consumed."""
+
+    def __init__(self, response: Any, on_complete):
+        self.response = response
+        self.on_complete = on_complete
+
+    @property
+    def usage_metadata(self):
+        return getattr(self.response, 'usage_metadata', None)
+
+    def __iter__(self) -> Iterator[Any]:
+        chunks = []
+        for chunk in self.response:
+            chunks.append(chunk.text)
+            yield chunk
+        self.on_complete(chunks)
+
+
+class ReplayModel:
+    def __init__(self, store: FixtureStore):
+        self.store = store
+
+    def generate_content(self, prompt: str, stream: bool = False) -> ReplayResponse:
+        recorded = self.store.load_model(prompt)
+        chunks = recorded['chunks']
+        if not stream:
+            if self.store.latency:
+                time.sleep(self.store.latency)
+            chunks = [''.join(chunks)]
+        chunk_delay = self.store.latency / max(1, len(chunks)) if stream else 0.0
+        return ReplayResponse(chunks, recorded['prompt_tokens'], recorded['response_tokens'], chunk_delay)
@@ -0,0 +1,102 @@
+"""
+Weekly and monthly rollups built from stored data instead of the GitHub API.
+
+Activity comes from the run snapshots (see snapshot_store), per-repository
+metrics are computed locally, and the executive summaries of the daily
+digests in the period are condensed into a bounded highlights section, so a
+rollup costs one model call of about the size of a daily one.
+"""
+
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from digest_index import FILENAME_DATE, split_sections
+from prompt_builder import estimate_tokens
+
+ROLLUP_INSTRUCTIONS = """
+
+TASK: Create a "Pulse AI" {period} rollup with the title "Pulse AI: [Date] - {title} Summary" that includes:
+
+1. **Executive Summary** - The most significant outcomes of the {noun}
+2. **Repository Breakdown** - Progress per repository, using the activity metrics
+3. **Trends** - How activity and focus shifted over the {noun}, based on the daily highlights
+4. **Risks & Follow-ups** - Open issues, blockers and items that recurred across days
+5. **Next {title_noun} Focus** - Recommended priorities
+
+FORMAT REQUIREMENTS:
+- Use proper markdown formatting with emojis for quick scanning
+- Do not repeat the metrics table; the rollup appends it
+- Highlight critical items with bold text
+
+STYLE: Write for startup leadership: concise, focused on business impact and technical progress over the whole {noun}.
+"""
+
+
+def repo_metrics(repo: Dict[str, Any], since: datetime) -> Dict[str, Any]:
+    """Count a repository's activity over the period from its merged snapshot data."""
+    since_iso = since.isoformat()
+    prs = repo['pull_requests']
+    issues = repo['issues']
+    authors = {c['author'] for c in repo['commits']}
+    authors.update(item['author'] for item in prs + issues)
+    return {
+        'commits': len(repo['commits']),
+        'contributors': len(authors),
+        'active_days': len({c['date'][:10] for c in repo['commits']}),
+        'prs_opened': sum(1 for pr in prs if pr['created_at'] >= since_iso),
+        'prs_closed': sum(1 for pr in prs if pr['state'] == 'closed'),
+        'issues_opened': sum(1 for issue in issues if issue['created_at'] >= since_iso),
+        'issues_closed': sum(1 for issue in issues if issue['state'] == 'closed'),
+    }
+
+
+def metrics_table(metrics: Dict[str, Dict[str, Any]]) -> str:
+    """Render per-repository metrics as a markdown table, busiest repositories first."""
+    if not metrics:
+        return "No activity snapshots were stored for this period.\n"
+    lines = [
+        "| Repository | Commits | Contributors | Active days | PRs opened / closed | Issues opened / closed |",
+        "|---|---|---|---|---|---|",
+    ]
+    for name, m in sorted(metrics.items(), key=lambda item: item[1]['commits'], reverse=True):
+        lines.append(f"| {name} | {m['commits']} | {m['contributors']} | {m['active_days']} | "
+                     f"{m['prs_opened']} / {m['prs_closed']} | {m['issues_opened']} / {m['issues_closed']} |")
+    return '\n'.join(lines) + '\n'
+
+
+def daily_highlights(digests_dir: Path, start: date, end: date, token_budget: int,
+                     exclude: List[str]) -> str:
+    """Executive summaries of the daily digests in [start, end], oldest first, within a token budget.
+
+    Each digest gets an equal share of the budget; files whose names contain one
+    of `exclude` (earlier rollups) are skipped.
+    """
+    digests = []
+    for path in sorted(Path(digests_dir).glob('*.md')):
+        match = FILENAME_DATE.match(path.name)
+        if not match or any(word in path.name for word in exclude):
+            continue
+        day = date.fromisoformat(match.group(1))
+        if start <= day <= end:
+            digests.append((match.group(1), path))
+    if not digests:
+        return ''
+
+    share = max(0, token_budget // len(digests) - 10) * 4
+    parts = []
+    for day, path in digests:
+        sections = split_sections(path.read_text(encoding='utf-8'))
+        summary = next((body for heading, body in sections if 'executive summary' in heading.lower()),
+                       sections[1][1] if len(sections) > 1 else '')
+        summary = ' '.join(summary.split())
+        if len(summary) > share:
+            summary = summary[:share].rsplit(' ', 1)[0] + '...'
+        if summary:
+            parts.append(f"- **{day}**: {summary}\n")
+    text = ''.join(parts)
+    # Make sure rounding never lets the highlights outgrow their budget
+    while parts and estimate_tokens(text) > token_budget:
+        parts.pop(0)
+        text = ''.join(parts)
+    return text
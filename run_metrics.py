@@ -0,0 +1,186 @@
+"""
+Structured performance metrics for a digest run.
+
+Collects time per stage and per repository, GitHub request and rate limit
+usage, model latency, tokens and serving tier, and cache hit rates. At the
+end of the run they are written as a JSON report next to the digest and, if
+a path is configured, as OpenMetrics text for a textfile collector to scrape.
+When metrics are disabled every call is a no-op.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = 'pulse_ai'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RunMetrics:
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self._lock = threading.Lock()
+        self.stages: Dict[str, float] = {}
+        self.repos: Dict[str, Dict[str, Any]] = {}
+        self.model_calls: List[Dict[str, Any]] = []
+        self.extra: Dict[str, Any] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        """Time a block of the run; repeated stages accumulate."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                with self._lock:
+                    self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - started
+
+    def record_repo(self, repo_name: str, **fields: Any):
+        """Merge per-repository figures (seconds, requests, item counts, ...)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.repos.setdefault(repo_name, {}).update(fields)
+
+    def record_model_call(self, label: str, seconds: float, prompt_tokens: Optional[int],
+                          response_tokens: Optional[int], first_token_seconds: Optional[float] = None,
+                          tier: Optional[str] = None, hedged: bool = False, failed_tiers: Iterable[str] = ()):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.model_calls.append({
+                'label': label,
+                'seconds': round(seconds, 3),
+                'first_token_seconds': round(first_token_seconds, 3) if first_token_seconds is not None else None,
+                'prompt_tokens': prompt_tokens,
+                'response_tokens': response_tokens,
+                'tier': tier,
+                'hedged': hedged,
+                'failed_tiers': list(failed_tiers),
+            })
+
+    def set(self, key: str, value: Any):
+        """Attach a run-level value (prompt size, scheduler figures, cache hit rates, ...)."""
+        if self.enabled:
+            with self._lock:
+                self.extra[key] = value
+
+    def report(self, status: str, error: Optional[str] = None) -> Dict[str, Any]:
+        with self._lock:
+            tokens = [(call['prompt_tokens'] or 0, call['response_tokens'] or 0) for call in self.model_calls]
+            return {
+                'started_at': self.started_at.isoformat(),
+                'status': status,
+                'error': error,
+                'total_seconds': round(time.perf_counter() - self._started, 3),
+                'stages': {name: round(seconds, 3) for name, seconds in self.stages.items()},
+                'repos': self.repos,
+                'model': {
+                    'calls': len(self.model_calls),
+                    'seconds': round(sum(call['seconds'] for call in self.model_calls), 3),
+                    'prompt_tokens': sum(prompt for prompt, _ in tokens),
+                    'response_tokens': sum(response for _, response in tokens),
+                    'tiers': dict(Counter(call['tier'] for call in self.model_calls if call['tier'])),
+                    'hedged': sum(1 for call in self.model_calls if call['hedged']),
+                    'per_call': self.model_calls,
+                },
+                **self.extra,
+            }
+
+    def write(self, report_path: Path, openmetrics_path: Optional[str], status: str,
+              error: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Write the JSON report (and OpenMetrics text, if a path is given); never raises."""
+        if not self.enabled:
+            return None
+        report = self.report(status, error)
+        try:
+            report_path.parent.mkdir(parents=True, exist_ok=True)
+            report_path.write_text(json.dumps(report, indent=2, default=str), encoding='utf-8')
+            logger.info(f"Run report written to {report_path}")
+            if openmetrics_path:
+                # Write then rename, so a scraper never reads a half-written file
+                tmp_path = f"{openmetrics_path}.tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(self.openmetrics(report))
+                os.replace(tmp_path, openmetrics_path)
+                logger.info(f"OpenMetrics written to {openmetrics_path}")
+        except OSError as e:
+            logger.warning(f"Could not write the run report: {e}")
+        return report
+
+    def openmetrics(self, report: Dict[str, Any]) -> str:
+        """Render the report in the OpenMetrics text format."""
+        families: List[Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]] = []
+
+        def family(name: str, kind: str, help_text: str, samples: List[Tuple[Dict[str, str], float]]):
+            if samples:
+                families.append((f"{METRIC_PREFIX}_{name}", kind, help_text, samples))
+
+        family('run_duration_seconds', 'gauge', "Wall time of the last run.", [({}, report['total_seconds'])])
+        family('run_success', 'gauge', "1 if the last run completed.", [({}, 1 if report['status'] == 'success' else 0)])
+        family('run_timestamp_seconds', 'gauge', "Start of the last run.", [({}, self.started_at.timestamp())])
+        family('stage_duration_seconds', 'gauge', "Wall time per run stage.",
+               [({'stage': name}, seconds) for name, seconds in report['stages'].items()])
+        family('repo_collection_seconds', 'gauge', "Collection time per repository.",
+               [({'repo': name}, stats['seconds']) for name, stats in report['repos'].items() if 'seconds' in stats])
+        family('repo_api_requests', 'gauge', "API requests per repository.",
+               [({'repo': name}, stats['requests']) for name, stats in report['repos'].items() if 'requests' in stats])
+
+        github = report.get('github', {})
+        for key, help_text in (('requests', "GitHub requests sent."), ('retries', "GitHub requests retried."),
+                               ('response_bytes', "GitHub response bytes received.")):
+            if key in github:
+                family(f'github_{key}', 'counter', help_text, [({}, github[key])])
+        budgets = github.get('rate_limit', {})
+        family('github_rate_limit_used', 'gauge', "Rate limit consumed by the run, per resource.",
+               [({'resource': resource}, budget['used']) for resource, budget in budgets.items()])
+        family('github_rate_limit_remaining', 'gauge', "Rate limit remaining after the run, per resource.",
+               [({'resource': resource}, budget['remaining']) for resource, budget in budgets.items()])
+
+        model = report['model']
+        family('model_calls', 'counter', "Gemini calls made.", [({}, model['calls'])])
+        family('model_seconds', 'counter', "Time spent in Gemini calls.", [({}, model['seconds'])])
+        family('model_prompt_tokens', 'counter', "Prompt tokens sent to Gemini.", [({}, model['prompt_tokens'])])
+        family('model_response_tokens', 'counter', "Response tokens from Gemini.", [({}, model['response_tokens'])])
+        family('model_tier_calls', 'counter', "Model calls served per chain tier.",
+               [({'tier': tier}, calls) for tier, calls in model.get('tiers', {}).items()])
+        family('model_hedged_calls', 'counter', "Model calls that sent a hedged request.", [({}, model.get('hedged', 0))])
+        served = report.get('served_by')
+        if served:
+            family('digest_served_by', 'gauge', "1 for the model tier (or 'fallback') that wrote the digest.",
+                   [({'tier': served['tier']}, 1)])
+            if served.get('seconds') is not None:
+                family('digest_generation_seconds', 'gauge', "Latency of the call that wrote the digest.",
+                       [({'tier': served['tier']}, served['seconds'])])
+
+        caches = report.get('caches', {})
+        family('cache_hits', 'counter', "Cache hits per cache.",
+               [({'cache': name}, stats['hits']) for name, stats in caches.items()])
+        family('cache_misses', 'counter', "Cache misses per cache.",
+               [({'cache': name}, stats['misses']) for name, stats in caches.items()])
+
+        lines = []
+        for name, kind, help_text, samples in families:
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"# HELP {name} {help_text}")
+            sample_name = f"{name}_total" if kind == 'counter' else name
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{_escape(val)}"' for key, val in labels.items())
+                lines.append(f"{sample_name}{{{label_text}}} {value}" if label_text else f"{sample_name} {value}")
+        lines.append('# EOF')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,326 @@
+"""
+Output sinks a saved digest is delivered to.
+
+DIGEST_SINKS in config.py (or the DIGEST_SINKS environment variable, as JSON)
+lists the sinks to use, each a dict with a `type` and its options:
+
+    {"type": "teams"}                                   # TEAMS_WEBHOOK_URL, chunked with an outbox
+    {"type": "webhook", "url_env": "DIGEST_WEBHOOK_URL"} # POSTs the digest as JSON
+    {"type": "email", "to": ["team@example.com"], "host": "localhost", "port": 25}
+    {"type": "html", "path": "site/digests"}             # standalone HTML page per digest
+    {"type": "file", "path": "/mnt/shared/digests"}      # copy of the markdown file
+
+Every sink also takes `name` (defaults to its type) and `timeout` in seconds.
+All sinks run concurrently; a sink that fails or runs past its timeout is
+reported but never holds up the others or fails the run. A sink past its
+timeout is abandoned, not stopped, so whether it delivered is unknown.
+"""
+
+import html
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from teams_delivery import TeamsDelivery
+
+logger = logging.getLogger(__name__)
+
+INLINE_CODE = re.compile(r'`([^`]+)`')
+BOLD = re.compile(r'\*\*(.+?)\*\*')
+ITALIC = re.compile(r'(?<![*\w])\*(?!\s)(.+?)(?<!\s)\*(?![*\w])')
+LINK = re.compile(r'\[([^\]]+)\]\((https?://[^)\s]+)\)')
+LIST_ITEM = re.compile(r'^(\s*)(?:[-*+]|\d+\.)\s+(.*)$')
+
+
+class DigestMessage:
+    """A saved digest as handed to the sinks."""
+
+    def __init__(self, title: str, content: str, filepath: str, period: str):
+        self.title = title
+        self.content = content
+        self.filepath = filepath
+        self.period = period
+
+
+def _inline(text: str) -> str:
+    text = html.escape(text, quote=False)
+    text = INLINE_CODE.sub(r'<code>\1</code>', text)
+    text = LINK.sub(r'<a href="\2">\1</a>', text)
+    text = BOLD.sub(r'<strong>\1</strong>', text)
+    return ITALIC.sub(r'<em>\1</em>', text)
+
+
+def render_html(markdown: str, title: str) -> str:
+    """Render the markdown subset digests use (headings, lists, emphasis, links, code, rules) as a page."""
+    body: List[str] = []
+    paragraph: List[str] = []
+    in_list = False
+    in_code = False
+
+    def close_blocks():
+        nonlocal in_list
+        if paragraph:
+            body.append(f"<p>{' '.join(paragraph)}</p>")
+            paragraph.clear()
+        if in_list:
+            body.append('</ul>')
+            in_list = False
+
+    for line in markdown.split('\n'):
+        if line.startswith('```'):
+            close_blocks()
+            body.append('</code></pre>' if in_code else '<pre><code>')
+            in_code = not in_code
+            continue
+        if in_code:
+            body.append(html.escape(line, quote=False))
+            continue
+        stripped = line.strip()
+        heading = re.match(r'^(#{1,6})\s+(.*)$', stripped)
+        item = LIST_ITEM.match(line)
+        if not stripped:
+            close_blocks()
+        elif heading:
+            close_blocks()
+            level = len(heading.group(1))
+            body.append(f"<h{level}>{_inline(heading.group(2))}</h{level}>")
+        elif stripped in ('---', '***', '___'):
+            close_blocks()
+            body.append('<hr>')
+        elif item:
+            if paragraph:
+                close_blocks()
+            if not in_list:
+                body.append('<ul>')
+                in_list = True
+            body.append(f"<li>{_inline(item.group(2))}</li>")
+        else:
+            if in_list:
+                close_blocks()
+            paragraph.append(_inline(stripped))
+    close_blocks()
+    if in_code:
+        body.append('</code></pre>')
+
+    return (f"<!DOCTYPE html>\n<html lang=\"en\">\n<head>\n<meta charset=\"utf-8\">\n"
+            f"<title>{html.escape(title)}</title>\n"
+            "<style>body{font-family:system-ui,sans-serif;max-width:860px;margin:2em auto;padding:0 1em;"
+            "line-height:1.5}code{background:#f3f3f3;padding:0 .2em}pre{background:#f3f3f3;padding:1em;"
+            "overflow:auto}</style>\n</head>\n<body>\n" + '\n'.join(body) + "\n</body>\n</html>\n")
+
+
+class DeliveryQueued(Exception):
+    """Raised by a sink that could not deliver now but queued the rest for a later run."""
+
+    def __init__(self, message: str, details: Dict[str, Any]):
+        super().__init__(message)
+        self.details = details
+
+
+class Sink:
+    """Base class: subclasses implement deliver(), raising on failure."""
+
+    kind = ''
+
+    def __init__(self, spec: Dict[str, Any], default_timeout: float):
+        self.name = spec.get('name') or self.kind
+        self.timeout = float(spec.get('timeout', default_timeout))
+
+    def deliver(self, message: DigestMessage) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class FileSink(Sink):
+    kind = 'file'
+
+    def __init__(self, spec: Dict[str, Any], default_timeout: float):
+        super().__init__(spec, default_timeout)
+        self.path = Path(spec['path'])
+
+    def deliver(self, message: DigestMessage) -> Dict[str, Any]:
+        self.path.mkdir(parents=True, exist_ok=True)
+        target = self.path / Path(message.filepath).name
+        shutil.copyfile(message.filepath, target)
+        return {'path': str(target)}
+
+
+class HtmlSink(Sink):
+    kind = 'html'
+
+    def __init__(self, spec: Dict[str, Any], default_timeout: float, default_path: Path):
+        super().__init__(spec, default_timeout)
+        self.path = Path(spec.get('path', default_path))
+
+    def deliver(self, message: DigestMessage) -> Dict[str, Any]:
+        self.path.mkdir(parents=True, exist_ok=True)
+        target = self.path / f"{Path(message.filepath).stem}.html"
+        markdown = Path(message.filepath).read_text(encoding='utf-8')
+        tmp_path = target.with_suffix('.tmp')
+        tmp_path.write_text(render_html(markdown, message.title), encoding='utf-8')
+        os.replace(tmp_path, target)
+        return {'path': str(target)}
+
+
+class TeamsSink(Sink):
+    kind = 'teams'
+
+    def __init__(self, spec: Dict[str, Any], default_timeout: float, webhook_url: str, session: Any,
+                 outbox_dir: Path, max_card_bytes: int, request_timeout: float, outbox_max_age_days: float):
+        super().__init__(spec, default_timeout)
+        self.delivery = TeamsDelivery(webhook_url, session, outbox_dir, max_card_bytes,
+                                      min(request_timeout, self.timeout), outbox_max_age_days)
+
+    def deliver(self, message: DigestMessage) -> Dict[str, Any]:
+        # Cards that fail are retried from the outbox on the next run, not by resuming this one
+        details = self.delivery.send(message.title, message.content)
+        if details['queued']:
+            raise DeliveryQueued(f"{details['queued']} of {details['cards']} card(s) queued in the outbox", details)
+        return details
+
+
+class WebhookSink(Sink):
+    kind = 'webhook'
+
+    def __init__(self, spec: Dict[str, Any], default_timeout: float, url: str, session: Any):
+        super().__init__(spec, default_timeout)
+        self.url = url
+        self.session = session
+        self.headers = spec.get('headers', {})
+
+    def deliver(self, message: DigestMessage) -> Dict[str, Any]:
+        response = self.session.post(self.url, timeout=self.timeout, headers=self.headers, json={
+            'title': message.title,
+            'period': message.period,
+            'file': Path(message.filepath).name,
+            'content': message.content,
+        })
+        response.raise_for_status()
+        return {'status': response.status_code}
+
+
+class EmailSink(Sink):
+    kind = 'email'
+
+    def __init__(self, spec: Dict[str, Any], default_timeout: float):
+        super().__init__(spec, default_timeout)
+        self.host = spec.get('host', 'localhost')
+        self.port = int(spec.get('port', 25))
+        self.sender = spec.get('from', 'pulse-ai@localhost')
+        self.recipients = spec['to'] if isinstance(spec['to'], list) else [spec['to']]
+        self.starttls = spec.get('starttls', False)
+        self.username = os.getenv(spec['username_env']) if spec.get('username_env') else None
+        self.password = os.getenv(spec['password_env']) if spec.get('password_env') else None
+
+    def deliver(self, message: DigestMessage) -> Dict[str, Any]:
+        import smtplib
+        from email.message import EmailMessage
+        email = EmailMessage()
+        email['Subject'] = message.title
+        email['From'] = self.sender
+        email['To'] = ', '.join(self.recipients)
+        email.set_content(message.content)
+        email.add_alternative(render_html(message.content, message.title), subtype='html')
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.starttls:
+                smtp.starttls()
+            if self.username:
+                smtp.login(self.username, self.password or '')
+            smtp.send_message(email)
+        return {'recipients': len(self.recipients)}
+
+
+def load_specs(default: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """The configured sinks: DIGEST_SINKS from the environment (JSON) if set, else config.py."""
+    raw = os.getenv('DIGEST_SINKS')
+    specs = json.loads(raw) if raw else default
+    names = [spec.get('name') or spec.get('type') for spec in specs]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"Sink names must be unique; give these a 'name': {', '.join(sorted(duplicates))}")
+    return specs
+
+
+def build_sinks(specs: List[Dict[str, Any]], clients: Any, digests_dir: Path, teams_webhook_url: Optional[str],
+                default_timeout: float, request_timeout: float, teams_max_card_bytes: int,
+                teams_outbox_max_age_days: float) -> List[Sink]:
+    """Create the configured sinks, skipping (with a log line) those whose webhook is not set."""
+    sinks: List[Sink] = []
+    for spec in specs:
+        kind = spec.get('type')
+        if kind == 'teams':
+            url = os.getenv(spec['webhook_env']) if spec.get('webhook_env') else teams_webhook_url
+            if not url:
+                logger.info("TEAMS_WEBHOOK_URL not set. Skipping Teams notification.")
+                continue
+            sinks.append(TeamsSink(spec, default_timeout, url, clients.webhook_session, digests_dir / '.state' / 'outbox',
+                                   teams_max_card_bytes, request_timeout, teams_outbox_max_age_days))
+        elif kind == 'webhook':
+            url = os.getenv(spec['url_env']) if spec.get('url_env') else spec.get('url')
+            if not url:
+                logger.info(f"No URL for webhook sink {spec.get('name') or kind}. Skipping it.")
+                continue
+            sinks.append(WebhookSink(spec, default_timeout, url, clients.webhook_session))
+        elif kind == 'email':
+            sinks.append(EmailSink(spec, default_timeout))
+        elif kind == 'html':
+            sinks.append(HtmlSink(spec, default_timeout, digests_dir / 'html'))
+        elif kind == 'file':
+            sinks.append(FileSink(spec, default_timeout))
+        else:
+            raise ValueError(f"Unknown sink type: {kind!r}")
+    return sinks
+
+
+def deliver_all(sinks: List[Sink], message: DigestMessage) -> Dict[str, Dict[str, Any]]:
+    """Deliver to every sink concurrently, waiting for each at most its own timeout.
+
+    Returns per-sink results with `ok`, `seconds` and `error`. A sink that
+    queued part of its delivery (DeliveryQueued) is reported as failed, with
+    its details. A sink that times out is reported as failed with `unknown`
+    set: it is abandoned in its daemon thread (which never keeps the process
+    alive) and may still deliver, so it must not simply be sent again.
+    """
+    if not sinks:
+        return {}
+    results: Dict[str, Dict[str, Any]] = {}
+    finished: Dict[str, float] = {}
+
+    def run(sink: Sink, future: Future):
+        try:
+            future.set_result(sink.deliver(message))
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            finished[sink.name] = time.perf_counter()
+
+    started = time.perf_counter()
+    futures = []
+    for sink in sinks:
+        future: Future = Future()
+        threading.Thread(target=run, args=(sink, future), name=f'sink-{sink.name}', daemon=True).start()
+        futures.append((sink, future))
+    for sink, future in futures:
+        try:
+            details = future.result(timeout=max(0.0, started + sink.timeout - time.perf_counter()))
+            results[sink.name] = {'type': sink.kind, 'ok': True, 'error': None, **(details or {})}
+        except TimeoutError:
+            results[sink.name] = {'type': sink.kind, 'ok': False, 'unknown': True,
+                                  'error': f"timed out after {sink.timeout:g}s; it may still deliver"}
+        except DeliveryQueued as e:
+            results[sink.name] = {'type': sink.kind, 'ok': False, 'error': str(e), **e.details}
+        except Exception as e:
+            results[sink.name] = {'type': sink.kind, 'ok': False, 'error': str(e)}
+        end = finished.get(sink.name, time.perf_counter())
+        results[sink.name]['seconds'] = round(end - started, 3)
+        if results[sink.name]['ok']:
+            logger.info(f"Delivered to {sink.name} in {results[sink.name]['seconds']:.2f}s")
+        else:
+            logger.error(f"Delivery to {sink.name} failed: {results[sink.name]['error']}")
+    return results
@@ -0,0 +1,153 @@
+"""
+Append-only store of the activity collected by each run, for later rollups.
+
+Snapshots are gzip-compressed JSON lines partitioned by collection date and
+repository: digests/snapshots/<YYYY-MM-DD>/<owner>__<repo>.jsonl.gz. Every run
+appends one gzip member per repository, so earlier data is never rewritten.
+Reading a date range only opens the partitions inside it, and `load()` merges
+the records back into the per-repository dicts the collector produces.
+
+Snapshots are committed with the digest, so only the fields rollups use are
+stored (SNAPSHOT_FIELDS): commit subjects, PR and issue titles, authors,
+states, labels and dates. Bodies, full commit messages and file paths are not.
+"""
+
+import gzip
+import json
+import logging
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# collector key -> record kind
+KINDS = {
+    'commits': 'commit',
+    'pull_requests': 'pull_request',
+    'issues': 'issue',
+}
+
+# record kind -> fields stored; everything else the collector read stays out of the repository
+SNAPSHOT_FIELDS = {
+    'commit': ('sha', 'full_sha', 'message', 'author', 'date', 'pr_number'),
+    'pull_request': ('number', 'title', 'state', 'author', 'created_at', 'updated_at', 'merged_at', 'closed_at',
+                     'labels'),
+    'issue': ('number', 'title', 'state', 'author', 'created_at', 'updated_at', 'labels'),
+}
+# Fields left out of snapshots that the prompt builder reads; loaded records get them empty
+OMITTED_DEFAULTS = {
+    'commit': {'login': None, 'files_changed': []},
+    'pull_request': {'body': '', 'files_changed': []},
+    'issue': {'body': '', 'comments_count': 0},
+}
+
+
+def partition_name(repo_name: str) -> str:
+    return repo_name.replace('/', '__') + '.jsonl.gz'
+
+
+def snapshot_record(kind: str, item: Dict[str, Any]) -> Dict[str, Any]:
+    """The stored form of a collected item: its SNAPSHOT_FIELDS, with commit messages cut to the subject."""
+    record = {field: item.get(field) for field in SNAPSHOT_FIELDS[kind]}
+    if kind == 'commit':
+        record['message'] = (record['message'] or '').split('\n', 1)[0]
+    return record
+
+
+class SnapshotStore:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.written: List[Path] = []
+
+    def write(self, collected_at: datetime, all_repo_data: List[Dict[str, Any]]) -> List[Path]:
+        """Append this run's records to each repository's partition for the collection date."""
+        started = time.perf_counter()
+        directory = self.root / collected_at.strftime('%Y-%m-%d')
+        directory.mkdir(parents=True, exist_ok=True)
+        stamp = collected_at.isoformat()
+        paths = []
+        for repo_data in all_repo_data:
+            if 'error' in repo_data:
+                continue
+            lines = [{'kind': 'repo', 'collected_at': stamp, 'name': repo_data['name'],
+                      'description': repo_data.get('description', '')}]
+            for key, kind in KINDS.items():
+                lines.extend({'kind': kind, 'collected_at': stamp, **snapshot_record(kind, item)}
+                             for item in repo_data.get(key, []))
+            payload = ''.join(json.dumps(line, ensure_ascii=False) + '\n' for line in lines)
+            path = directory / partition_name(repo_data['name'])
+            # Appending a new gzip member keeps earlier runs intact; gzip readers see one stream
+            with gzip.open(path, 'ab') as f:
+                f.write(payload.encode('utf-8'))
+            paths.append(path)
+        self.written.extend(paths)
+        logger.info(f"Saved activity snapshot for {len(paths)} repositories in "
+                    f"{(time.perf_counter() - started) * 1000:.0f}ms")
+        return paths
+
+    def partitions(self, start: date, end: date, repos: Optional[List[str]] = None) -> List[Path]:
+        """Partition files for collection dates in [start, end], optionally limited to some repositories."""
+        paths = []
+        day = start
+        while day <= end:
+            directory = self.root / day.strftime('%Y-%m-%d')
+            if directory.is_dir():
+                if repos is None:
+                    paths.extend(sorted(directory.glob('*.jsonl.gz')))
+                else:
+                    paths.extend(path for path in (directory / partition_name(repo) for repo in repos) if path.exists())
+            day += timedelta(days=1)
+        return paths
+
+    def read(self, start: date, end: date, repos: Optional[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """Yield raw records from the partitions in the date range."""
+        for path in self.partitions(start, end, repos):
+            name = path.name[:-len('.jsonl.gz')].replace('__', '/', 1)
+            try:
+                with gzip.open(path, 'rt', encoding='utf-8') as f:
+                    for line in f:
+                        record = json.loads(line)
+                        record['repo'] = name
+                        yield record
+            except (OSError, EOFError, ValueError) as e:
+                # A run killed mid-write leaves a truncated member; keep what was readable
+                logger.warning(f"Skipping unreadable snapshot data in {path}: {e}")
+
+    def load(self, start: date, end: date, repos: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Merge snapshots in the date range into per-repository activity, newest first.
+
+        Items seen by several runs are kept once: commits by SHA, PRs and issues
+        by number with their most recently updated version. Fields snapshots do
+        not store (bodies, file lists) are filled in empty, so the records render
+        like collected ones.
+        """
+        merged: Dict[str, Dict[str, Any]] = {}
+        for record in self.read(start, end, repos):
+            repo = merged.setdefault(record['repo'], {
+                'name': record['repo'], 'description': '', 'commits': {}, 'pull_requests': {}, 'issues': {},
+                'file_changes': []})
+            kind = record.pop('kind')
+            record.pop('repo')
+            record.pop('collected_at', None)
+            if kind == 'repo':
+                repo['description'] = record.get('description') or repo['description']
+                continue
+            for field, default in OMITTED_DEFAULTS[kind].items():
+                record.setdefault(field, list(default) if isinstance(default, list) else default)
+            if kind == 'commit':
+                repo['commits'][record.get('full_sha') or record['sha']] = record
+            elif kind in ('pull_request', 'issue'):
+                items = repo['pull_requests' if kind == 'pull_request' else 'issues']
+                previous = items.get(record['number'])
+                if previous is None or record['updated_at'] >= previous['updated_at']:
+                    items[record['number']] = record
+
+        results = []
+        for repo in merged.values():
+            repo['commits'] = sorted(repo['commits'].values(), key=lambda c: c['date'], reverse=True)
+            for key in ('pull_requests', 'issues'):
+                repo[key] = sorted(repo[key].values(), key=lambda item: item['updated_at'], reverse=True)
+            results.append(repo)
+        return sorted(results, key=lambda repo: repo['name'])
@@ -0,0 +1,109 @@
+"""
+Small persistent key/value cache backed by SQLite.
+
+Entries are evicted when they are older than `max_age_seconds`, and the least
+recently used entries are dropped once the stored values exceed `max_bytes`.
+The cache is safe to share between threads.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class SQLiteCache:
+    def __init__(self, path: Path, max_age_seconds: float, max_bytes: int):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                meta TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+        self._db.commit()
+        self.evict()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, Dict[str, Any]]]:
+        """Return (value, meta) for a fresh entry, or None. Does not touch the hit/miss counters."""
+        with self._lock:
+            row = self._db.execute("SELECT value, meta, created_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if time.time() - row[2] > self.max_age_seconds:
+                self._db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._db.commit()
+                return None
+            self._db.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+            return row[0], json.loads(row[1])
+
+    def put(self, key: str, value: bytes, meta: Optional[Dict[str, Any]] = None):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, value, meta, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, value, json.dumps(meta or {}), len(value), now, now))
+            self._db.commit()
+
+    def touch(self, key: str):
+        """Mark an entry as revalidated so its age starts over."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE entries SET created_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+            self._db.commit()
+
+    def record(self, hit: bool):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def evict(self):
+        """Drop expired entries, then least recently used ones until the cache fits in max_bytes."""
+        with self._lock:
+            expired = self._db.execute(
+                "DELETE FROM entries WHERE created_at < ?", (time.time() - self.max_age_seconds,)).rowcount
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            dropped = 0
+            if total > self.max_bytes:
+                rows = self._db.execute("SELECT key, size FROM entries ORDER BY accessed_at").fetchall()
+                stale = []
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    stale.append((key,))
+                    total -= size
+                self._db.executemany("DELETE FROM entries WHERE key = ?", stale)
+                dropped = len(stale)
+            self._db.commit()
+        if expired or dropped:
+            logger.info(f"Evicted {expired} expired and {dropped} least recently used entries from {self.path.name}")
+
+    def close(self):
+        self.evict()
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,77 @@
+"""
+Stage checkpoints for a digest run.
+
+Each stage of a daily run (collect, summarize, notify, commit) saves what the
+later stages need (the collected activity and its window, the staged
+watermarks, the digest, the commit) as a JSON file under
+digests/.state/stages/. A rerun after a failure resumes from the first stage
+without a checkpoint, so a failed push does not re-collect and re-generate.
+The collect, summarize and publish subcommands hand over through the same
+files. Checkpoints are cleared once the digest is published, and ignored
+when they are too old or were written for a different configuration.
+"""
+
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from records import jsonable
+
+logger = logging.getLogger(__name__)
+
+
+class StageStore:
+    def __init__(self, path: Path, key: str = '', max_age_hours: Optional[float] = None):
+        self.path = Path(path)
+        # Identifies the run configuration, so a checkpoint is never resumed by another one
+        self.key = key
+        self.max_age_seconds = max_age_hours * 3600 if max_age_hours else None
+
+    def _file(self, stage: str) -> Path:
+        return self.path / f'{stage}.json'
+
+    def save(self, stage: str, payload: Dict[str, Any]):
+        """Write a stage's output atomically (write a temp file, then rename)."""
+        self.path.mkdir(parents=True, exist_ok=True)
+        target = self._file(stage)
+        tmp_path = target.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'key': self.key, 'saved_at': time.time(), 'payload': payload}, f, default=jsonable)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, target)
+        logger.info(f"Saved {stage} checkpoint to {target}")
+
+    def load(self, stage: str) -> Optional[Dict[str, Any]]:
+        """A stage's saved output, or None if it is missing, unreadable, stale or from another configuration."""
+        try:
+            with open(self._file(stage), 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable {stage} checkpoint: {e}")
+            return None
+        if checkpoint.get('key') != self.key:
+            logger.info(f"Ignoring {stage} checkpoint from a different configuration")
+            return None
+        age = time.time() - checkpoint['saved_at']
+        if self.max_age_seconds is not None and age > self.max_age_seconds:
+            logger.info(f"Ignoring {stage} checkpoint saved {age / 3600:.1f}h ago")
+            return None
+        return checkpoint['payload']
+
+    def require(self, stage: str, command: str) -> Dict[str, Any]:
+        """Load a stage's output, or explain which subcommand has to run first."""
+        payload = self.load(stage)
+        if payload is None:
+            raise ValueError(f"No {stage} output in {self.path}; run the '{command}' subcommand first")
+        return payload
+
+    def clear(self):
+        """Remove every checkpoint (once the digest is published, or to start a run afresh)."""
+        for path in self.path.glob('*.json'):
+            path.unlink()
@@ -0,0 +1,172 @@
+"""
+Microsoft Teams delivery for digests.
+
+A digest is split at section boundaries into cards that stay under the
+connector card size limit, and the cards are posted in order over a pooled
+session that retries throttled and failed requests. Cards that still cannot
+be delivered go to an on-disk outbox and are sent, oldest first, before
+anything else on the next run. The outbox only records a fingerprint of the
+webhook URL, so it never holds the secret itself; cards queued for another
+webhook are left alone until they expire.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Boundaries to split a digest at, tried in order: sections, subsections, paragraphs, lines
+BOUNDARIES = ('## ', '### ', '\n\n', '\n')
+
+
+def _size(text: str) -> int:
+    # Cards are sent as JSON, so count the escaped form
+    return len(json.dumps(text))
+
+
+def _blocks(text: str, boundary: str) -> Tuple[List[str], str]:
+    """Split text at one kind of boundary; returns the blocks and the string that rejoins them."""
+    if not boundary.startswith('#'):
+        return text.split(boundary), boundary
+    blocks, block = [], []
+    for line in text.split('\n'):
+        if line.startswith(boundary) and block:
+            blocks.append('\n'.join(block))
+            block = []
+        block.append(line)
+    blocks.append('\n'.join(block))
+    return blocks, '\n'
+
+
+def _split(text: str, max_bytes: int, boundaries: Tuple[str, ...]) -> List[str]:
+    """Pack text into parts of at most max_bytes, splitting at the coarsest boundary that works."""
+    if _size(text) <= max_bytes:
+        return [text]
+    if not boundaries:
+        # A single line over the limit: cut it by characters, shrinking each cut to allow for escaping
+        parts = []
+        while text:
+            length = max_bytes
+            while length > 1 and _size(text[:length]) > max_bytes:
+                length = min(length - 1, length * max_bytes // _size(text[:length]))
+            parts.append(text[:length])
+            text = text[length:]
+        return parts
+
+    blocks, joiner = _blocks(text, boundaries[0])
+    # Pack whole blocks into parts; only blocks that are too large on their own are split further
+    parts, part = [], ''
+    for block in blocks:
+        candidate = f"{part}{joiner}{block}" if part else block
+        if _size(candidate) <= max_bytes:
+            part = candidate
+            continue
+        if part:
+            parts.append(part)
+        if _size(block) <= max_bytes:
+            part = block
+        else:
+            pieces = _split(block, max_bytes, boundaries[1:])
+            parts.extend(pieces[:-1])
+            part = pieces[-1]
+    if part:
+        parts.append(part)
+    return parts
+
+
+def split_cards(content: str, max_bytes: int) -> List[str]:
+    """Split a digest into card texts of at most max_bytes, keeping sections together where possible."""
+    parts = _split(content.strip(), max_bytes, BOUNDARIES)
+    return [part.strip('\n') for part in parts if part.strip()]
+
+
+def fingerprint(webhook_url: str) -> str:
+    return hashlib.sha256(webhook_url.encode('utf-8')).hexdigest()[:16]
+
+
+class TeamsDelivery:
+    def __init__(self, webhook_url: str, session: Any, outbox_dir: Path, max_card_bytes: int,
+                 timeout: float, outbox_max_age_days: float):
+        self.webhook_url = webhook_url
+        self.session = session
+        self.outbox_dir = Path(outbox_dir)
+        self.max_card_bytes = max_card_bytes
+        self.timeout = timeout
+        self.outbox_max_age_seconds = outbox_max_age_days * 86400
+        self.webhook = fingerprint(webhook_url)
+
+    def _post(self, card: Dict[str, str]):
+        import pymsteams
+        message = pymsteams.connectorcard(self.webhook_url)
+        message.title(card['title'])
+        message.text(card['text'])
+        response = self.session.post(self.webhook_url, json=message.payload, timeout=self.timeout)
+        response.raise_for_status()
+
+    def _queue(self, cards: List[Dict[str, str]]):
+        self.outbox_dir.mkdir(parents=True, exist_ok=True)
+        stamp = time.time_ns()
+        for position, card in enumerate(cards):
+            path = self.outbox_dir / f'{stamp}-{position:03d}.json'
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_text(json.dumps({'webhook': self.webhook, 'queued_at': time.time(), **card}),
+                                encoding='utf-8')
+            os.replace(tmp_path, path)
+        logger.warning(f"Queued {len(cards)} Teams card(s) in {self.outbox_dir} for the next run")
+
+    def flush_outbox(self) -> Tuple[int, bool]:
+        """Send queued cards for this webhook, oldest first; returns (sent, whether the outbox was emptied)."""
+        sent = 0
+        for path in sorted(self.outbox_dir.glob('*.json')):
+            try:
+                card = json.loads(path.read_text(encoding='utf-8'))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Dropping unreadable outbox entry {path.name}: {e}")
+                path.unlink(missing_ok=True)
+                continue
+            if time.time() - card['queued_at'] > self.outbox_max_age_seconds:
+                logger.warning(f"Dropping Teams card queued {(time.time() - card['queued_at']) / 86400:.1f} days ago")
+                path.unlink()
+                continue
+            if card['webhook'] != self.webhook:
+                continue
+            try:
+                self._post(card)
+            except Exception as e:
+                logger.error(f"Teams outbox still undeliverable: {e}")
+                return sent, False
+            path.unlink()
+            sent += 1
+        if sent:
+            logger.info(f"Delivered {sent} queued Teams card(s) from earlier runs")
+        return sent, True
+
+    def send(self, title: str, content: str) -> Dict[str, int]:
+        """Deliver a digest as one or more cards; whatever fails is queued in the outbox instead of raised."""
+        started = time.perf_counter()
+        texts = split_cards(content, self.max_card_bytes)
+        cards = [{'title': title if len(texts) == 1 else f"{title} ({number}/{len(texts)})", 'text': text}
+                 for number, text in enumerate(texts, 1)]
+        backlog, outbox_clear = self.flush_outbox()
+
+        sent = 0
+        if outbox_clear:
+            # Keep cards in order: the first failure queues it and everything after it
+            for card in cards:
+                try:
+                    self._post(card)
+                except Exception as e:
+                    logger.error(f"Failed to send digest to Microsoft Teams: {e}")
+                    break
+                sent += 1
+        if sent < len(cards):
+            self._queue(cards[sent:])
+        else:
+            logger.info(f"Digest sent to Microsoft Teams in {len(cards)} card(s).")
+        return {'cards': len(cards), 'sent': sent, 'queued': len(cards) - sent, 'backlog_sent': backlog,
+                'seconds': round(time.perf_counter() - started, 3)}
@@ -0,0 +1,6 @@
+"""The project's modules live at the repository root; make them importable from the tests."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
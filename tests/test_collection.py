@@ -0,0 +1,106 @@
+"""GraphQL and REST collection return the same kinds of items (generate_digest collectors)."""
+
+import logging
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import generate_digest
+from benchmark import REPO_NAME, SyntheticFixtures, SyntheticGitHub
+from commit_clusters import CommitClusterer
+
+
+class CommitsWithoutPullRequests(SyntheticGitHub):
+    """Synthetic repository whose commits were pushed straight to the default branch."""
+
+    def _commit(self, index):
+        return dict(super()._commit(index), associatedPullRequests={'nodes': []})
+
+
+def make_generator(monkeypatch, tmp_path, github=None):
+    monkeypatch.setenv('PAT_TOKEN', 'token')
+    monkeypatch.setenv('DIGEST_METRICS', 'true')
+    fixtures = SyntheticFixtures(12, 0, 3, 100)
+    if github is not None:
+        fixtures.github = github
+    generator = generate_digest.AIDigestGenerator(fixtures=fixtures, repos=[REPO_NAME], digests_dir=tmp_path)
+    generator.scheduler.max_rate = generator.scheduler.rate = float('inf')
+    return generator
+
+
+def test_graphql_reports_commits_left_without_file_lists(tmp_path, monkeypatch, caplog):
+    monkeypatch.setattr(generate_digest, 'MAX_COMMIT_FILE_LOOKUPS', 5)
+    generator = make_generator(monkeypatch, tmp_path, CommitsWithoutPullRequests(12, 0, 3, 100))
+    with caplog.at_level(logging.WARNING, logger='generate_digest'):
+        data = generator.collect_repo_data(REPO_NAME)
+
+    assert [bool(commit['files_changed']) for commit in data['commits']] == [True] * 5 + [False] * 7
+    assert generator.metrics.repos[REPO_NAME]['commit_files_missing'] == 7
+    assert "7 commits outside a pull request have no file list" in caplog.text
+    # GraphQL pages plus one REST lookup per file list, as the server saw them
+    stats = generator.metrics.repos[REPO_NAME]
+    assert stats['requests'] == generator.fixtures.github.requests == stats['graphql_requests'] + 5
+
+
+def test_graphql_commits_in_a_pull_request_need_no_lookups(tmp_path, monkeypatch):
+    generator = make_generator(monkeypatch, tmp_path)
+    data = generator.collect_repo_data(REPO_NAME)
+
+    assert all(commit['files_changed'] for commit in data['commits'])
+    assert generator.metrics.repos[REPO_NAME]['commit_file_lookups'] == 0
+    assert generator.metrics.repos[REPO_NAME]['commit_files_missing'] == 0
+
+
+def test_rest_issues_leave_out_pull_requests(tmp_path, monkeypatch):
+    generator = make_generator(monkeypatch, tmp_path)
+    monkeypatch.setattr(generate_digest, 'MAX_ISSUES_PER_REPO', 2)
+    updated = generator.end_date - timedelta(hours=1)
+
+    def item(number, kind):
+        return SimpleNamespace(number=number, title=f"#{number}", body='', state='open',
+                               user=SimpleNamespace(login='ada'), created_at=updated, updated_at=updated,
+                               labels=[], comments=0, html_url=f"https://github.com/{REPO_NAME}/{kind}/{number}")
+
+    listed = [item(1, 'pull'), item(2, 'issues'), item(3, 'pull'), item(4, 'issues'), item(5, 'issues')]
+    repo = SimpleNamespace(get_issues=lambda **kwargs: iter(listed))
+    issues = list(generator._rest_issues(repo, datetime.now() - timedelta(days=1)))
+
+    assert [issue['number'] for issue in issues] == [2, 4]
+
+
+def test_requests_are_counted_per_thread(tmp_path, monkeypatch):
+    generator = make_generator(monkeypatch, tmp_path)
+    scheduler = generator.scheduler
+    with scheduler.track() as outer:
+        with scheduler.track() as inner:
+            scheduler.send(lambda: SimpleNamespace(status_code=304, headers={}, content=b''))
+        scheduler.send(lambda: SimpleNamespace(status_code=200, headers={}, content=b'{}'))
+    assert inner == {'requests': 1, 'retries': 0, 'not_modified': 1}
+    assert outer == {'requests': 2, 'retries': 0, 'not_modified': 1}
+
+
+def test_rest_commits_are_linked_to_their_pull_requests(tmp_path, monkeypatch):
+    generator = make_generator(monkeypatch, tmp_path)
+    updated = generator.end_date - timedelta(hours=1)
+
+    def commit(sha, message, path='a.py'):
+        return SimpleNamespace(sha=sha, author=SimpleNamespace(login='ada'), files=[SimpleNamespace(filename=path)],
+                               commit=SimpleNamespace(message=message,
+                                                      author=SimpleNamespace(name='Ada', date=updated)))
+
+    commits = [commit('c' * 40, 'Merge pull request #7'), commit('b' * 40, 'wip'),
+               commit('a' * 40, 'Add login page'), commit('d' * 40, 'Update changelog', 'CHANGELOG.md')]
+    pr = SimpleNamespace(number=7, title='Login', body='', state='closed', user=SimpleNamespace(login='ada'),
+                         created_at=updated, updated_at=updated, merged_at=updated, closed_at=updated, labels=[],
+                         merge_commit_sha='c' * 40, get_files=lambda: [SimpleNamespace(filename='a.py')],
+                         get_commits=lambda: iter([commits[2], commits[1]]))
+    repo = SimpleNamespace(description='', get_commits=lambda **kwargs: iter(commits),
+                           get_pulls=lambda **kwargs: iter([pr]), get_issues=lambda **kwargs: iter([]))
+    client = SimpleNamespace(get_repo=lambda name: repo, per_page=100)
+    monkeypatch.setattr(generator, '_github_client', lambda: client)
+
+    data = generator._collect_repo_data_rest(REPO_NAME, generator.end_date - timedelta(days=1))
+
+    assert [c['pr_number'] for c in data['commits']] == [7, 7, 7, None]
+    clusters = CommitClusterer(0.5, 0.5).cluster(data['commits'])
+    assert [[c['sha'] for c in cluster] for cluster in clusters] == [['cccccccc', 'bbbbbbbb', 'aaaaaaaa'],
+                                                                     ['dddddddd']]
@@ -0,0 +1,72 @@
+"""Commit clustering (commit_clusters.py): PR grouping, MinHash candidates and the PR guard."""
+
+from commit_clusters import CommitClusterer, _DisjointSet, jaccard, minhash, normalize_subject, shingles
+
+
+def commit(sha, message, author='ada', files=(), pr=None):
+    return {'sha': sha, 'message': message, 'author': author, 'files_changed': list(files), 'pr_number': pr}
+
+
+def shas(clusters):
+    return [[c['sha'] for c in cluster] for cluster in clusters]
+
+
+def clusterer():
+    return CommitClusterer(message_similarity=0.5, file_overlap=0.5)
+
+
+def test_normalize_subject_drops_prefixes_shas_and_numbers():
+    assert normalize_subject("fix(api): Retry 3 times after a1b2c3d4 failed\n\nbody") == "retry times after failed"
+    assert normalize_subject("Merge pull request #12 from org/branch") == ""
+
+
+def test_minhash_is_deterministic_and_tracks_similarity():
+    left = shingles("add retry to the webhook sender")
+    right = shingles("add retry to the webhook client")
+    assert minhash(left) == minhash(shingles("add retry to the webhook sender"))
+    agreement = sum(a == b for a, b in zip(minhash(left), minhash(right))) / len(minhash(left))
+    assert abs(agreement - jaccard(left, right)) < 0.35
+    assert minhash([]) != minhash(left)
+
+
+def test_commits_of_one_pull_request_are_grouped():
+    commits = [commit('a', 'Add login page', pr=7), commit('b', 'wip', author='bob', pr=7),
+               commit('c', 'Update changelog', pr=None)]
+    assert shas(clusterer().cluster(commits)) == [['a', 'b'], ['c']]
+
+
+def test_similar_subjects_by_one_author_are_grouped_in_input_order():
+    commits = [commit('a', 'Fix flaky retry test in webhook sender'),
+               commit('b', 'Bump dependencies'),
+               commit('c', 'fix: flaky retry test in webhook sender (2)')]
+    assert shas(clusterer().cluster(commits)) == [['a', 'c'], ['b']]
+
+
+def test_similar_subjects_by_different_authors_stay_apart():
+    commits = [commit('a', 'Fix flaky retry test in webhook sender', author='ada'),
+               commit('b', 'Fix flaky retry test in webhook sender', author='bob')]
+    assert shas(clusterer().cluster(commits)) == [['a'], ['b']]
+
+
+def test_short_subjects_only_join_through_files():
+    commits = [commit('a', 'wip'), commit('b', 'wip'),
+               commit('c', 'fix typo', files=['docs/a.md', 'docs/b.md']),
+               commit('d', 'typo', files=['docs/a.md', 'docs/b.md'])]
+    assert shas(clusterer().cluster(commits)) == [['a'], ['b'], ['c', 'd']]
+
+
+def test_commits_of_different_pull_requests_are_never_grouped():
+    # 'b' matches both PRs by message and files, but may only join one of them
+    commits = [commit('a', 'Refactor the token cache layer', files=['cache.py'], pr=1),
+               commit('b', 'Refactor the token cache layer', files=['cache.py']),
+               commit('c', 'Refactor the token cache layer', files=['cache.py'], pr=2)]
+    assert shas(clusterer().cluster(commits)) == [['a', 'b'], ['c']]
+
+
+def test_disjoint_set_refuses_to_join_two_pull_requests():
+    groups = _DisjointSet([1, None, 2, None])
+    assert groups.union(0, 1)
+    assert groups.union(2, 3)
+    assert not groups.union(1, 3)
+    assert groups.find(1) == 0 and groups.find(3) == 2
+    assert groups.union(3, 2)
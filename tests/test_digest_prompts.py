@@ -0,0 +1,46 @@
+"""The digest window named in prompts and the fallback digest (generate_digest)."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+import generate_digest
+from benchmark import REPO_NAME, SyntheticFixtures
+
+END = datetime(2025, 7, 15, 8, 0)
+
+
+@pytest.fixture
+def generator(tmp_path, monkeypatch):
+    monkeypatch.setenv('PAT_TOKEN', 'token')
+    return generate_digest.AIDigestGenerator(fixtures=SyntheticFixtures(3, 0, 3, 100), repos=[REPO_NAME],
+                                             digests_dir=tmp_path)
+
+
+def repo_data():
+    return {'name': 'org/api', 'description': '', 'file_changes': [], 'pull_requests': [], 'issues': [],
+            'commits': [{'sha': 'abc1234', 'full_sha': 'abc1234', 'message': 'Add login page', 'author': 'ada',
+                         'login': 'ada', 'date': '2025-07-15T07:00:00', 'files_changed': [], 'pr_number': None}]}
+
+
+@pytest.mark.parametrize('span, label', [
+    (timedelta(hours=24), 'Last 24 hours'),
+    (timedelta(hours=31), 'Last 31 hours'),
+    (timedelta(days=3), 'Last 3 days'),
+    (timedelta(minutes=20), 'Last 1 hour'),
+])
+def test_period_label_follows_the_window(generator, span, label):
+    generator.start_date, generator.end_date = END - span, END
+    assert generator.period_label() == f"{label} ({(END - span).strftime('%Y-%m-%d %H:%M')} to 2025-07-15 08:00)"
+
+
+def test_prompts_and_fallback_name_the_actual_window(generator):
+    generator.start_date, generator.end_date = END - timedelta(days=3), END
+    expected = "PERIOD: Last 3 days (2025-07-12 08:00 to 2025-07-15 08:00)"
+
+    assert expected in generator.generate_gemini_prompt([repo_data()])
+    assert expected in generator.generate_merge_prompt({'org/api': 'Summary'})
+    assert expected in generator.generate_repo_prompt(repo_data())
+    fallback = generator.generate_fallback_digest([repo_data()])
+    assert "for the last 3 days (2025-07-12 08:00 to 2025-07-15 08:00)" in fallback
+    assert '24 hours' not in fallback
@@ -0,0 +1,135 @@
+"""GitPublisher against a local bare repository."""
+
+import subprocess
+
+import pytest
+
+from git_publisher import GitPublisher
+
+
+def git(cwd, *args):
+    return subprocess.run(['git', *args], cwd=cwd, capture_output=True, text=True, check=True).stdout.strip()
+
+
+def clone(remote, path):
+    subprocess.run(['git', 'clone', '-q', str(remote), str(path)], capture_output=True, check=True)
+    git(path, 'config', 'user.email', 'digest@example.com')
+    git(path, 'config', 'user.name', 'Digest')
+    return path
+
+
+@pytest.fixture
+def remote(tmp_path):
+    remote = tmp_path / 'remote.git'
+    subprocess.run(['git', 'init', '-q', '--bare', str(remote)], check=True)
+    seed = clone(remote, tmp_path / 'seed')
+    (seed / 'README.md').write_text('digests\n')
+    git(seed, 'add', 'README.md')
+    git(seed, 'commit', '-q', '-m', 'init')
+    git(seed, 'push', '-q', 'origin', 'HEAD')
+    return remote
+
+
+def push_other_digest(remote, tmp_path):
+    """Push a commit from another clone, as a concurrent run would."""
+    other = clone(remote, tmp_path / 'other')
+    (other / 'other.md').write_text('# Other digest\n')
+    git(other, 'add', 'other.md')
+    git(other, 'commit', '-q', '-m', 'Add other digest')
+    git(other, 'push', '-q', 'origin', 'HEAD')
+
+
+def remote_log(remote):
+    return git(remote, 'log', '--format=%s').splitlines()
+
+
+def test_commit_and_push(remote, tmp_path):
+    work = clone(remote, tmp_path / 'work')
+    publisher = GitPublisher(work)
+    (work / 'digest.md').write_text('# Digest\n')
+
+    sha = publisher.commit(['digest.md', 'missing.json'], 'Add digest')
+
+    assert sha == git(work, 'rev-parse', 'HEAD') == publisher.head()
+    assert publisher.unpushed == [sha]
+    publisher.push()
+    assert publisher.unpushed == []
+    assert remote_log(remote) == ['Add digest', 'init']
+
+
+def test_unchanged_files_are_not_committed(remote, tmp_path):
+    work = clone(remote, tmp_path / 'work')
+    publisher = GitPublisher(work)
+    (work / 'digest.md').write_text('# Digest\n')
+    first = publisher.commit(['digest.md'], 'Add digest')
+
+    assert publisher.commit(['digest.md'], 'Add digest again') is None
+    assert publisher.commit(['missing.md'], 'Nothing here') is None
+    assert publisher.unpushed == [first]
+    assert git(work, 'rev-parse', 'HEAD') == first
+
+
+def test_rejected_push_is_rebased_and_retried(remote, tmp_path):
+    work = clone(remote, tmp_path / 'work')
+    publisher = GitPublisher(work)
+    (work / 'digest.md').write_text('# Digest\n')
+    publisher.commit(['digest.md'], 'Add digest')
+
+    # A concurrent run pushes first
+    push_other_digest(remote, tmp_path)
+
+    publisher.push()
+    assert remote_log(remote) == ['Add digest', 'Add other digest', 'init']
+    assert publisher.unpushed == []
+
+
+def test_push_gives_up_after_max_attempts(remote, tmp_path):
+    work = clone(remote, tmp_path / 'work')
+    publisher = GitPublisher(work, max_attempts=1)
+    (work / 'digest.md').write_text('# Digest\n')
+    publisher.commit(['digest.md'], 'Add digest')
+    push_other_digest(remote, tmp_path)
+
+    with pytest.raises(subprocess.CalledProcessError):
+        publisher.push()
+    assert remote_log(remote) == ['Add other digest', 'init']
+
+
+def record_git(monkeypatch):
+    commands = []
+    run = subprocess.run
+
+    def recording_run(args, **kwargs):
+        commands.append(args[1])
+        return run(args, **kwargs)
+
+    monkeypatch.setattr('git_publisher.subprocess.run', recording_run)
+    return commands
+
+
+def test_publishing_runs_one_add_and_one_commit_per_digest(remote, tmp_path, monkeypatch):
+    work = clone(remote, tmp_path / 'work')
+    publisher = GitPublisher(work)
+    (work / 'digest.md').write_text('# Digest\n')
+    (work / 'state.json').write_text('{}\n')
+    commands = record_git(monkeypatch)
+
+    sha = publisher.commit(['digest.md', 'state.json'], 'Add digest')
+    publisher.push()
+
+    assert commands == ['add', 'commit', 'push']
+    assert sha == git(work, 'rev-parse', 'HEAD')
+
+
+def test_commit_in_a_worktree_is_read_from_the_commit_output(remote, tmp_path, monkeypatch):
+    work = clone(remote, tmp_path / 'work')
+    git(work, 'worktree', 'add', '-q', '-b', 'digests', str(tmp_path / 'tree'))
+    tree = tmp_path / 'tree'
+    publisher = GitPublisher(tree)
+    (tree / 'digest.md').write_text('# Digest\n')
+    commands = record_git(monkeypatch)
+
+    sha = publisher.commit(['digest.md'], 'Add digest')
+
+    assert commands == ['add', 'commit']
+    assert git(tree, 'rev-parse', 'HEAD').startswith(sha)
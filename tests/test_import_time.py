@@ -0,0 +1,23 @@
+"""`import generate_digest` stays within its budget and leaves the heavy SDKs unloaded (check_import_time.py)."""
+
+import subprocess
+import sys
+from pathlib import Path
+
+from check_import_time import DEFAULT_BUDGET_MS, HEAVY_MODULES, best_import_time, heavy_imports
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def test_generate_digest_loads_no_heavy_modules():
+    # A fresh interpreter: the tests themselves import requests and PyGithub
+    code = ("import sys, generate_digest; "
+            f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))")
+    result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == ''
+
+
+def test_generate_digest_imports_within_budget():
+    total, imported = best_import_time('generate_digest')
+    assert heavy_imports(imported) == []
+    assert total <= DEFAULT_BUDGET_MS
@@ -0,0 +1,115 @@
+"""Model chain deadlines, fallback and hedging (model_chain.py), using the local stand-in model."""
+
+import threading
+import time
+
+import pytest
+
+from model_chain import (
+    LatencyHistory, LocalModel, LocalResponse, ModelChain, ModelChainExhausted, ModelTier, build_tiers,
+)
+
+PROMPT = "## org/api\n### Commits (3)\n### Pull Requests (1)\n\n## org/web\n### Issues (2)\n"
+
+
+class SlowFirstCall:
+    """Local model whose first call takes `first_ms` and later calls `then_ms`."""
+
+    def __init__(self, first_ms: float, then_ms: float):
+        self.latencies = [first_ms, then_ms]
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False):
+        with self._lock:
+            latency = self.latencies[min(self.calls, 1)]
+            self.calls += 1
+        return LocalModel(latency_ms=latency).generate_content(prompt, stream)
+
+
+def chain(*tiers, history=None, hedge_default=None):
+    return ModelChain(list(tiers), history or LatencyHistory(None, 50), 0.9, 5, hedge_default)
+
+
+def tier(name, model, timeout=5.0):
+    return ModelTier(name, lambda: model, timeout)
+
+
+def test_local_model_lists_repository_counts():
+    text = LocalModel().generate_content(PROMPT).text
+    assert "### org/api\n- 3 commits, 1 pull requests" in text
+    assert "### org/web\n- 2 issues" in text
+
+
+def test_missed_deadline_falls_back_to_the_next_tier():
+    started = time.perf_counter()
+    result = chain(tier('slow', LocalModel(latency_ms=3000), timeout=0.2), tier('local', LocalModel())).generate(
+        PROMPT, 'digest')
+    assert result.tier == 'local'
+    assert result.failed_tiers == ['slow']
+    assert time.perf_counter() - started < 1.5
+
+
+def test_failing_and_empty_tiers_fall_back_in_order():
+    class Empty:
+        def generate_content(self, prompt, stream=False):
+            return LocalResponse('', prompt, 0)
+
+    result = chain(tier('broken', LocalModel(fail=True)), tier('empty', Empty()), tier('local', LocalModel())).generate(
+        PROMPT, 'digest')
+    assert (result.tier, result.failed_tiers) == ('local', ['broken', 'empty'])
+
+
+def test_exhausted_chain_raises():
+    with pytest.raises(ModelChainExhausted, match='broken'):
+        chain(tier('broken', LocalModel(fail=True))).generate(PROMPT, 'digest')
+
+
+def test_slow_call_is_hedged_after_the_latency_percentile():
+    history = LatencyHistory(None, 50)
+    for _ in range(5):
+        history.record('flaky:digest:call', 0.1)
+    model = SlowFirstCall(first_ms=3000, then_ms=10)
+
+    started = time.perf_counter()
+    result = chain(tier('flaky', model), history=history).generate(PROMPT, 'digest')
+
+    assert result.hedged
+    assert model.calls == 2
+    assert time.perf_counter() - started < 1.5
+
+
+def test_hedged_stream_relays_only_the_winning_attempt():
+    model = SlowFirstCall(first_ms=3000, then_ms=10)
+    chunks = []
+    result = chain(tier('flaky', model), hedge_default=0.1).generate(PROMPT, 'digest', chunks.append)
+    assert result.hedged
+    assert ''.join(chunks) == result.text
+    assert result.first_token_seconds < 1.5
+
+
+def test_no_hedging_without_history_by_default():
+    model = SlowFirstCall(first_ms=200, then_ms=10)
+    result = chain(tier('flaky', model)).generate(PROMPT, 'digest')
+    assert not result.hedged
+    assert model.calls == 1
+
+
+def test_latency_history_persists_recent_samples(tmp_path):
+    path = tmp_path / 'model_latency.json'
+    history = LatencyHistory(path, 3)
+    for seconds in (1, 2, 3, 4, 5):
+        history.record('gemini:digest:call', seconds)
+    reloaded = LatencyHistory(path, 3)
+    assert reloaded.samples == {'gemini:digest:call': [3, 4, 5]}
+    assert reloaded.percentile('gemini:digest:call', 0.9, 3) == 5
+    assert reloaded.percentile('gemini:digest:call', 0.9, 4) is None
+
+
+def test_build_tiers_reads_specs():
+    tiers = build_tiers([{'type': 'gemini', 'model': 'gemini-1.5-flash'}, {'type': 'local', 'timeout': 5}],
+                        lambda name, timeout: (name, timeout), 120)
+    assert [(t.name, t.timeout) for t in tiers] == [('gemini-1.5-flash', 120.0), ('local', 5.0)]
+    assert tiers[0].model == ('gemini-1.5-flash', 120.0)
+    with pytest.raises(ValueError):
+        build_tiers([{'type': 'local'}, {'type': 'local'}], lambda name, timeout: None, 120)
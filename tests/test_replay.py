@@ -0,0 +1,54 @@
+"""Recording and replaying GitHub traffic with replay.FixtureStore."""
+
+from datetime import datetime, timedelta
+
+import generate_digest
+import replay
+from benchmark import REPO_NAME, SyntheticGitHub
+
+RECORDING_AGE = timedelta(days=3)
+
+
+class RecordedEarlier(datetime):
+    """datetime whose now() is RECORDING_AGE in the past, as when the fixture was recorded."""
+
+    @classmethod
+    def now(cls, tz=None):
+        return datetime.now(tz) - RECORDING_AGE
+
+
+def make_generator(fixtures, digests_dir):
+    generator = generate_digest.AIDigestGenerator(fixtures=fixtures, repos=[REPO_NAME], digests_dir=digests_dir)
+    generator.scheduler.max_rate = generator.scheduler.rate = float('inf')
+    return generator
+
+
+def test_replay_of_an_older_recording_uses_the_recorded_window(tmp_path, monkeypatch):
+    github = SyntheticGitHub(30)
+    github.now -= RECORDING_AGE
+    monkeypatch.setattr(replay.HTTPAdapter, 'send', lambda self, request, **kwargs: github.send(request))
+    monkeypatch.setenv('PAT_TOKEN', 'token')
+
+    with monkeypatch.context() as patched:
+        patched.setattr(generate_digest, 'datetime', RecordedEarlier)
+        recorder = make_generator(replay.FixtureStore(tmp_path / 'fixtures', 'record'), tmp_path / 'record')
+        recorded = recorder.collect_repo_data(REPO_NAME)
+    assert 'error' not in recorded
+    assert recorded['pull_requests'] and recorded['issues']
+
+    requests_recorded = github.requests
+    player = make_generator(replay.FixtureStore(tmp_path / 'fixtures', 'replay'), tmp_path / 'replay')
+    assert (player.start_date, player.end_date) == (recorder.start_date, recorder.end_date)
+    replayed = player.collect_repo_data(REPO_NAME)
+
+    assert 'error' not in replayed
+    assert github.requests == requests_recorded
+    for kind in ('commits', 'pull_requests', 'issues'):
+        assert [item['number' if kind != 'commits' else 'sha'] for item in replayed[kind]] == \
+               [item['number' if kind != 'commits' else 'sha'] for item in recorded[kind]]
+
+
+def test_replay_without_a_recorded_window_keeps_the_current_one(tmp_path):
+    store = replay.FixtureStore(tmp_path, 'replay')
+    start, end = datetime(2024, 1, 1), datetime(2024, 1, 2)
+    assert store.window('daily', start, end) == (start, end)
@@ -0,0 +1,43 @@
+"""Rollups publish every new file: their checkpoints never carry over to the next rollup."""
+
+import json
+from datetime import datetime
+
+import generate_digest
+from test_git_publisher import clone, remote, remote_log  # noqa: F401 (remote is a fixture)
+
+
+def at(moment):
+    class Frozen(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return moment
+    return Frozen
+
+
+def test_second_rollup_is_delivered_and_committed(remote, tmp_path, monkeypatch):  # noqa: F811
+    work = clone(remote, tmp_path / 'work')
+    monkeypatch.chdir(work)
+    monkeypatch.setenv('DIGEST_SINKS', json.dumps([{'type': 'file', 'path': str(tmp_path / 'delivered')}]))
+
+    for moment in (datetime(2025, 7, 14, 9, 0), datetime(2025, 7, 14, 10, 30)):
+        monkeypatch.setattr(generate_digest, 'datetime', at(moment))
+        generator = generate_digest.AIDigestGenerator(use_cache=False, period='weekly', repos=['org/api'],
+                                                      digests_dir=work / 'digests')
+        assert generator.run_rollup(exit_on_error=False)
+
+    assert sorted(path.name for path in (tmp_path / 'delivered').iterdir()) == [
+        '2025-07-14-pulse-ai-weekly-09-00 UTC.md', '2025-07-14-pulse-ai-weekly-10-30 UTC.md']
+    assert len(remote_log(remote)) == 3
+    assert not list(generator.stages.path.glob('*.json'))
+
+
+def test_each_period_checkpoints_in_its_own_directory(tmp_path):
+    daily = generate_digest.AIDigestGenerator(use_cache=False, repos=['org/api'], digests_dir=tmp_path)
+    weekly = generate_digest.AIDigestGenerator(use_cache=False, period='weekly', repos=['org/api'],
+                                               digests_dir=tmp_path)
+    weekly.stages.save('notify', {'delivered': ['file'], 'filepath': 'weekly.md'})
+
+    daily.stages.clear()
+
+    assert weekly.stages.load('notify') == {'delivered': ['file'], 'filepath': 'weekly.md'}
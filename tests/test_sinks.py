@@ -0,0 +1,75 @@
+"""Sink dispatch (sinks.deliver_all) and resuming deliveries in AIDigestGenerator.publish."""
+
+import logging
+import threading
+
+import pytest
+
+import generate_digest
+from sinks import DigestMessage, Sink, deliver_all
+
+
+class SlowSink(Sink):
+    """Sink that blocks until released, counting its deliveries."""
+
+    kind = 'slow'
+
+    def __init__(self, timeout):
+        super().__init__({}, timeout)
+        self.release = threading.Event()
+        self.calls = 0
+
+    def deliver(self, message):
+        self.calls += 1
+        self.release.wait(5)
+        return {'status': 200}
+
+
+class QuickSink(Sink):
+    kind = 'quick'
+
+    def __init__(self):
+        super().__init__({}, 5)
+        self.calls = 0
+
+    def deliver(self, message):
+        self.calls += 1
+        return None
+
+
+def message(tmp_path):
+    return DigestMessage('Digest', '# Digest\n', str(tmp_path / 'digest.md'), 'daily')
+
+
+def test_sink_past_its_timeout_is_reported_unknown(tmp_path):
+    slow, quick = SlowSink(0.05), QuickSink()
+    results = deliver_all([slow, quick], message(tmp_path))
+    slow.release.set()
+
+    assert results['quick']['ok']
+    assert results['slow']['ok'] is False and results['slow']['unknown']
+    assert 'may still deliver' in results['slow']['error']
+
+
+def test_resumed_publish_does_not_resend_a_timed_out_sink(tmp_path, monkeypatch, caplog):
+    slow, quick = SlowSink(0.05), QuickSink()
+    monkeypatch.setattr(generate_digest, 'build_sinks', lambda *args: [slow, quick])
+    generator = generate_digest.AIDigestGenerator(use_cache=False, repos=['org/api'], digests_dir=tmp_path)
+    failures = iter([RuntimeError('push rejected'), None])
+
+    def commit_and_push(filepath):
+        failure = next(failures)
+        if failure:
+            raise failure
+
+    monkeypatch.setattr(generator, 'commit_and_push', commit_and_push)
+    filepath = str(tmp_path / 'digest.md')
+    with pytest.raises(RuntimeError):
+        generator.publish('# Digest\n', filepath)
+    slow.release.set()
+    assert generator.stages.load('notify') == {'delivered': ['quick'], 'unknown': ['slow'], 'filepath': filepath}
+
+    with caplog.at_level(logging.WARNING, logger='generate_digest'):
+        generator.publish('# Digest\n', filepath)
+    assert (slow.calls, quick.calls) == (1, 1)
+    assert "Delivery to slow timed out in the previous attempt" in caplog.text
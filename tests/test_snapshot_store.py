@@ -0,0 +1,74 @@
+"""Activity snapshots (snapshot_store.py) keep only what rollups need."""
+
+import gzip
+from datetime import datetime, timedelta
+
+import pytest
+
+import generate_digest
+from records import CommitRecord, IssueRecord, PullRequestRecord
+from rollup import repo_metrics
+from snapshot_store import SnapshotStore
+
+COLLECTED_AT = datetime(2025, 7, 15, 9, 0)
+
+
+def repo_data():
+    return {
+        'name': 'org/private-api',
+        'description': 'Internal API',
+        'commits': [CommitRecord(sha='abc1234', full_sha='abc1234' + '0' * 33, author='Ada', login='ada',
+                                 message='Rotate signing keys\n\nOld key: sk_live_secret', date='2025-07-15T08:00:00',
+                                 files_changed=['secrets/keys.yaml'], pr_number=4)],
+        'pull_requests': [PullRequestRecord(number=4, title='Rotate keys', body='Customer list attached',
+                                            state='closed', author='Ada', created_at='2025-07-14T10:00:00',
+                                            updated_at='2025-07-15T08:00:00', merged_at='2025-07-15T08:00:00',
+                                            closed_at='2025-07-15T08:00:00', labels=['security'],
+                                            files_changed=['secrets/keys.yaml'])],
+        'issues': [IssueRecord(number=5, title='Leak report', body='Details of the breach', state='open', author='Bob',
+                               created_at='2025-07-15T07:00:00', updated_at='2025-07-15T07:30:00', labels=[],
+                               comments_count=2)],
+    }
+
+
+def test_snapshots_leave_out_bodies_messages_and_file_paths(tmp_path):
+    store = SnapshotStore(tmp_path)
+    [path] = store.write(COLLECTED_AT, [repo_data()])
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        stored = f.read()
+    for secret in ('sk_live_secret', 'Customer list', 'breach', 'secrets/keys.yaml', '"login"'):
+        assert secret not in stored
+
+    [repo] = store.load(COLLECTED_AT.date(), COLLECTED_AT.date())
+    assert repo['commits'][0]['message'] == 'Rotate signing keys'
+    assert repo['pull_requests'][0]['title'] == 'Rotate keys'
+    assert repo['issues'][0]['number'] == 5
+
+
+def test_rollup_metrics_come_from_the_stored_fields(tmp_path):
+    store = SnapshotStore(tmp_path)
+    store.write(COLLECTED_AT, [repo_data()])
+    [repo] = store.load(COLLECTED_AT.date(), COLLECTED_AT.date())
+    assert repo_metrics(repo, datetime(2025, 7, 14)) == {
+        'commits': 1, 'contributors': 2, 'active_days': 1, 'prs_opened': 1, 'prs_closed': 1,
+        'issues_opened': 1, 'issues_closed': 0,
+    }
+
+
+@pytest.mark.parametrize('clustering', ['true', 'false'])
+def test_rollup_builds_from_written_then_loaded_snapshots(tmp_path, monkeypatch, clustering):
+    monkeypatch.setenv('DIGEST_SNAPSHOTS', 'true')
+    monkeypatch.setenv('DIGEST_CLUSTER_COMMITS', clustering)
+    generator = generate_digest.AIDigestGenerator(use_cache=False, period='weekly', repos=['org/private-api'],
+                                                  digests_dir=tmp_path)
+    collected_at = generator.end_date - timedelta(days=2)
+    generator.snapshots.write(collected_at, [repo_data()])
+
+    prompts = []
+    monkeypatch.setattr(generator, '_call_model', lambda prompt, label: prompts.append(prompt) or 'Summary')
+    loaded = generator.snapshots.load(generator.rollup_first_day(), generator.end_date.date())
+    rollup = generator.generate_rollup(loaded)
+
+    assert '- **abc1234** by Ada: Rotate signing keys' in prompts[0]
+    assert '**#4** Rotate keys (closed) by Ada' in prompts[0]
+    assert '| org/private-api | 1 | 2 | 1 |' in rollup
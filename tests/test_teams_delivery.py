@@ -0,0 +1,123 @@
+"""Teams card splitting and the outbox (teams_delivery.py), with a fake webhook session."""
+
+import json
+import time
+
+import pytest
+
+from teams_delivery import TeamsDelivery, _size, split_cards
+
+WEBHOOK = 'https://example.webhook.office.com/webhookb2/secret'
+
+
+class FakeResponse:
+    def __init__(self, status):
+        self.status = status
+
+    def raise_for_status(self):
+        if self.status >= 400:
+            raise RuntimeError(f"HTTP {self.status}")
+
+
+class FakeSession:
+    """Records posted cards; `fail` makes every post answer 502."""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.posts = []
+
+    def post(self, url, json=None, timeout=None):
+        if self.fail:
+            return FakeResponse(502)
+        self.posts.append((url, json['title'], json['text']))
+        return FakeResponse(200)
+
+
+def delivery(tmp_path, session, webhook=WEBHOOK, max_card_bytes=20000, max_age_days=3):
+    return TeamsDelivery(webhook, session, tmp_path / 'outbox', max_card_bytes, timeout=5,
+                         outbox_max_age_days=max_age_days)
+
+
+def digest(sections, paragraph_chars):
+    return '\n\n'.join(f"## Section {number}\n\n" + 'x' * paragraph_chars + f"\n\n{'y' * paragraph_chars}"
+                       for number in range(sections))
+
+
+def squeezed(text):
+    return ''.join(text.split())
+
+
+def test_digest_under_the_limit_is_one_card():
+    content = digest(3, 100)
+    assert _size(content) <= 2000
+    assert split_cards(content, 2000) == [content]
+
+
+@pytest.mark.parametrize('max_bytes', [250, 251, 260, 300, 1000])
+def test_cards_near_the_limit_stay_under_it_and_keep_the_content(max_bytes):
+    content = digest(5, 110)
+    cards = split_cards(content, max_bytes)
+    assert len(cards) > 1
+    assert all(_size(card) <= max_bytes for card in cards)
+    assert squeezed(''.join(cards)) == squeezed(content)
+
+
+def test_cards_split_at_sections_before_paragraphs():
+    content = digest(4, 100)
+    section = digest(1, 100)
+    cards = split_cards(content, _size(section) + 5)
+    assert len(cards) == 4
+    assert all(card.startswith('## Section') for card in cards)
+
+
+def test_oversized_line_is_cut_by_characters_allowing_for_escaping():
+    # Quotes and newlines double in size once JSON-escaped
+    content = 'a"b\\' * 200
+    cards = split_cards(content, 100)
+    assert all(_size(card) <= 100 for card in cards)
+    assert ''.join(cards) == content
+
+
+def test_failed_cards_are_queued_and_sent_first_on_the_next_run(tmp_path):
+    content = digest(3, 100)
+    result = delivery(tmp_path, FakeSession(fail=True), max_card_bytes=300).send('Digest 1', content)
+    assert result['sent'] == 0 and result['queued'] == result['cards'] > 1
+    queued = sorted((tmp_path / 'outbox').glob('*.json'))
+    assert len(queued) == result['cards']
+    assert WEBHOOK not in queued[0].read_text(encoding='utf-8')
+
+    session = FakeSession()
+    result = delivery(tmp_path, session, max_card_bytes=20000).send('Digest 2', 'Today')
+    assert result == {**result, 'cards': 1, 'sent': 1, 'queued': 0, 'backlog_sent': len(queued)}
+    titles = [title for _, title, _ in session.posts]
+    assert titles == [f"Digest 1 ({number}/{len(queued)})" for number in range(1, len(queued) + 1)] + ['Digest 2']
+    assert not list((tmp_path / 'outbox').glob('*.json'))
+
+
+def test_new_cards_wait_behind_an_undeliverable_outbox(tmp_path):
+    delivery(tmp_path, FakeSession(fail=True)).send('Digest 1', 'Yesterday')
+    result = delivery(tmp_path, FakeSession(fail=True)).send('Digest 2', 'Today')
+    assert result['queued'] == 1
+    queued = [json.loads(path.read_text(encoding='utf-8'))['title']
+              for path in sorted((tmp_path / 'outbox').glob('*.json'))]
+    assert queued == ['Digest 1', 'Digest 2']
+
+
+def test_expired_cards_are_dropped_unsent(tmp_path, monkeypatch):
+    delivery(tmp_path, FakeSession(fail=True)).send('Old digest', 'Last week')
+    now = time.time()
+    monkeypatch.setattr('teams_delivery.time.time', lambda: now + 4 * 86400)
+    session = FakeSession()
+    result = delivery(tmp_path, session, max_age_days=3).send('Digest', 'Today')
+    assert result['backlog_sent'] == 0
+    assert [title for _, title, _ in session.posts] == ['Digest']
+    assert not list((tmp_path / 'outbox').glob('*.json'))
+
+
+def test_cards_for_another_webhook_are_left_alone(tmp_path):
+    delivery(tmp_path, FakeSession(fail=True), webhook=WEBHOOK + '-other').send('Other team', 'Theirs')
+    session = FakeSession()
+    sent, cleared = delivery(tmp_path, session).flush_outbox()
+    assert (sent, cleared) == (0, True)
+    assert session.posts == []
+    assert len(list((tmp_path / 'outbox').glob('*.json'))) == 1
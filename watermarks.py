@@ -0,0 +1,71 @@
+"""
+Per-repository collection watermarks.
+
+Each repository records the end of the last window it was collected for and
+the newest commit SHA seen, so the next run only fetches newer activity.
+Updates are staged in memory and written atomically by `commit()`, which the
+generator calls only once the digest has been saved.
+"""
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WatermarkStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.marks: Dict[str, Dict[str, Any]] = self._load()
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable watermark file {self.path}: {e}")
+            return {}
+
+    def since(self, repo_name: str) -> Optional[datetime]:
+        """Return the end of the last collected window for a repository, if any."""
+        mark = self.marks.get(repo_name)
+        if not mark:
+            return None
+        return datetime.fromisoformat(mark['collected_until'])
+
+    def last_sha(self, repo_name: str) -> Optional[str]:
+        mark = self.marks.get(repo_name)
+        return mark.get('last_sha') if mark else None
+
+    def advance(self, repo_name: str, collected_until: datetime, last_sha: Optional[str]):
+        """Stage a new watermark; keeps the previous SHA when the window had no commits."""
+        with self._lock:
+            self.pending[repo_name] = {
+                'collected_until': collected_until.isoformat(),
+                'last_sha': last_sha or self.last_sha(repo_name),
+            }
+
+    def commit(self):
+        """Persist staged watermarks atomically (write a temp file, then rename over the old one)."""
+        with self._lock:
+            if not self.pending:
+                return
+            self.marks.update(self.pending)
+            self.pending = {}
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(self.path.suffix + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.marks, f, indent=2, sort_keys=True)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        logger.info(f"Updated collection watermarks in {self.path}")